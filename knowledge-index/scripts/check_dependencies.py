@@ -43,6 +43,38 @@ def check_dependencies():
         print("  antiword: ✗ 未安装 (可选，用于 .doc 文件)")
         antiword_installed = False
 
+    # 检查 libyaml（索引读写加速，可选）
+    try:
+        from yaml import CSafeLoader  # noqa: F401
+        print("  libyaml (PyYAML C 扩展): ✓ 已启用")
+    except ImportError:
+        print("  libyaml (PyYAML C 扩展): ✗ 未启用 (可选，大型索引读写提速 3-5 倍)")
+
+    # 检查 NumPy / SciPy（链接图 PageRank 稀疏矩阵计算、语义检索，可选）
+    for name, module, usage in (
+        ("NumPy", "numpy", "语义检索所需；graph 命令以稀疏矩阵计算 PageRank，否则使用纯 Python"),
+        ("SciPy", "scipy", "graph 命令以 CSR 稀疏矩阵计算 PageRank"),
+    ):
+        try:
+            __import__(module)
+            print(f"  {name}: ✓ 已安装")
+        except ImportError:
+            print(f"  {name}: ✗ 未安装 (可选，{usage})")
+
+    # 检查 sentence-transformers（语义检索本地模型，可选）
+    try:
+        import sentence_transformers  # noqa: F401
+        print("  sentence-transformers: ✓ 已安装")
+    except ImportError:
+        print("  sentence-transformers: ✗ 未安装 (可选，语义检索使用本地模型，否则使用 TF-IDF + SVD)")
+
+    # 检查 jieba（中文查询分词，可选）
+    try:
+        import jieba  # noqa: F401
+        print("  jieba: ✓ 已安装")
+    except ImportError:
+        print("  jieba: ✗ 未安装 (可选，长中文查询按词拆分，否则按二字组拆分)")
+
     print()
     print("-" * 50)
 
@@ -71,6 +103,9 @@ def check_dependencies():
         print()
         print("可选增强:")
         print("  pip install pdfplumber  # PDF 备选方案")
+        print("  pip install --force-reinstall --no-binary pyyaml pyyaml  # 启用 libyaml 加速（需已安装 libyaml）")
+        print("  pip install jieba       # 中文查询分词")
+        print("  pip install numpy       # 语义检索（--semantic）")
         if sys.platform != "win32":
             print("  brew install antiword   # macOS .doc 支持")
             print("  apt install antiword    # Linux .doc 支持")
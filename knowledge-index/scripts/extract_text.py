@@ -3,9 +3,33 @@
 本地文档文本提取脚本
 
 用法:
-    python extract_text.py <file_path> [--format json|text]
+    python extract_text.py <file_path> [--format json|text|jsonl] [--pages 1-10,15] [--workers N]
     python extract_text.py document.pdf --format json
+    python extract_text.py manual.pdf --format jsonl --pages 1-200 --workers 4
     python extract_text.py document.docx
+    python extract_text.py --batch <目录|通配符|@列表文件|文件...> [--output results.jsonl] [--output-dir <目录>] [--workers N]
+                           [--pages 1-10,15]
+    （以上命令均可加 --no-cache 跳过提取缓存）
+
+参数:
+    --format    json（默认，一次输出完整结果）、text（纯文本）或 jsonl（PDF 逐页输出，内存只保留少量页面）
+    --pages     只提取指定页（从 1 开始，如 "1-10,15,20-"），仅 PDF
+    --workers   PDF 页数较多时用多进程并行提取（默认 CPU 核数，1 为单进程）；批量模式下为并行处理的文件数
+    --no-cache  不读写提取缓存
+
+提取缓存:
+    成功的提取结果保存在 ~/.knowledge-index/cache/extractions.db，键为文件内容哈希、提取库及其版本、
+    本脚本的输出格式版本和页码范围；文件未变化时只需计算哈希。总大小超过上限（默认 500 MB）时
+    按最近访问时间淘汰。PDF 的 text / jsonl 流式输出不使用缓存。
+
+批量模式 (--batch):
+    输入可以是目录（递归查找 .pdf/.docx/.doc）、通配符（如 "docs/**/*.pdf"）、
+    @列表文件（每行一个路径，# 开头为注释）或文件路径，可混合多个。
+    文件分给进程池并行提取（每个进程只导入一次提取库），进度、每个文件的耗时和失败原因输出到标准错误。
+    --output        结果写入 JSON Lines 文件（每行一个文件：file、success、text、metadata、error、elapsed）
+    --output-dir    每个文件的文本写入 <目录>/<相对路径>.txt（如 a/b.pdf → a/b.pdf.txt）
+    --pages         每个 PDF 只提取指定页（Word 文档忽略）
+    两者都未指定时 JSON Lines 输出到标准输出；有文件失败时退出码为 1
 
 输出 (JSON 格式):
     {
@@ -17,30 +41,365 @@
         },
         "success": true
     }
+
+JSON Lines 输出 (--format jsonl，PDF):
+    {"page": 1, "text": "第 1 页文本"}
+    {"page": 3, "text": "第 3 页文本"}          # 空白页跳过
+    {"success": true, "metadata": {"page_count": 10, "pages_extracted": 2, ...}}
+    其他格式输出单行完整结果
 """
 
 import sys
+import glob
+import hashlib
 import json
 import os
+import shutil
+import sqlite3
+import time
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
 from pathlib import Path
 
+# 每个进程任务提取的页数；同时在处理中的任务数为 workers × 2，内存只保留这些页面的文本
+PAGE_BATCH = 8
+# 页数少于该值时不启动进程池（进程启动和重新打开文件的开销大于收益）
+PARALLEL_MIN_PAGES = 32
+# 批量模式展开目录和通配符时收集的文件类型
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".doc")
+# 提取结果格式版本（输出内容变化时递增，使旧缓存失效）
+EXTRACT_VERSION = 1
+# 各格式按优先级排列的提取库：(模块名, 发行包名)；antiword 为命令行工具
+EXTRACTOR_PACKAGES = {
+    ".pdf": [(("pymupdf", "fitz"), "PyMuPDF"), (("pdfplumber",), "pdfplumber")],
+    ".docx": [(("docx",), "python-docx")],
+    ".doc": [(("antiword",), None), (("docx",), "python-docx")],
+}
+
+
+def file_hash(file_path: str) -> str:
+    """计算文件内容哈希（按块读取，与 knowledge-index-manager 的 get_file_hash 相同）"""
+    hash_func = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_func.update(chunk)
+    return hash_func.hexdigest()[:16]
+
+
+def extractor_signature(ext: str) -> str:
+    """
+    当前环境中该格式首选提取库的名称和版本（如 "PyMuPDF-1.24.0"），只查询包元数据，不导入库
+
+    Returns:
+        签名；没有可用的提取库时返回空字符串
+    """
+    import importlib.util
+    from importlib import metadata
+
+    for modules, package in EXTRACTOR_PACKAGES.get(ext, []):
+        if package is None:
+            if shutil.which(modules[0]):
+                return modules[0]
+            continue
+        if any(importlib.util.find_spec(module) is not None for module in modules):
+            try:
+                return f"{package}-{metadata.version(package)}"
+            except metadata.PackageNotFoundError:
+                return package
+    return ""
+
+
+class ExtractionCache:
+    """
+    提取结果缓存（单个 SQLite 文件，带容量上限）
+
+    键为 文件内容哈希 + 提取库签名 + EXTRACT_VERSION + 页码范围：文件未变化时直接返回上次的结果，
+    升级提取库或本脚本的输出格式后自动失效。结果 JSON 经 zlib 压缩保存；只缓存成功的结果。
+    数据总大小超过 max_bytes 时按最近访问时间淘汰；多个进程可同时读写（WAL 模式）。
+
+    存储位置: ~/.knowledge-index/cache/extractions.db（与 AI 摘要缓存同目录）
+    """
+
+    DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+    # 超出上限时淘汰到上限的该比例，避免每次写入都触发淘汰
+    EVICT_TARGET_RATIO = 0.9
+
+    def __init__(self, db_path: str = None, max_bytes: int = None):
+        """
+        初始化缓存
+
+        Args:
+            db_path: 数据库路径（默认 ~/.knowledge-index/cache/extractions.db）
+            max_bytes: 压缩后数据的最大总字节数（0 表示不限制）
+        """
+        self.db_path = db_path or self.default_path()
+        self.max_bytes = self.DEFAULT_MAX_BYTES if max_bytes is None else max(0, max_bytes)
+        self._conn = None
+
+    @staticmethod
+    def default_path() -> str:
+        """默认数据库路径"""
+        return os.path.join(str(Path.home()), ".knowledge-index", "cache", "extractions.db")
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取数据库连接（首次调用时建表）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS extractions ("
+                    "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                    "created REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_accessed ON extractions(accessed)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(file_path: str, pages: str = None, content_hash: str = None) -> str:
+        """
+        生成缓存键（未提供 content_hash 时读取文件计算）
+
+        Returns:
+            缓存键；该格式没有可用的提取库时返回空字符串（不缓存）
+        """
+        signature = extractor_signature(Path(file_path).suffix.lower())
+        if not signature:
+            return ""
+        content_hash = content_hash or file_hash(file_path)
+        return f"{content_hash}:{signature}:v{EXTRACT_VERSION}:{pages or ''}"
+
+    def get(self, key: str) -> dict:
+        """读取一条缓存（并更新访问时间），不存在时返回 None"""
+        conn = self._connection()
+        row = conn.execute("SELECT data FROM extractions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE extractions SET accessed = ? WHERE key = ?", (time.time(), key))
+        try:
+            return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        except (zlib.error, ValueError):
+            return None
+
+    def put(self, key: str, result: dict):
+        """写入（或覆盖）一条缓存，超出容量上限时淘汰最久未访问的条目"""
+        data = zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"), 6)
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, data, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now))
+        if self.max_bytes:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total, int(self.max_bytes * self.EVICT_TARGET_RATIO))
+
+    def _evict(self, total: int, target_bytes: int):
+        """按最近访问时间从旧到新删除条目，直到总大小不超过 target_bytes"""
+        conn = self._connection()
+        removed = []
+        for key, size in conn.execute("SELECT key, size FROM extractions ORDER BY accessed").fetchall():
+            if total <= target_bytes:
+                break
+            removed.append((key,))
+            total -= size
+        with conn:
+            conn.executemany("DELETE FROM extractions WHERE key = ?", removed)
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        entries, data_bytes = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions").fetchone()
+        return {
+            "entries": entries,
+            "data_bytes": data_bytes,
+            "file_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
-def extract_pdf_pymupdf(file_path: str) -> dict:
-    """使用 PyMuPDF 提取 PDF 文本"""
+
+def _import_pymupdf():
+    """导入 PyMuPDF（新版模块名为 pymupdf；旧名 fitz 在新版中会向标准输出打印弃用警告）"""
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf
+    return pymupdf
+
+
+def page_spans(spec: str) -> list:
+    """
+    解析页码范围的语法（不需要知道总页数）
+
+    Args:
+        spec: 从 1 开始的页码，逗号分隔，支持区间（如 "1-10,15,20-"、"-5"）
+
+    Returns:
+        [(起始页, 结束页或 None 表示到最后一页), ...]
+
+    Raises:
+        ValueError: 格式无效或不含任何页码
+    """
+    spans = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                start, end = part.split("-", 1)
+                start = int(start) if start.strip() else 1
+                end = int(end) if end.strip() else None
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise ValueError(f"无效的页码范围: {part}（格式如 1-10,15,20-）") from None
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"无效的页码范围: {part}（格式如 1-10,15,20-）")
+        spans.append((start, end))
+    if not spans:
+        raise ValueError(f"无效的页码范围: {spec!r}（格式如 1-10,15,20-）")
+    return spans
+
+
+def parse_page_range(spec: str, page_count: int) -> list:
+    """
+    解析页码范围
+
+    Args:
+        spec: 页码范围（格式见 page_spans）
+        page_count: 文档总页数（超出部分忽略）
+
+    Returns:
+        从 0 开始的页序号列表（升序、去重）
+
+    Raises:
+        ValueError: 格式无效
+    """
+    pages = set()
+    for start, end in page_spans(spec):
+        pages.update(range(start - 1, min(end or page_count, page_count)))
+    return sorted(pages)
+
+
+_worker_doc = None
+
+
+def _init_pdf_worker(file_path: str):
+    """进程池初始化：每个进程只打开一次 PDF"""
+    global _worker_doc
+    _worker_doc = _import_pymupdf().open(file_path)
+
+
+def _extract_pdf_pages(pages: list) -> list:
+    """进程池任务：提取一批页面的文本"""
+    return [(page, _worker_doc[page].get_text()) for page in pages]
+
+
+def iter_pdf_pages_pymupdf(file_path: str, pages: list = None, workers: int = 1):
+    """
+    使用 PyMuPDF 逐页提取 PDF 文本（生成器，按页码顺序产出 (页序号, 文本)）
+
+    workers > 1 且页数不少于 PARALLEL_MIN_PAGES 时，按 PAGE_BATCH 页一批分给进程池；
+    最多 workers × 2 批同时处理，按顺序取回结果后再提交下一批。
+    """
+    pymupdf = _import_pymupdf()
+    with pymupdf.open(file_path) as doc:
+        if pages is None:
+            pages = list(range(len(doc)))
+        if workers <= 1 or len(pages) < PARALLEL_MIN_PAGES:
+            for page in pages:
+                yield page, doc[page].get_text()
+            return
+
+    batches = iter([pages[i:i + PAGE_BATCH] for i in range(0, len(pages), PAGE_BATCH)])
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker,
+                             initargs=(file_path,)) as executor:
+        pending = deque(executor.submit(_extract_pdf_pages, batch) for batch in islice(batches, workers * 2))
+        while pending:
+            yield from pending.popleft().result()
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append(executor.submit(_extract_pdf_pages, batch))
+
+
+def iter_pdf_pages_pdfplumber(file_path: str, pages: list = None):
+    """使用 pdfplumber 逐页提取 PDF 文本（生成器，单进程）"""
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        if pages is None:
+            pages = list(range(len(pdf.pages)))
+        for page in pages:
+            yield page, pdf.pages[page].extract_text() or ""
+
+
+def get_pdf_page_count(file_path: str, extractor: str = "pymupdf") -> int:
+    """读取 PDF 总页数"""
+    if extractor == "pymupdf":
+        with _import_pymupdf().open(file_path) as doc:
+            return len(doc)
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def stream_pdf(file_path: str, pages: str = None, workers: int = 1):
+    """
+    逐页提取 PDF（PyMuPDF 优先，未安装时使用 pdfplumber），跳过空白页
+
+    Args:
+        file_path: PDF 路径
+        pages: 页码范围（见 parse_page_range，None 为全部）
+        workers: 并行进程数（仅 PyMuPDF）
+
+    Returns:
+        (提取器名称, 总页数, 生成 (页码从 1 开始, 文本) 的迭代器)
+
+    Raises:
+        ImportError: PyMuPDF 和 pdfplumber 均未安装
+        ValueError: 页码范围无效
+    """
     try:
-        import fitz  # PyMuPDF
+        _import_pymupdf()
+        extractor = "pymupdf"
+    except ImportError:
+        import pdfplumber  # noqa: F401
+        extractor = "pdfplumber"
 
-        doc = fitz.open(file_path)
-        text_parts = []
-        page_count = len(doc)
+    page_count = get_pdf_page_count(file_path, extractor)
+    selected = parse_page_range(pages, page_count) if pages else None
+    if extractor == "pymupdf":
+        page_iter = iter_pdf_pages_pymupdf(file_path, selected, workers)
+    else:
+        page_iter = iter_pdf_pages_pdfplumber(file_path, selected)
+    return extractor, page_count, ((page + 1, text) for page, text in page_iter if text.strip())
+
+
+def extract_pdf_pymupdf(file_path: str, pages: str = None, workers: int = 1) -> dict:
+    """使用 PyMuPDF 提取 PDF 文本（可指定页码范围，页数较多时可多进程并行）"""
+    try:
+        page_count = get_pdf_page_count(file_path)
+        selected = parse_page_range(pages, page_count) if pages else None
 
-        for page_num, page in enumerate(doc):
-            text = page.get_text()
+        text_parts = []
+        for page_num, text in iter_pdf_pages_pymupdf(file_path, selected, workers):
             if text.strip():
                 text_parts.append(f"[第{page_num + 1}页]\n{text}")
 
-        doc.close()
-
         return {
             "text": "\n\n".join(text_parts),
             "metadata": {
@@ -56,20 +415,16 @@ def extract_pdf_pymupdf(file_path: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-def extract_pdf_pdfplumber(file_path: str) -> dict:
-    """使用 pdfplumber 提取 PDF 文本（备选方案）"""
+def extract_pdf_pdfplumber(file_path: str, pages: str = None, workers: int = 1) -> dict:
+    """使用 pdfplumber 提取 PDF 文本（备选方案，可指定页码范围，单进程）"""
     try:
-        import pdfplumber
+        page_count = get_pdf_page_count(file_path, "pdfplumber")
+        selected = parse_page_range(pages, page_count) if pages else None
 
         text_parts = []
-        page_count = 0
-
-        with pdfplumber.open(file_path) as pdf:
-            page_count = len(pdf.pages)
-            for page_num, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text:
-                    text_parts.append(f"[第{page_num + 1}页]\n{text}")
+        for page_num, text in iter_pdf_pages_pdfplumber(file_path, selected):
+            if text:
+                text_parts.append(f"[第{page_num + 1}页]\n{text}")
 
         return {
             "text": "\n\n".join(text_parts),
@@ -86,7 +441,7 @@ def extract_pdf_pdfplumber(file_path: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-def extract_docx(file_path: str) -> dict:
+def extract_docx(file_path: str, pages: str = None, workers: int = 1) -> dict:
     """使用 python-docx 提取 Word 文档文本"""
     try:
         from docx import Document
@@ -121,11 +476,12 @@ def extract_docx(file_path: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-def extract_doc(file_path: str) -> dict:
+def extract_doc(file_path: str, pages: str = None, workers: int = 1) -> dict:
     """提取旧版 .doc 文件文本"""
     # 尝试使用 antiword (Linux/Mac)
     import subprocess
 
+    errors = []
     try:
         result = subprocess.run(
             ["antiword", file_path],
@@ -139,31 +495,42 @@ def extract_doc(file_path: str) -> dict:
                 "metadata": {"extractor": "antiword"},
                 "success": True
             }
+        errors.append(f"antiword: {result.stderr.strip() or f'退出码 {result.returncode}'}")
     except FileNotFoundError:
-        pass
-    except Exception:
-        pass
+        errors.append("antiword 未安装")
+    except Exception as e:
+        errors.append(f"antiword: {e}")
 
     # 尝试使用 python-docx (某些 .doc 实际是 .docx)
-    try:
-        return extract_docx(file_path)
-    except:
-        pass
+    result = extract_docx(file_path)
+    if result.get("success"):
+        return result
+    errors.append(f"python-docx: {result.get('error')}")
 
     return {
         "success": False,
-        "error": "无法提取 .doc 文件，请安装 antiword 或转换为 .docx"
+        "error": f"无法提取 .doc 文件，请安装 antiword 或转换为 .docx（{'；'.join(errors)}）"
     }
 
 
-def extract_text(file_path: str) -> dict:
-    """根据文件类型选择提取方法"""
+def extract_text(file_path: str, pages: str = None, workers: int = 1,
+                 cache: ExtractionCache = None, content_hash: str = None) -> dict:
+    """
+    根据文件类型选择提取方法
+
+    Args:
+        file_path: 文件路径
+        pages: PDF 页码范围（如 "1-10,15"，None 为全部；其他格式忽略）
+        workers: PDF 并行提取的进程数（默认单进程；其他格式忽略）
+        cache: 提取缓存（None 时不使用缓存）；命中时 metadata.cached 为 true
+        content_hash: 已知的文件内容哈希（见 file_hash，提供时不再读取文件计算）
+    """
     ext = Path(file_path).suffix.lower()
 
     extractors = {
-        ".pdf": [extract_pdf_pymupdf, extract_pdf_pdfplumber],
-        ".docx": [extract_docx],
-        ".doc": [extract_doc],
+        ".pdf": [("PyMuPDF", extract_pdf_pymupdf), ("pdfplumber", extract_pdf_pdfplumber)],
+        ".docx": [("python-docx", extract_docx)],
+        ".doc": [("antiword / python-docx", extract_doc)],
     }
 
     if ext not in extractors:
@@ -172,22 +539,252 @@ def extract_text(file_path: str) -> dict:
             "error": f"不支持的文件类型: {ext}"
         }
 
+    if pages and ext == ".pdf":
+        try:
+            page_spans(pages)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
+    key = ""
+    if cache is not None:
+        try:
+            key = cache.make_key(file_path, pages if ext == ".pdf" else None, content_hash)
+            cached = cache.get(key) if key else None
+        except (OSError, sqlite3.Error):
+            key, cached = "", None
+        if cached is not None:
+            cached.setdefault("metadata", {})["cached"] = True
+            return cached
+
     # 尝试所有可用的提取器
-    for extractor in extractors[ext]:
-        result = extractor(file_path)
+    errors = []
+    for name, extractor in extractors[ext]:
+        result = extractor(file_path, pages=pages, workers=workers)
         if result.get("success"):
+            if key:
+                try:
+                    cache.put(key, result)
+                except sqlite3.Error:
+                    pass
             return result
+        errors.append((name, result.get("error") or "未知错误"))
 
-    # 所有提取器都失败
+    # 所有提取器都失败：保留各方法的失败原因
+    if len(errors) == 1:
+        return {"success": False, "error": errors[0][1]}
     return {
         "success": False,
-        "error": "所有提取方法均失败"
+        "error": "所有提取方法均失败（" + "；".join(f"{name}: {error}" for name, error in errors) + "）"
     }
 
 
+def write_pdf_stream(file_path: str, output_format: str, pages: str = None, workers: int = 1) -> bool:
+    """
+    逐页提取 PDF 并立即输出（jsonl 每页一行，text 与一次性输出的内容相同）
+
+    Returns:
+        是否成功（失败时 jsonl 输出错误记录，text 输出到标准错误）
+    """
+    extracted = 0
+    char_count = 0
+    try:
+        extractor, page_count, page_iter = stream_pdf(file_path, pages, workers)
+        for page, text in page_iter:
+            if output_format == "jsonl":
+                print(json.dumps({"page": page, "text": text}, ensure_ascii=False), flush=True)
+            else:
+                separator = "\n\n" if extracted else ""
+                sys.stdout.write(f"{separator}[第{page}页]\n{text}")
+            extracted += 1
+            char_count += len(text)
+    except ImportError:
+        error = "PyMuPDF 和 pdfplumber 均未安装，请运行: pip install PyMuPDF"
+    except Exception as e:
+        error = str(e)
+    else:
+        if output_format == "jsonl":
+            print(json.dumps({"success": True, "metadata": {
+                "page_count": page_count,
+                "pages_extracted": extracted,
+                "extractor": extractor,
+                "char_count": char_count
+            }}, ensure_ascii=False))
+        else:
+            print()
+        return True
+
+    if output_format == "jsonl":
+        print(json.dumps({"success": False, "error": error, "pages_extracted": extracted}, ensure_ascii=False))
+    else:
+        print(f"错误: {error}", file=sys.stderr)
+    return False
+
+
+def collect_files(inputs: list) -> list:
+    """
+    展开批量输入：目录（递归，跳过隐藏目录）、通配符、@列表文件或文件路径
+
+    目录和通配符只收集 SUPPORTED_EXTENSIONS 中的文件；直接指定的文件原样保留
+    （不存在或不支持时在提取阶段报告失败）。
+
+    Returns:
+        去重后的文件路径列表（保持输入顺序，目录内按路径排序）
+    """
+    files = []
+    seen = set()
+
+    def add(path: str):
+        if path not in seen:
+            seen.add(path)
+            files.append(path)
+
+    for item in inputs:
+        if item.startswith("@"):
+            with open(item[1:], "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        add(line)
+        elif os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(names):
+                    if Path(name).suffix.lower() in SUPPORTED_EXTENSIONS:
+                        add(os.path.join(root, name))
+        elif any(c in item for c in "*?["):
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isfile(path) and Path(path).suffix.lower() in SUPPORTED_EXTENSIONS:
+                    add(path)
+        else:
+            add(item)
+    return files
+
+
+_batch_cache = None
+
+
+def _extract_file(file_path: str, use_cache: bool = False, pages: str = None) -> tuple:
+    """批量模式任务：提取单个文件（pages 仅对 PDF 生效），返回 (路径, 结果, 耗时秒数)（每个进程共用一个缓存连接）"""
+    global _batch_cache
+    if use_cache and _batch_cache is None:
+        _batch_cache = ExtractionCache()
+
+    start = time.perf_counter()
+    if not os.path.exists(file_path):
+        result = {"success": False, "error": f"文件不存在: {file_path}"}
+    else:
+        try:
+            result = extract_text(file_path, pages=pages, cache=_batch_cache if use_cache else None)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+    return file_path, result, time.perf_counter() - start
+
+
+def iter_batch(files: list, workers: int = 1, use_cache: bool = False, pages: str = None):
+    """
+    批量提取（生成器，按完成顺序产出 (路径, 结果, 耗时)）
+
+    workers > 1 时使用进程池，最多 workers × 4 个文件同时在处理中，
+    已完成的结果产出后即释放，内存不随文件总数增长。
+    """
+    if workers <= 1 or len(files) <= 1:
+        for file_path in files:
+            yield _extract_file(file_path, use_cache, pages)
+        return
+
+    remaining = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_extract_file, path, use_cache, pages) for path in islice(remaining, workers * 4)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            for path in islice(remaining, len(done)):
+                pending.add(executor.submit(_extract_file, path, use_cache, pages))
+
+
+def run_batch(inputs: list, workers: int = 1, output: str = None, output_dir: str = None,
+              use_cache: bool = True, pages: str = None) -> bool:
+    """
+    批量提取并写出结果（进度、耗时和失败原因输出到标准错误）
+
+    Args:
+        inputs: 目录、通配符、@列表文件或文件路径
+        workers: 并行进程数
+        output: JSON Lines 结果文件（None 且未指定 output_dir 时写到标准输出）
+        output_dir: 文本输出目录（每个文件写入 <相对路径>.txt）
+        use_cache: 是否使用提取缓存
+        pages: PDF 页码范围（见 page_spans，None 为全部；Word 文档忽略）
+
+    Returns:
+        是否全部成功
+    """
+    try:
+        files = collect_files(inputs)
+    except OSError as e:
+        print(f"错误: 无法读取文件列表: {e}", file=sys.stderr)
+        return False
+    if not files:
+        print("错误: 没有找到可提取的文件", file=sys.stderr)
+        return False
+
+    # 文本输出按各文件相对于公共目录的路径存放
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+    out = None
+    if output:
+        out = open(output, "w", encoding="utf-8")
+    elif not output_dir:
+        out = sys.stdout
+
+    start = time.perf_counter()
+    failures = []
+    cached = 0
+    total = len(files)
+    print(f"批量提取 {total} 个文件（{workers} 个进程）", file=sys.stderr)
+    try:
+        for done, (file_path, result, elapsed) in enumerate(iter_batch(files, workers, use_cache, pages), 1):
+            if result.get("success") and output_dir:
+                text_path = os.path.join(output_dir, os.path.relpath(os.path.abspath(file_path), root) + ".txt")
+                try:
+                    os.makedirs(os.path.dirname(text_path), exist_ok=True)
+                    with open(text_path, "w", encoding="utf-8") as f:
+                        f.write(result["text"])
+                except OSError as e:
+                    result = {"success": False, "error": f"写入失败: {e}"}
+
+            if out is not None:
+                record = {"file": file_path, "elapsed": round(elapsed, 3)}
+                record.update(result)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            if result.get("success"):
+                metadata = result.get("metadata", {})
+                pages = f"，{metadata['page_count']} 页" if metadata.get("page_count") is not None else ""
+                source = "，缓存" if metadata.get("cached") else ""
+                cached += bool(metadata.get("cached"))
+                print(f"[{done}/{total}] ✓ {file_path}（{elapsed:.2f}s{pages}，"
+                      f"{len(result.get('text', ''))} 字符{source}）", file=sys.stderr)
+            else:
+                failures.append((file_path, result.get("error")))
+                print(f"[{done}/{total}] ✗ {file_path}（{elapsed:.2f}s）: {result.get('error')}", file=sys.stderr)
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n完成: {total - len(failures)} 个成功（{cached} 个来自缓存），{len(failures)} 个失败，"
+          f"总耗时 {elapsed:.1f}s（平均 {elapsed / total:.3f}s/文件）", file=sys.stderr)
+    for file_path, error in failures:
+        print(f"  ✗ {file_path}: {error}", file=sys.stderr)
+    return not failures
+
+
 def main():
     if len(sys.argv) < 2:
-        print("用法: python extract_text.py <file_path> [--format json|text]")
+        print("用法: python extract_text.py <file_path> [--format json|text|jsonl] [--pages 1-10,15] [--workers N] "
+              "[--no-cache]")
+        print("      python extract_text.py --batch <目录|通配符|@列表文件|文件...> [--output results.jsonl] "
+              "[--output-dir <目录>] [--workers N] [--pages 1-10,15] [--no-cache]")
         sys.exit(1)
 
     file_path = sys.argv[1]
@@ -198,13 +795,64 @@ def main():
         if idx + 1 < len(sys.argv):
             output_format = sys.argv[idx + 1]
 
+    pages = None
+    if "--pages" in sys.argv:
+        idx = sys.argv.index("--pages")
+        if idx + 1 < len(sys.argv):
+            pages = sys.argv[idx + 1]
+        try:
+            page_spans(pages or "")
+        except ValueError as e:
+            print(f"无效的 --pages 参数: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    workers = os.cpu_count() or 1
+    if "--workers" in sys.argv:
+        idx = sys.argv.index("--workers")
+        if idx + 1 < len(sys.argv):
+            try:
+                workers = max(1, int(sys.argv[idx + 1]))
+            except ValueError:
+                print(f"无效的 --workers 参数: {sys.argv[idx + 1]}", file=sys.stderr)
+                sys.exit(1)
+
+    use_cache = "--no-cache" not in sys.argv
+
+    if file_path == "--batch":
+        value_options = ("--format", "--pages", "--workers", "--output", "--output-dir")
+        inputs = [arg for i, arg in enumerate(sys.argv[2:], 2)
+                  if not arg.startswith("--") and sys.argv[i - 1] not in value_options]
+        output = output_dir = None
+        if "--output" in sys.argv:
+            idx = sys.argv.index("--output")
+            if idx + 1 < len(sys.argv):
+                output = sys.argv[idx + 1]
+        if "--output-dir" in sys.argv:
+            idx = sys.argv.index("--output-dir")
+            if idx + 1 < len(sys.argv):
+                output_dir = sys.argv[idx + 1]
+        if not inputs:
+            print("错误: 请指定要提取的目录、通配符或文件", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0 if run_batch(inputs, workers, output, output_dir, use_cache=use_cache, pages=pages) else 1)
+
+    # PDF 的 text / jsonl 输出逐页写出，不在内存中拼接全文
+    if (output_format in ("text", "jsonl") and os.path.exists(file_path)
+            and Path(file_path).suffix.lower() == ".pdf"):
+        sys.exit(0 if write_pdf_stream(file_path, output_format, pages, workers) else 1)
+
     if not os.path.exists(file_path):
         result = {"success": False, "error": f"文件不存在: {file_path}"}
     else:
-        result = extract_text(file_path)
+        result = extract_text(file_path, pages=pages, workers=workers,
+                              cache=ExtractionCache() if use_cache else None)
 
     if output_format == "json":
         print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif output_format == "jsonl":
+        print(json.dumps(result, ensure_ascii=False))
+        if not result.get("success"):
+            sys.exit(1)
     else:
         if result.get("success"):
             print(result["text"])
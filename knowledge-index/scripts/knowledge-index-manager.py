@@ -13,19 +13,51 @@ Knowledge Index Manager - 知识库索引管理器
 7. 智能检索（支持 Obsidian CLI）
 
 使用方法：
-    python knowledge-index-manager.py build <知识库路径> [--force] [--no-ai]
-    python knowledge-index-manager.py update <知识库路径> [--no-ai]
+    python knowledge-index-manager.py build <知识库路径> [--force] [--no-ai] [--workers N] [--batch-size N] [--concurrency N] [--storage yaml|sqlite] [--fulltext] [--semantic]
+    python knowledge-index-manager.py update <知识库路径> [--no-ai] [--workers N] [--batch-size N] [--concurrency N] [--storage yaml|sqlite] [--fulltext] [--semantic]
     python knowledge-index-manager.py list
-    python knowledge-index-manager.py search <查询> [--kb <知识库路径>] [--prefer-obsidian] [--no-obsidian]
-    python knowledge-index-manager.py info <知识库路径>
+    python knowledge-index-manager.py search <查询> [--kb <知识库路径>] [--ranker weighted|bm25] [--mode keyword|semantic|hybrid] [--deadline 秒] [--prefer-obsidian] [--no-obsidian]
+    python knowledge-index-manager.py info <知识库路径> [--doc <文档路径>]
+    python knowledge-index-manager.py graph <知识库路径> [--top N]
+    python knowledge-index-manager.py watch <知识库路径> [--poll] [--debounce 秒] [--no-ai]
+    python knowledge-index-manager.py serve [--host 127.0.0.1] [--port 8765] [--socket <路径>]
+    python knowledge-index-manager.py cache [stats|gc]
 
 参数：
     --force             强制创建索引（忽略父索引）
     --no-ai             禁用 AI 摘要生成
+    --workers N         并行处理文档的工作线程数（默认 1，或读取 _index_config.yaml）；
+                        全局搜索时为并行检索的知识库数（默认 CPU 核数）
+    --batch-size N      每个 AI 摘要请求合并的文档数（默认 1，或读取 _index_config.yaml）
+    --concurrency N     同时进行的 AI 摘要请求数（默认 1，限流/重试参数见 _index_config.yaml）
+    --storage           索引存储后端：yaml（默认）或 sqlite（_index.yaml 仍作为导出写出）
+    --fulltext          生成正文全文索引（.knowledge-index/fulltext.idx），之后 update 自动维护
+    --semantic          生成语义向量索引（.knowledge-index/vectors.idx，需 NumPy），之后 update 自动维护；
+                        安装 sentence-transformers 并配置 search.semantic_model 时使用本地模型，否则使用 LSA
+    --doc               info 命令：仅显示指定文档的索引记录
+    --top               graph 命令：中心度、枢纽笔记、孤立笔记各显示的条数（默认 10）
+    --poll              watch 命令：使用轮询代替 inotify（网络盘、容器挂载等场景）
+    --debounce          watch 命令：变更静默多少秒后更新索引（默认 1）
+    --host / --port     serve 命令：HTTP 监听地址和端口（默认 127.0.0.1:8765）
+    --socket            serve 命令：改为监听 Unix socket
     --kb                指定搜索的知识库路径
+    --deadline          全局搜索的总超时秒数，超时返回已完成知识库的结果
+    --ranker            检索评分：weighted（固定字段权重，默认）或 bm25（BM25F，考虑词频、字段长度和稀有度）
+    --mode              检索模式：keyword（默认）、semantic（向量相似度）或 hybrid（关键词与语义加权）
     --prefer-obsidian   优先使用 Obsidian CLI 搜索（需桌面应用运行中）
     --no-obsidian       禁用 Obsidian CLI，仅使用索引搜索
 
+摘要缓存（~/.knowledge-index/cache/summaries.db）：
+    cache stats         显示缓存条目数与占用空间
+    cache gc            删除不再被任何已注册知识库引用的摘要
+    容量上限在注册表 registry.yaml 的 cache 部分配置：
+    max_memory_entries（默认 5000）、max_disk_mb（默认 200），超出时按 LRU 淘汰
+
+提取缓存（~/.knowledge-index/cache/extractions.db）：
+    PDF / Word 正文提取结果按 文件内容哈希 + 提取库版本 缓存（与 extract_text.py 共用），
+    未变化的文件重建全文索引时不再重新解析；上限为 cache.extraction_max_mb（默认 500），
+    超出时按 LRU 淘汰，cache stats 一并显示
+
 Obsidian CLI 集成：
     当 Obsidian 桌面应用运行时，可使用原生搜索能力：
     - 自动检测 CLI 可用性
@@ -37,18 +69,60 @@ Obsidian CLI 集成：
 Obsidian CLI: 支持（搜索功能增强）
 """
 
+import asyncio
+import bisect
+import ctypes
+import ctypes.util
+import errno
 import os
+import posixpath
 import sys
 import yaml
 import json
+import math
+import mmap
+import multiprocessing
 import shutil
+import socketserver
 import re
 import hashlib
+import heapq
+import random
 import time
+import select
+import sqlite3
+import struct
 import subprocess
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from collections import OrderedDict
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import accumulate, islice
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# YAML 编解码：优先使用 libyaml（C 加速），不可用时回退到纯 Python 实现
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+    YAML_LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
+    YAML_LIBYAML = False
+
+
+def yaml_load(stream) -> Any:
+    """解析 YAML（字符串或文件对象），等价于 yaml.safe_load"""
+    return yaml.load(stream, Loader=YamlLoader)
+
+
+def yaml_dump(data: Any, stream=None) -> Optional[str]:
+    """输出 YAML（保留键顺序、允许 Unicode），stream 为 None 时返回字符串"""
+    return yaml.dump(data, stream, Dumper=YamlDumper, allow_unicode=True,
+                     default_flow_style=False, sort_keys=False)
 
 
 class ObsidianCLIClient:
@@ -234,186 +308,3463 @@ class ProgressReporter:
         print(f"[{self.task_name}] 跳过（共 {self.total} 项）")
 
 
-class KnowledgeBaseManager:
-    """知识库管理器"""
+class SummaryScheduler:
+    """
+    AI 摘要请求调度器（asyncio）
 
-    # Wikilink 正则模式：匹配 [[link]], [[link#section]], [[link|alias]], [[link#section|alias]]
-    WIKILINK_PATTERN = re.compile(r'\[\[([^\]\|#]+)(?:#([^\]\|]+))?(?:\|([^\]]+))?\]\]')
+    - 同时保持最多 concurrency 个请求（同步 SDK 调用在线程中执行）
+    - 按每分钟请求数 / token 数预算限流（60 秒滑动窗口）
+    - 429 / 5xx / 连接超时等错误按指数退避 + 随机抖动重试，优先遵循 retry-after
+    - 重试耗尽或不可重试的请求记为失败，由调用方降级处理
+    """
 
-    def __init__(self, registry_path: str = None, enable_ai_summary: bool = True,
-                 obsidian_cli_mode: str = "auto"):
+    RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+    RETRY_ERRORS = ('APIConnectionError', 'APITimeoutError', 'ConnectionError', 'TimeoutError')
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, request_fn, concurrency: int = 1,
+                 requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0):
         """
-        初始化管理器
+        初始化调度器
 
         Args:
-            registry_path: 注册表路径（默认 ~/.knowledge-index/registry.yaml）
-            enable_ai_summary: 是否启用 AI 摘要（默认 True）
-            obsidian_cli_mode: Obsidian CLI 模式
-                - "auto": 自动检测，CLI 可用时优先使用（默认）
-                - "prefer": 优先使用 CLI，结果与索引合并
-                - "disabled": 禁用 CLI，仅使用索引
+            request_fn: 同步请求函数，接收任务负载，失败时抛出异常
+            concurrency: 最大并发请求数
+            requests_per_minute: 每分钟请求数上限（None 不限制）
+            tokens_per_minute: 每分钟 token 数上限（None 不限制，按任务估算值计）
+            max_retries: 可重试错误的最大重试次数
+            base_delay: 退避基础时长（秒）
+            max_delay: 单次退避上限（秒）
         """
-        self.registry_path = registry_path or self.get_default_registry_path()
-        self.registry = self.load_registry()
-        self.enable_ai_summary = enable_ai_summary
-        self._ai_cache = {}  # 内存缓存
-        self._cache_dir = None
-        self.obsidian_cli_mode = obsidian_cli_mode
-        self._obsidian_cli = None
+        self.request_fn = request_fn
+        self.concurrency = max(1, concurrency)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._window: List[Tuple[float, int]] = []
+
+    def run(self, jobs: List[Tuple[Any, int]], on_done=None) -> List[Tuple[bool, Any]]:
+        """
+        执行所有任务
 
-    @property
-    def obsidian_cli(self) -> ObsidianCLIClient:
-        """获取 Obsidian CLI 客户端（延迟初始化）"""
-        if self._obsidian_cli is None:
-            self._obsidian_cli = ObsidianCLIClient()
-        return self._obsidian_cli
+        Args:
+            jobs: [(任务负载, 估算 token 数), ...]
+            on_done: 每个任务结束时的回调 on_done(index, ok)（在调度线程中调用）
 
-    @staticmethod
-    def get_default_registry_path() -> str:
-        """获取默认注册表路径"""
-        home = Path.home()
-        registry_dir = home / ".knowledge-index"
-        registry_dir.mkdir(parents=True, exist_ok=True)
-        return str(registry_dir / "registry.yaml")
+        Returns:
+            与 jobs 顺序一致的 [(是否成功, 结果或最后一次异常), ...]
+        """
+        if not jobs:
+            return []
+        return asyncio.run(self._run(jobs, on_done))
 
-    @property
-    def cache_dir(self) -> str:
-        """获取缓存目录"""
-        if self._cache_dir is None:
-            home = Path.home()
-            self._cache_dir = str(home / ".knowledge-index" / "cache")
-            os.makedirs(self._cache_dir, exist_ok=True)
-        return self._cache_dir
+    async def _run(self, jobs: List[Tuple[Any, int]], on_done) -> List[Tuple[bool, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        budget_lock = asyncio.Lock()
+        results: List[Optional[Tuple[bool, Any]]] = [None] * len(jobs)
 
-    def get_content_hash(self, content: str) -> str:
-        """计算内容哈希"""
-        return hashlib.md5(content.encode('utf-8')).hexdigest()[:16]
+        async def worker(index: int, payload: Any, tokens: int):
+            async with semaphore:
+                results[index] = await self._execute(payload, tokens, budget_lock)
+            if on_done:
+                on_done(index, results[index][0])
 
-    def get_cached_summary(self, content_hash: str) -> Optional[Dict]:
-        """从缓存获取摘要"""
-        # 先检查内存缓存
-        if content_hash in self._ai_cache:
-            return self._ai_cache[content_hash]
+        await asyncio.gather(*(worker(i, payload, tokens) for i, (payload, tokens) in enumerate(jobs)))
+        return results
 
-        # 检查文件缓存
-        cache_file = os.path.join(self.cache_dir, f"{content_hash}.json")
-        if os.path.exists(cache_file):
+    async def _execute(self, payload: Any, tokens: int, budget_lock: asyncio.Lock) -> Tuple[bool, Any]:
+        attempt = 0
+        while True:
+            await self._acquire(tokens, budget_lock)
             try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self._ai_cache[content_hash] = data
-                    return data
-            except:
-                pass
-        return None
+                return True, await asyncio.to_thread(self.request_fn, payload)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    return False, e
+                await asyncio.sleep(self.retry_delay(attempt, e))
+                attempt += 1
+
+    async def _acquire(self, tokens: int, budget_lock: asyncio.Lock):
+        """等待请求数 / token 预算（窗口为空时总是放行，避免超大任务永久阻塞）"""
+        async with budget_lock:
+            while True:
+                now = time.monotonic()
+                self._window = [(t, n) for t, n in self._window if now - t < self.WINDOW_SECONDS]
+
+                within_requests = (self.requests_per_minute is None
+                                   or len(self._window) < self.requests_per_minute)
+                within_tokens = (self.tokens_per_minute is None
+                                 or sum(n for _, n in self._window) + tokens <= self.tokens_per_minute)
+                if not self._window or (within_requests and within_tokens):
+                    self._window.append((now, tokens))
+                    return
 
-    def save_cached_summary(self, content_hash: str, summary_data: Dict):
-        """保存摘要到缓存"""
-        self._ai_cache[content_hash] = summary_data
-        cache_file = os.path.join(self.cache_dir, f"{content_hash}.json")
+                await asyncio.sleep(max(0.01, self.WINDOW_SECONDS - (now - self._window[0][0])))
+
+    @classmethod
+    def is_retryable(cls, error: Exception) -> bool:
+        """判断错误是否可重试（限流、服务端错误、连接/超时）"""
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status in cls.RETRY_STATUS
+        return type(error).__name__ in cls.RETRY_ERRORS
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        """计算重试等待时长：优先使用 retry-after 响应头，否则指数退避 + 抖动"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(summary_data, f, ensure_ascii=False, indent=2)
-        except:
+            retry_after = float(headers.get('retry-after'))
+            return min(self.max_delay, max(0.0, retry_after))
+        except (TypeError, ValueError):
             pass
 
-    def generate_ai_summary(self, content: str, doc_path: str = "") -> Dict[str, Any]:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class SummaryCache:
+    """
+    AI 摘要缓存（单个 SQLite 文件，带容量上限）
+
+    替代旧版每个内容哈希一个 JSON 文件的缓存：
+    - 打开时只加载哈希集合，未命中的查询无需访问磁盘
+    - 内存中按 LRU 保留最多 max_memory_entries 条摘要，其余按需从数据库读取
+    - 数据库总大小超过 max_disk_bytes 时，按最近访问时间淘汰最旧条目
+    - 写入在事务中完成（WAL 模式），多线程共享同一连接并加锁
+    - 首次打开时自动导入旧版 <hash>.json 文件并删除
+
+    存储位置: ~/.knowledge-index/cache/summaries.db
+    """
+
+    LEGACY_PATTERN = re.compile(r'^[0-9a-f]{16}\.json$')
+    DEFAULT_MAX_MEMORY_ENTRIES = 5000
+    DEFAULT_MAX_DISK_BYTES = 200 * 1024 * 1024
+    # 超出磁盘上限时淘汰到上限的该比例，避免每次写入都触发淘汰
+    EVICT_TARGET_RATIO = 0.9
+
+    def __init__(self, cache_dir: str, max_memory_entries: Optional[int] = None,
+                 max_disk_bytes: Optional[int] = None):
         """
-        生成 AI 摘要和关键词
+        初始化缓存
 
         Args:
-            content: 文档内容
-            doc_path: 文档路径（用于日志）
+            cache_dir: 缓存目录
+            max_memory_entries: 内存中保留的最大条目数（0 表示不在内存中保留）
+            max_disk_bytes: 数据库中摘要数据的最大总字节数（0 表示不限制）
+        """
+        self.cache_dir = cache_dir
+        self.db_path = os.path.join(cache_dir, "summaries.db")
+        self.max_memory_entries = (self.DEFAULT_MAX_MEMORY_ENTRIES if max_memory_entries is None
+                                   else max(0, max_memory_entries))
+        self.max_disk_bytes = (self.DEFAULT_MAX_DISK_BYTES if max_disk_bytes is None
+                               else max(0, max_disk_bytes))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._keys = set()
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._touched: Dict[str, float] = {}  # 待写回的访问时间
+        self._disk_bytes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取数据库连接（首次调用时建表、迁移旧版缓存并加载哈希集合，需持有锁）"""
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS summaries ("
+                    "hash TEXT PRIMARY KEY, data TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(summaries)")}
+                if 'accessed' not in columns:
+                    conn.execute("ALTER TABLE summaries ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+                    conn.execute("UPDATE summaries SET accessed = created")
+                if 'size' not in columns:
+                    conn.execute("ALTER TABLE summaries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                    conn.execute("UPDATE summaries SET size = length(CAST(data AS BLOB))")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_accessed ON summaries(accessed)")
+            self._conn = conn
+            self._migrate_legacy()
+
+            self._keys = {row[0] for row in conn.execute("SELECT hash FROM summaries")}
+            self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        return self._conn
+
+    def _migrate_legacy(self):
+        """导入旧版每哈希一个 JSON 文件的缓存，导入成功后删除原文件"""
+        legacy_files = [name for name in os.listdir(self.cache_dir) if self.LEGACY_PATTERN.match(name)]
+        if not legacy_files:
+            return
+
+        rows = []
+        for name in legacy_files:
+            file_path = os.path.join(self.cache_dir, name)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.dumps(json.load(f), ensure_ascii=False)
+                mtime = os.path.getmtime(file_path)
+                rows.append((name[:-5], data, mtime, mtime, len(data.encode('utf-8'))))
+            except Exception:
+                continue
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO summaries (hash, data, created, accessed, size) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+
+        for name in legacy_files:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+        print(f"  ✓ 已迁移 {len(rows)} 条旧版摘要缓存至 {self.db_path}")
+
+    def _remember(self, content_hash: str, summary_data: Dict):
+        """放入内存 LRU，超出上限时丢弃最久未使用的条目（需持有锁）"""
+        if self.max_memory_entries <= 0:
+            return
+        self._memory[content_hash] = summary_data
+        self._memory.move_to_end(content_hash)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, content_hash: str) -> Optional[Dict]:
+        """读取一条缓存，不存在时返回 None"""
+        with self._lock:
+            conn = self._connection()
+            if content_hash not in self._keys:
+                return None
+
+            self._touched[content_hash] = time.time()
+            if content_hash in self._memory:
+                self._memory.move_to_end(content_hash)
+                return self._memory[content_hash]
+
+            row = conn.execute("SELECT data FROM summaries WHERE hash = ?", (content_hash,)).fetchone()
+            if row is None:
+                self._keys.discard(content_hash)
+                return None
+            try:
+                summary_data = json.loads(row[0])
+            except ValueError:
+                return None
+            self._remember(content_hash, summary_data)
+            return summary_data
+
+    def put(self, content_hash: str, summary_data: Dict):
+        """写入（或覆盖）一条缓存，必要时按 LRU 淘汰旧条目"""
+        data = json.dumps(summary_data, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                old = conn.execute("SELECT size FROM summaries WHERE hash = ?", (content_hash,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO summaries (hash, data, created, accessed, size) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (content_hash, data, now, now, size))
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._keys.add(content_hash)
+            self._touched.pop(content_hash, None)
+            self._remember(content_hash, summary_data)
+
+            if self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes:
+                self._evict(int(self.max_disk_bytes * self.EVICT_TARGET_RATIO))
+
+    def _flush_touched(self):
+        """写回内存中记录的访问时间（需持有锁）"""
+        if not self._touched or self._conn is None:
+            return
+        with self._conn:
+            self._conn.executemany("UPDATE summaries SET accessed = ? WHERE hash = ?",
+                                   [(accessed, h) for h, accessed in self._touched.items()])
+        self._touched.clear()
+
+    def _evict(self, target_bytes: int) -> Tuple[int, int]:
+        """
+        按最近访问时间从旧到新淘汰条目，直到总大小不超过 target_bytes（需持有锁）
 
         Returns:
-            {"summary": "...", "keywords": [...], "topics": [...]}
+            (淘汰条目数, 释放字节数)
         """
-        # 检查缓存
-        content_hash = self.get_content_hash(content)
-        cached = self.get_cached_summary(content_hash)
-        if cached:
-            print(f"    ✓ 使用缓存: {doc_path}")
-            return cached
+        self._flush_touched()
+        conn = self._conn
+        removed = []
+        freed = 0
+        with closing(conn.execute("SELECT hash, size FROM summaries ORDER BY accessed")) as cursor:
+            for content_hash, size in cursor:
+                if self._disk_bytes - freed <= target_bytes:
+                    break
+                removed.append(content_hash)
+                freed += size
+        self._remove(removed)
+        self._disk_bytes -= freed
+        return len(removed), freed
+
+    def _remove(self, hashes: List[str]):
+        """从数据库和内存中删除指定条目（需持有锁）"""
+        if not hashes:
+            return
+        with self._conn:
+            self._conn.executemany("DELETE FROM summaries WHERE hash = ?", [(h,) for h in hashes])
+        for content_hash in hashes:
+            self._keys.discard(content_hash)
+            self._memory.pop(content_hash, None)
+            self._touched.pop(content_hash, None)
+
+    def remove_unreferenced(self, referenced: set) -> Tuple[int, int]:
+        """
+        删除不在 referenced 中的全部条目，并压缩数据库文件
 
-        # 如果禁用 AI 摘要，返回基础信息
-        if not self.enable_ai_summary:
-            return self._generate_basic_summary(content)
+        Returns:
+            (删除条目数, 释放字节数)
+        """
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute("SELECT hash, size FROM summaries").fetchall()
+            stale = [(h, size) for h, size in rows if h not in referenced]
+            self._remove([h for h, _ in stale])
+            freed = sum(size for _, size in stale)
+            self._disk_bytes -= freed
+            if stale:
+                conn.execute("VACUUM")
+            return len(stale), freed
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计信息"""
+        with self._lock:
+            self._connection()
+            return {
+                "entries": len(self._keys),
+                "memory_entries": len(self._memory),
+                "data_bytes": self._disk_bytes,
+                "file_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+                "max_memory_entries": self.max_memory_entries,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
 
-        # 尝试调用 Claude API
-        try:
-            result = self._call_claude_api(content)
-            if result:
-                self.save_cached_summary(content_hash, result)
-                return result
-        except Exception as e:
-            print(f"    ⚠️ AI 摘要失败 ({doc_path}): {e}")
+    def flush(self):
+        """写回内存中记录的访问时间（供 LRU 淘汰使用）"""
+        with self._lock:
+            self._flush_touched()
 
-        # 降级为基础摘要
-        return self._generate_basic_summary(content)
+    def close(self):
+        """写回访问时间并关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touched()
+                self._conn.close()
+                self._conn = None
 
-    def _call_claude_api(self, content: str) -> Optional[Dict]:
-        """调用 Claude API 生成摘要"""
-        api_key = os.environ.get("ANTHROPIC_API_KEY")
-        if not api_key:
+
+class Tokenizer:
+    """
+    检索分词器（索引和查询共用）
+
+    - 索引：各字段文本按字符二元组（bigram）建立倒排表，任意长度 ≥ 2 的子串
+      （中文词、英文单词片段）都能通过倒排表定位，无需词典
+    - 查询：先按空格和标点切分；整体在索引中无匹配的中日韩文字片段，再按文字类别
+      切开，并拆分为词典分词结果（安装 jieba 时）或字符二元组，只保留索引中出现的词项
+
+    整体能匹配的关键词保持不变，因此原有查询的排序不受影响，只提升长中文查询的召回。
+    """
+
+    SPLIT_PATTERN = re.compile(r'[\s,，、。？！;；：:\+\-\*]+')
+    CJK_CHARS = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+    CJK_PATTERN = re.compile(f'[{CJK_CHARS}]')
+    SCRIPT_RUN_PATTERN = re.compile(f'[{CJK_CHARS}]+|[^{CJK_CHARS}]+')
+    WORD_PATTERN = re.compile(f'[{CJK_CHARS}]+|[^\\W{CJK_CHARS}]+')
+    MIN_TERM_LENGTH = 2
+
+    _jieba = None
+    _jieba_loaded = False
+    _jieba_lock = threading.Lock()
+
+    @staticmethod
+    def grams(text: str) -> set:
+        """提取字符二元组（倒排表词项）"""
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """
+        切分正文词元（全文索引与查询共用）：连续的字母数字为一个词元，
+        中日韩文字按相邻二字组切分（单字片段保留单字）
+        """
+        tokens = []
+        for run in cls.WORD_PATTERN.findall(text.lower()):
+            if len(run) > 1 and cls.CJK_PATTERN.match(run):
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            else:
+                tokens.append(run)
+        return tokens
+
+    @classmethod
+    def split_query(cls, query: str) -> List[str]:
+        """按空格和标点切分查询，返回小写关键词（忽略单字符）"""
+        keywords = cls.SPLIT_PATTERN.split(query)
+        return [k.strip().lower() for k in keywords if len(k.strip()) >= cls.MIN_TERM_LENGTH]
+
+    @classmethod
+    def get_jieba(cls):
+        """加载 jieba（可选依赖，未安装时返回 None）"""
+        if not cls._jieba_loaded:
+            with cls._jieba_lock:
+                if not cls._jieba_loaded:
+                    try:
+                        import jieba
+                        jieba.setLogLevel(60)
+                        cls._jieba = jieba
+                    except ImportError:
+                        cls._jieba = None
+                    cls._jieba_loaded = True
+        return cls._jieba
+
+    @classmethod
+    def segment(cls, text: str) -> List[str]:
+        """
+        拆分中日韩文字片段
+
+        Returns:
+            jieba 搜索引擎模式分词结果（已安装时），否则为相邻字符二元组
+        """
+        jieba = cls.get_jieba()
+        if jieba is not None:
+            return [w for w in jieba.cut_for_search(text) if len(w) >= cls.MIN_TERM_LENGTH]
+        return [text[i:i + 2] for i in range(len(text) - 1)]
+
+    @classmethod
+    def expand_terms(cls, keywords: List[str], matches) -> List[str]:
+        """
+        对整体无匹配的中文关键词回退拆分
+
+        Args:
+            keywords: split_query 的结果
+            matches: 函数 (term) -> 索引中是否存在该词项
+
+        Returns:
+            最终检索词项
+        """
+        terms = []
+        for keyword in keywords:
+            if not cls.CJK_PATTERN.search(keyword) or matches(keyword):
+                terms.append(keyword)
+                continue
+
+            for run in cls.SCRIPT_RUN_PATTERN.findall(keyword):
+                if len(run) < cls.MIN_TERM_LENGTH:
+                    continue
+                if not cls.CJK_PATTERN.match(run) or matches(run):
+                    pieces = [run]
+                else:
+                    pieces = [w for w in cls.segment(run) if matches(w)]
+                    if not pieces and cls.get_jieba() is not None:
+                        # 词典分词无匹配时再尝试二元组
+                        pieces = [run[i:i + 2] for i in range(len(run) - 1) if matches(run[i:i + 2])]
+                terms.extend(p for p in pieces if p not in terms)
+        return terms
+
+
+class VarByte:
+    """
+    变长字节整数编码（LEB128：每字节低 7 位存数据，最高位表示后面还有字节）
+
+    倒排表中的 doc_id 和位置都以差值存储，绝大多数小于 128，只占一个字节。
+    """
+
+    @staticmethod
+    def encode(value: int, out: bytearray):
+        """编码一个非负整数并追加到 out"""
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    @staticmethod
+    def read(buffer, pos: int) -> Tuple[int, int]:
+        """从 pos 读取一个整数，返回 (值, 下一个位置)"""
+        byte = buffer[pos]
+        if byte < 0x80:
+            return byte, pos + 1
+        value = byte & 0x7F
+        shift = 7
+        pos += 1
+        while True:
+            byte = buffer[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, pos
+            shift += 7
+
+    @classmethod
+    def decode(cls, buffer, start: int, end: int) -> List[int]:
+        """解码 [start, end) 内的全部整数（全部为单字节时直接转换）"""
+        chunk = buffer[start:end]
+        if not chunk:
+            return []
+        if max(chunk) < 0x80:
+            return list(chunk)
+        values = []
+        pos = 0
+        while pos < len(chunk):
+            value, pos = cls.read(chunk, pos)
+            values.append(value)
+        return values
+
+
+class TermDictionary:
+    """
+    有序词典（内存映射，检索快照与全文索引共用）
+
+    定长记录（词元字符串偏移, 倒排表偏移）按词元 UTF-8 字节序排列，末尾另有一条哨兵记录；
+    词元字符串和倒排表各自连续存放，长度由相邻记录相减得到，查询时二分查找。
+    """
+
+    RECORD = struct.Struct('<IQ')
+
+    def __init__(self, buffer, count: int, records_offset: int, heap_offset: int, postings_offset: int):
+        """
+        Args:
+            buffer: 文件内容（mmap 或 bytes）
+            count: 词元数
+            records_offset / heap_offset / postings_offset: 记录、词元字符串、倒排表的起始偏移
+        """
+        self.buffer = buffer
+        self.count = count
+        self._records_offset = records_offset
+        self._heap_offset = heap_offset
+        self._postings_offset = postings_offset
+
+    def _record(self, index: int) -> Tuple[int, int]:
+        return self.RECORD.unpack_from(self.buffer, self._records_offset + index * self.RECORD.size)
+
+    def _key(self, index: int) -> bytes:
+        start = self._record(index)[0]
+        end = self._record(index + 1)[0]
+        return self.buffer[self._heap_offset + start:self._heap_offset + end]
+
+    def _range(self, index: int) -> Tuple[int, int]:
+        start = self._record(index)[1]
+        end = self._record(index + 1)[1]
+        return self._postings_offset + start, self._postings_offset + end
+
+    def find(self, term: str) -> Optional[Tuple[int, int]]:
+        """返回词元倒排表在文件中的区间 [起始, 结束)，不存在时返回 None"""
+        key = term.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.count and self._key(low) == key:
+            return self._range(low)
+        return None
+
+    def items(self):
+        """遍历词典，生成 (词元, 倒排表起始, 倒排表结束)"""
+        for index in range(self.count):
+            yield (self._key(index).decode('utf-8'),) + self._range(index)
+
+    @classmethod
+    def serialize(cls, postings: Dict[str, bytes]) -> Tuple[bytes, bytes, bytes]:
+        """
+        生成词典
+
+        Returns:
+            (定长记录, 词元字符串, 倒排表)
+        """
+        records = bytearray()
+        heap = bytearray()
+        blob = bytearray()
+        for key, term in sorted((term.encode('utf-8'), term) for term in postings):
+            records += cls.RECORD.pack(len(heap), len(blob))
+            heap += key
+            blob += postings[term]
+        records += cls.RECORD.pack(len(heap), len(blob))
+        return bytes(records), bytes(heap), bytes(blob)
+
+
+class LinkResolver:
+    """
+    wikilink 解析索引（按 Obsidian 的链接解析规则）
+
+    链接文本不区分大小写，Markdown 文档省略 .md 扩展名：
+    - [[./笔记]]、[[../文件夹/笔记]] 相对来源文档所在文件夹解析
+    - [[文件夹/笔记]] 依次匹配：知识库根目录下的完整路径、来源文件夹下的相对路径、
+      以「文件夹/笔记」结尾的路径
+    - [[笔记]] 匹配任意文件夹下文件名为「笔记」的文档
+    - 多个文档同名时，依次优先：与来源文档同一文件夹、路径层级最浅（再按路径排序）
+    - 以上均未命中时匹配 frontmatter 中的别名（aliases）
+
+    每次扫描按路径、文件名、别名建立一次索引，出链、反向链接和检索时的链接扩展共用，
+    每个链接的解析只比较同名文档。
+    """
+
+    def __init__(self, documents: List[Dict]):
+        """
+        Args:
+            documents: 文档列表（需包含 'path' 字段，可选 'aliases'），解析结果为列表下标
+        """
+        self.keys: List[str] = []
+        self._by_key: Dict[str, int] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._by_alias: Dict[str, List[int]] = {}
+        for doc_id, doc in enumerate(documents):
+            key = self.normalize(str(doc.get('path', '')))
+            self.keys.append(key)
+            self._by_key.setdefault(key, doc_id)
+            self._by_name.setdefault(key.rsplit('/', 1)[-1], []).append(doc_id)
+            for alias in doc.get('aliases', []) or []:
+                alias_key = self.normalize(str(alias))
+                if alias_key:
+                    self._by_alias.setdefault(alias_key, []).append(doc_id)
+
+    @staticmethod
+    def normalize(link: str) -> str:
+        """链接文本 / 文档路径转换为比较用的键（小写、去掉 .md 扩展名和首尾斜杠）"""
+        key = link.strip().replace('\\', '/').strip('/').lower()
+        if key.endswith('.md'):
+            key = key[:-3]
+        return key
+
+    def _closest(self, candidates: List[int], folder: str) -> int:
+        """同名文档消歧：同一文件夹优先，其次路径层级最浅"""
+        def preference(doc_id: int):
+            key = self.keys[doc_id]
+            return (key.rpartition('/')[0] != folder, key.count('/'), key)
+
+        return min(candidates, key=preference)
+
+    def resolve(self, link: str, source_path: str = '') -> Optional[int]:
+        """
+        解析单个链接
+
+        Args:
+            link: 链接目标（不含 #section 和 |alias）
+            source_path: 来源文档路径（相对路径和同名文档消歧的依据）
+
+        Returns:
+            目标文档下标，无法解析时返回 None
+        """
+        return self._resolve(link, self.normalize(source_path).rpartition('/')[0])
+
+    def _resolve(self, link: str, folder: str) -> Optional[int]:
+        raw = link.strip().replace('\\', '/')
+        target = self.normalize(raw)
+        if not target:
             return None
 
-        # 截断过长内容
-        max_chars = 8000
-        if len(content) > max_chars:
-            content = content[:max_chars] + "\n... (内容已截断)"
+        # 相对路径
+        if raw.startswith('./') or raw.startswith('../'):
+            relative = posixpath.normpath(posixpath.join(folder, target))
+            return self._by_key.get(relative) if not relative.startswith('..') else None
+
+        if '/' in target:
+            if target in self._by_key:
+                return self._by_key[target]
+            if folder and f"{folder}/{target}" in self._by_key:
+                return self._by_key[f"{folder}/{target}"]
+
+        candidates = self._by_name.get(target.rsplit('/', 1)[-1], [])
+        if '/' in target:
+            candidates = [doc_id for doc_id in candidates
+                          if self.keys[doc_id] == target or self.keys[doc_id].endswith('/' + target)]
+        if not candidates:
+            candidates = self._by_alias.get(target, [])
+        if len(candidates) <= 1:
+            return candidates[0] if candidates else None
+        return self._closest(candidates, folder)
+
+    def targets(self, links: List[str], source_path: str = '') -> List[int]:
+        """解析文档的全部出链，返回去重后的目标下标（保持链接顺序，忽略无法解析的链接）"""
+        folder = self.normalize(source_path).rpartition('/')[0]
+        resolved = []
+        for link in links or []:
+            doc_id = self._resolve(str(link), folder)
+            if doc_id is not None and doc_id not in resolved:
+                resolved.append(doc_id)
+        return resolved
+
+
+class LinkGraph:
+    """
+    知识库链接图
 
-        prompt = f"""请分析以下文档，生成：
-1. 一句话摘要（50-100字）
-2. 5-10个关键词（具有检索价值）
-3. 3-5个主题标签（反映文档类别）
+    节点为 Markdown 文档，边为 LinkResolver 解析后的 wikilink（有向、去重、忽略自链接）。
+    提供 PageRank、弱连通分量、孤立笔记（无出链也无反向链接）和枢纽笔记（出链最多）。
 
-文档内容：
-{content}
+    PageRank 以稀疏矩阵向量乘迭代：已安装 SciPy 时使用 CSR 矩阵，只有 NumPy 时用
+    numpy.bincount 按边累加，都没有时退化为纯 Python 按入边求和，三者结果一致。
+    无出链的节点把分数均匀分给所有节点。
+    """
 
-请严格按以下 YAML 格式输出（不要有其他内容）：
-summary: "摘要内容"
-keywords:
-  - 关键词1
-  - 关键词2
-topics:
-  - 主题1
-  - 主题2"""
+    DAMPING = 0.85
+    TOLERANCE = 1e-6
+    MAX_ITERATIONS = 100
+
+    def __init__(self, documents: List[Dict]):
+        """
+        Args:
+            documents: Markdown 文档列表（需包含 'path'，可选 'links'、'aliases'），节点编号为列表下标
+        """
+        self.paths = [str(doc.get('path', '')) for doc in documents]
+        resolver = LinkResolver(documents)
+        edges = set()
+        for source, doc in enumerate(documents):
+            for target in resolver.targets(doc.get('links', []), self.paths[source]):
+                if target != source:
+                    edges.add((source, target))
+        self.edges = sorted(edges)
+        self.out_degree = [0] * len(documents)
+        self.in_degree = [0] * len(documents)
+        for source, target in self.edges:
+            self.out_degree[source] += 1
+            self.in_degree[target] += 1
+
+    @property
+    def node_count(self) -> int:
+        return len(self.paths)
+
+    def pagerank(self) -> List[float]:
+        """
+        计算 PageRank（各节点分数之和为 1）
+
+        Returns:
+            按节点编号排列的分数列表
+        """
+        if not self.node_count:
+            return []
+        try:
+            import numpy
+        except ImportError:
+            return self._pagerank_python()
+        return self._pagerank_numpy(numpy)
+
+    def _pagerank_numpy(self, numpy) -> List[float]:
+        n = self.node_count
+        sources = numpy.fromiter((s for s, _ in self.edges), dtype=numpy.int64, count=len(self.edges))
+        targets = numpy.fromiter((t for _, t in self.edges), dtype=numpy.int64, count=len(self.edges))
+        out_degree = numpy.asarray(self.out_degree, dtype=numpy.float64)
+        weights = 1.0 / out_degree[sources] if len(self.edges) else numpy.zeros(0)
+        dangling = out_degree == 0
+
+        try:
+            from scipy.sparse import csr_matrix
+            matrix = csr_matrix((weights, (targets, sources)), shape=(n, n))
+
+            def propagate(rank):
+                return matrix @ rank
+        except ImportError:
+            def propagate(rank):
+                return numpy.bincount(targets, weights=rank[sources] * weights, minlength=n)
+
+        rank = numpy.full(n, 1.0 / n)
+        for _ in range(self.MAX_ITERATIONS):
+            base = (1.0 - self.DAMPING + self.DAMPING * rank[dangling].sum()) / n
+            updated = self.DAMPING * propagate(rank) + base
+            delta = numpy.abs(updated - rank).sum()
+            rank = updated
+            if delta < self.TOLERANCE:
+                break
+        return rank.tolist()
+
+    def _pagerank_python(self) -> List[float]:
+        n = self.node_count
+        incoming: List[List[int]] = [[] for _ in range(n)]
+        for source, target in self.edges:
+            incoming[target].append(source)
+        dangling = [node for node in range(n) if not self.out_degree[node]]
+        inverse_degree = [1.0 / degree if degree else 0.0 for degree in self.out_degree]
+
+        rank = [1.0 / n] * n
+        for _ in range(self.MAX_ITERATIONS):
+            share = list(map(float.__mul__, rank, inverse_degree))
+            base = (1.0 - self.DAMPING + self.DAMPING * sum(rank[node] for node in dangling)) / n
+            updated = [base + self.DAMPING * sum(map(share.__getitem__, sources)) for sources in incoming]
+            delta = sum(map(abs, map(float.__sub__, updated, rank)))
+            rank = updated
+            if delta < self.TOLERANCE:
+                break
+        return rank
+
+    def components(self) -> List[List[int]]:
+        """
+        弱连通分量（忽略边的方向）
+
+        Returns:
+            节点编号列表，按分量大小降序（同样大小按首个路径排序）
+        """
+        parent = list(range(self.node_count))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for source, target in self.edges:
+            root_a, root_b = find(source), find(target)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups: Dict[int, List[int]] = {}
+        for node in range(self.node_count):
+            groups.setdefault(find(node), []).append(node)
+        return sorted(groups.values(), key=lambda nodes: (-len(nodes), self.paths[nodes[0]]))
+
+    def orphans(self) -> List[int]:
+        """孤立笔记：没有可解析的出链，也没有被其他笔记链接"""
+        return [node for node in range(self.node_count)
+                if not self.out_degree[node] and not self.in_degree[node]]
+
+    def hubs(self, limit: int = 10) -> List[int]:
+        """枢纽笔记：出链最多的笔记（如 MOC / 目录页）"""
+        nodes = [node for node in range(self.node_count) if self.out_degree[node]]
+        nodes.sort(key=lambda node: (-self.out_degree[node], -self.in_degree[node], self.paths[node]))
+        return nodes[:limit]
+
+
+class SearchIndex:
+    """
+    检索快照（_index.yaml 的只读旁路文件）
+
+    以字符二元组（bigram，见 Tokenizer）为词项，倒排表记录文档编号和命中字段标记。
+    检索时只读取查询关键词对应的倒排表筛选候选文档，再交给原有评分函数打分，
+    因此排序结果与逐个文档扫描完全一致。
+
+    文件以内存映射方式打开（多个进程共享页缓存），不整体解析：
+    - 文档表为定长记录，保存链接图中心度（排序的次级依据），并指向字符串区中的评分字段
+      （文件名、路径、类型、摘要、关键词、标签、出链）和完整 JSON 记录；打分只解码候选文档的评分字段，
+      完整记录仅在返回前 top_k 条结果时解码
+    - 按路径排序的 doc_id 数组，支持按路径二分查找
+    - 出链邻接表：构建时用 LinkResolver 解析每个文档的 wikilink，存储目标 doc_id，
+      检索时的链接扩展只需按 doc_id 读取
+    - 倒排表经 TermDictionary 按 bigram 查找，表项差值以 VarByte 编码
+
+    同时保存构建时统计的文档总数和各字段平均长度，供 BM25F 评分使用。
+
+    存储位置: <知识库>/.knowledge-index/search_index.idx
+    倒排表项: doc_id << FIELD_BITS | 字段标记（按 doc_id 递增，存储差值）
+    """
+
+    VERSION = 5
+    MAGIC = b'KISI'
+
+    # 魔数, 版本, 来源大小, 来源修改时间, 文档数, Markdown 文档数, 词元数,
+    # 统计偏移, 统计长度, 文档表偏移, 路径序偏移, 字符串区偏移, 邻接表偏移, 链接目标偏移,
+    # 词典偏移, 词元字符串偏移, 倒排表偏移
+    HEADER = struct.Struct('<4sIQqIIIQQQQQQQQQQ')
+    SOURCE = struct.Struct('<Qq')
+    SOURCE_OFFSET = 8
+    # 字符串区偏移, 中心度 + 各段长度：文件名, 路径, 类型, 摘要, 关键词, 标签, 出链, 完整 JSON
+    RECORD = struct.Struct('<Qd8I')
+    LIST_SEPARATOR = '\x1f'
+
+    FIELD_FILENAME = 1
+    FIELD_PATH = 2
+    FIELD_SUMMARY = 4
+    FIELD_KEYWORDS = 8
+    FIELD_TAGS = 16
+    FIELD_BITS = 5
+    FIELDS = (FIELD_FILENAME, FIELD_PATH, FIELD_SUMMARY, FIELD_KEYWORDS, FIELD_TAGS)
+
+    def __init__(self, buffer):
+        """
+        初始化检索索引
+
+        Args:
+            buffer: 快照文件内容（mmap 或 bytes）
+        """
+        self.buffer = buffer
+        (_, _, source_size, source_mtime, self.document_count, self.markdown_count, term_count,
+         stats_offset, stats_length, self._records_offset, self._path_order_offset, self._heap_offset,
+         self._link_index_offset, self._link_targets_offset, dict_offset, term_heap_offset, postings_offset) = self.HEADER.unpack_from(buffer, 0)
+        self.source = {"size": source_size, "mtime_ns": source_mtime}
+        self.stats = json.loads(bytes(buffer[stats_offset:stats_offset + stats_length]).decode('utf-8'))
+        self.dictionary = TermDictionary(buffer, term_count, dict_offset, term_heap_offset, postings_offset)
+        self._df_cache: Dict[str, int] = {}
+
+    @staticmethod
+    def get_path(kb_path: str) -> str:
+        """获取旁路索引文件路径"""
+        return os.path.join(kb_path, ".knowledge-index", "search_index.idx")
+
+    @staticmethod
+    def get_legacy_path(kb_path: str) -> str:
+        """旧版 JSON 旁路索引路径（生成新快照后删除）"""
+        return os.path.join(kb_path, ".knowledge-index", "search_index.json")
+
+    @staticmethod
+    def source_signature(index_path: str) -> Dict[str, int]:
+        """_index.yaml 的签名（大小 + 修改时间），用于判断旁路索引是否过期"""
+        stat = os.stat(index_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    grams = staticmethod(Tokenizer.grams)
+
+    @classmethod
+    def field_texts(cls, doc: Dict) -> List[Tuple[int, List[str]]]:
+        """
+        按字段返回文档的待索引文本（与 _calculate_relevance_score 的匹配字段一致）
+
+        Returns:
+            [(字段标记, [小写文本, ...]), ...]
+        """
+        path = doc.get('path', '').lower()
+        path_parts = [p for p in path.split('/') if p]
+        return [
+            (cls.FIELD_FILENAME, [doc.get('filename', doc.get('path', '')).lower()]),
+            (cls.FIELD_PATH, path_parts[:-1] if len(path_parts) > 1 else []),
+            (cls.FIELD_SUMMARY, [(doc.get('summary') or '').lower()]),
+            (cls.FIELD_KEYWORDS, [str(k).lower() for k in doc.get('keywords', []) or []]),
+            (cls.FIELD_TAGS, [str(t).lower() for t in doc.get('tags', []) or []]),
+        ]
+
+    @staticmethod
+    def field_length(flag: int, texts: List[str]) -> int:
+        """
+        字段长度：文件名、摘要按字符数（中文无空格分词），路径按文件夹层数，
+        关键词、标签按个数
+        """
+        if flag in (SearchIndex.FIELD_FILENAME, SearchIndex.FIELD_SUMMARY):
+            return sum(len(text) for text in texts)
+        return len(texts)
+
+    @classmethod
+    def compute_stats(cls, documents: List[Dict]) -> Dict[str, Any]:
+        """统计文档总数和各字段平均长度"""
+        totals = {flag: 0 for flag in cls.FIELDS}
+        for doc in documents:
+            for flag, texts in cls.field_texts(doc):
+                totals[flag] += cls.field_length(flag, texts)
+        count = len(documents)
+        return {
+            "documents": count,
+            "avg_field_lengths": {str(flag): (total / count if count else 0.0)
+                                  for flag, total in totals.items()}
+        }
+
+    @classmethod
+    def field_term_count(cls, flag: int, texts: List[str], term: str) -> int:
+        """
+        词项在字段中的出现次数（与评分的匹配规则一致：
+        文件名、路径、摘要按子串计数，关键词、标签按完全相等计数）
+        """
+        if flag in (cls.FIELD_KEYWORDS, cls.FIELD_TAGS):
+            return sum(1 for text in texts if text == term)
+        return sum(text.count(term) for text in texts)
+
+    @classmethod
+    def doc_matches(cls, doc: Dict, term: str) -> bool:
+        """文档任一字段是否命中词项"""
+        return any(cls.field_term_count(flag, texts, term) for flag, texts in cls.field_texts(doc))
+
+    def is_markdown(self, doc_id: int) -> bool:
+        """Markdown 文档在前（doc_id 0..markdown_count-1），其他格式紧随其后"""
+        return doc_id < self.markdown_count
+
+    def _record(self, doc_id: int) -> Tuple:
+        return self.RECORD.unpack_from(self.buffer, self._records_offset + doc_id * self.RECORD.size)
+
+    def _segments(self, doc_id: int) -> Tuple[int, Tuple[int, ...]]:
+        record = self._record(doc_id)
+        return self._heap_offset + record[0], record[2:]
+
+    def scoring_document(self, doc_id: int) -> Dict:
+        """
+        解码评分所需的字段（filename, path, type, summary, keywords, tags, links）
+        和中心度，供评分函数、链接扩展和排序使用，不解析完整记录
+        """
+        record = self._record(doc_id)
+        pos, lengths = self._heap_offset + record[0], record[2:]
+        values = []
+        for length in lengths[:-1]:
+            values.append(self.buffer[pos:pos + length].decode('utf-8'))
+            pos += length
+        filename, path, doc_type, summary, keywords, tags, links = values
+        separator = self.LIST_SEPARATOR
+        return {
+            "filename": filename,
+            "path": path,
+            "type": doc_type,
+            "summary": summary,
+            "keywords": keywords.split(separator) if keywords else [],
+            "tags": tags.split(separator) if tags else [],
+            "links": links.split(separator) if links else [],
+            "centrality": record[1]
+        }
+
+    def scoring_documents(self, markdown_only: bool = False) -> List[Dict]:
+        """全部文档的评分字段"""
+        count = self.markdown_count if markdown_only else self.document_count
+        return [self.scoring_document(doc_id) for doc_id in range(count)]
+
+    def document(self, doc_id: int) -> Dict:
+        """解码完整文档记录"""
+        pos, lengths = self._segments(doc_id)
+        pos += sum(lengths[:-1])
+        return json.loads(self.buffer[pos:pos + lengths[-1]].decode('utf-8'))
+
+    def documents(self) -> List[Dict]:
+        """解码全部完整文档记录"""
+        return [self.document(doc_id) for doc_id in range(self.document_count)]
+
+    def doc_id(self, doc_path: str) -> Optional[int]:
+        """按相对路径二分查找 doc_id"""
+        key = doc_path.encode('utf-8')
+        low, high = 0, self.document_count
+        while low < high:
+            mid = (low + high) // 2
+            doc_id = struct.unpack_from('<I', self.buffer, self._path_order_offset + mid * 4)[0]
+            pos, lengths = self._segments(doc_id)
+            pos += lengths[0]
+            mid_key = self.buffer[pos:pos + lengths[1]]
+            if mid_key == key:
+                return doc_id
+            if mid_key < key:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def link_targets(self, doc_id: int) -> Tuple[int, ...]:
+        """文档出链解析后的目标 doc_id（按链接顺序，已去重）"""
+        start, end = struct.unpack_from('<II', self.buffer, self._link_index_offset + doc_id * 4)
+        return struct.unpack_from(f'<{end - start}I', self.buffer, self._link_targets_offset + start * 4)
+
+    def linked_documents(self, doc_path: str) -> List[Dict]:
+        """文档出链指向的 Markdown 文档（评分字段）"""
+        doc_id = self.doc_id(doc_path)
+        if doc_id is None:
+            return []
+        return [self.scoring_document(target) for target in self.link_targets(doc_id)
+                if self.is_markdown(target)]
+
+    def document_by_path(self, doc_path: str) -> Optional[Tuple[Dict, bool]]:
+        """按相对路径查找文档，返回 (评分字段, 是否 Markdown)"""
+        doc_id = self.doc_id(doc_path)
+        if doc_id is None:
+            return None
+        return self.scoring_document(doc_id), self.is_markdown(doc_id)
+
+    def full_result(self, result: Dict) -> Dict:
+        """将基于评分字段的检索结果替换为完整记录（保留 score、doc_type、linked_from 及语义检索的分项分数）"""
+        doc = self.document(self.doc_id(result['path']))
+        for key in ('score', 'doc_type', 'linked_from', 'keyword_score', 'semantic_score'):
+            if key in result:
+                doc[key] = result[key]
+        return doc
+
+    def contains(self, term: str) -> bool:
+        """索引中是否存在命中该词项的文档（倒排表筛选后核对，找到即返回）"""
+        return any(self.doc_matches(self.scoring_document(doc_id), term) for doc_id in self.candidates([term]))
+
+    def document_frequency(self, keyword: str, term_frequency) -> int:
+        """
+        关键词的文档频率（任一字段命中即计数）
+
+        子串关键词无法在构建时枚举，因此由倒排表筛出候选后精确核对，
+        结果按关键词缓存（serve 模式下常驻内存的索引可复用）。
+
+        Args:
+            keyword: 小写关键词
+            term_frequency: 函数 (doc, keyword, is_markdown) -> 该文档的加权词频
+        """
+        if keyword not in self._df_cache:
+            self._df_cache[keyword] = sum(
+                1 for doc_id in self.candidates([keyword])
+                if term_frequency(self.scoring_document(doc_id), keyword, self.is_markdown(doc_id)) > 0)
+        return self._df_cache[keyword]
+
+    @classmethod
+    def build(cls, markdown_documents: List[Dict], other_documents: List[Dict]) -> 'SearchIndex':
+        """从文档列表构建（内存中的）检索快照"""
+        return cls(cls.serialize(markdown_documents, other_documents))
+
+    @classmethod
+    def serialize(cls, markdown_documents: List[Dict], other_documents: List[Dict],
+                  source: Optional[Dict[str, int]] = None) -> bytes:
+        """生成快照文件内容"""
+        documents = markdown_documents + other_documents
+        separator = cls.LIST_SEPARATOR
+        gram_flags: Dict[str, Dict[int, int]] = {}
+        records = bytearray()
+        heap = bytearray()
+
+        for doc_id, doc in enumerate(documents):
+            for flag, texts in cls.field_texts(doc):
+                for text in texts:
+                    for gram in cls.grams(text):
+                        doc_flags = gram_flags.setdefault(gram, {})
+                        doc_flags[doc_id] = doc_flags.get(doc_id, 0) | flag
+
+            segments = [
+                str(doc.get('filename', doc.get('path', ''))),
+                str(doc.get('path', '')),
+                str(doc.get('type', '')),
+                str(doc.get('summary') or ''),
+                separator.join(str(k) for k in doc.get('keywords', []) or []),
+                separator.join(str(t) for t in doc.get('tags', []) or []),
+                separator.join(str(link) for link in doc.get('links', []) or []),
+                json.dumps(doc, ensure_ascii=False, separators=(',', ':')),
+            ]
+            encoded = [segment.encode('utf-8') for segment in segments]
+            records += cls.RECORD.pack(len(heap), float(doc.get('centrality', 0) or 0),
+                                       *(len(segment) for segment in encoded))
+            for segment in encoded:
+                heap += segment
+
+        path_order = sorted(range(len(documents)), key=lambda i: str(documents[i].get('path', '')).encode('utf-8'))
+        path_order_blob = struct.pack(f'<{len(path_order)}I', *path_order)
+
+        resolver = LinkResolver(documents)
+        link_index = [0]
+        link_targets = []
+        for doc in documents:
+            link_targets.extend(resolver.targets(doc.get('links', []), str(doc.get('path', ''))))
+            link_index.append(len(link_targets))
+        link_index_blob = struct.pack(f'<{len(link_index)}I', *link_index)
+        link_targets_blob = struct.pack(f'<{len(link_targets)}I', *link_targets)
+
+        postings = {}
+        for gram, doc_flags in gram_flags.items():
+            encoded = bytearray()
+            previous = 0
+            for doc_id, flags in sorted(doc_flags.items()):
+                entry = (doc_id << cls.FIELD_BITS) | flags
+                VarByte.encode(entry - previous, encoded)
+                previous = entry
+            postings[gram] = encoded
+        dictionary, term_heap, postings_blob = TermDictionary.serialize(postings)
+
+        stats_blob = json.dumps(cls.compute_stats(documents), separators=(',', ':')).encode('utf-8')
+        sections = [stats_blob, bytes(records), path_order_blob, bytes(heap), link_index_blob, link_targets_blob,
+                    dictionary, term_heap, postings_blob]
+        offsets = []
+        offset = cls.HEADER.size
+        for section in sections:
+            offsets.append(offset)
+            offset += len(section)
+
+        source = source or {"size": 0, "mtime_ns": 0}
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, source["size"], source["mtime_ns"],
+                                 len(documents), len(markdown_documents), len(postings),
+                                 offsets[0], len(stats_blob), *offsets[1:])
+        return b''.join([header] + sections)
+
+    def postings(self, gram: str) -> Optional[List[int]]:
+        """解码 bigram 的倒排表（[doc_id << FIELD_BITS | 字段标记, ...]），不存在时返回 None"""
+        found = self.dictionary.find(gram)
+        if found is None:
+            return None
+        return list(accumulate(VarByte.decode(self.buffer, *found)))
+
+    def candidates(self, query_keywords: List[str]) -> set:
+        """
+        筛选候选文档
+
+        关键词是某字段的子串时，其所有 bigram 必然出现在该字段中，
+        因此对各 bigram 的字段标记取交集，非零即为候选（不会漏掉任何可得分的文档）。
+
+        Returns:
+            候选 doc_id 集合
+        """
+        mask = (1 << self.FIELD_BITS) - 1
+        result = set()
+
+        for keyword in query_keywords:
+            matched: Optional[Dict[int, int]] = None
+            for gram in self.grams(keyword):
+                entries = self.postings(gram)
+                if not entries:
+                    matched = {}
+                    break
+                gram_docs = {entry >> self.FIELD_BITS: entry & mask for entry in entries}
+                if matched is None:
+                    matched = gram_docs
+                else:
+                    matched = {doc_id: flags & gram_docs[doc_id]
+                               for doc_id, flags in matched.items()
+                               if doc_id in gram_docs and flags & gram_docs[doc_id]}
+                if not matched:
+                    break
+
+            if matched:
+                result.update(matched)
+
+        return result
+
+    def save(self, path: str, source: Dict[str, int]):
+        """写入快照文件（记录 _index.yaml 签名，先写临时文件再替换）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.buffer[:self.SOURCE_OFFSET])
+            f.write(self.SOURCE.pack(source["size"], source["mtime_ns"]))
+            f.write(self.buffer[self.SOURCE_OFFSET + self.SOURCE.size:])
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, source: Dict[str, int]) -> Optional['SearchIndex']:
+        """
+        打开快照文件（内存映射，只解析文件头和统计信息）
+
+        Windows 下映射中的文件无法被替换，因此改为一次性读入。
+
+        Returns:
+            SearchIndex；文件不存在、损坏、版本不符或与 _index.yaml 签名不一致时返回 None
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                if os.name == 'nt':
+                    buffer = f.read()
+                else:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            search_index = cls(buffer) if cls.file_version_of(buffer) == cls.VERSION else None
+        except Exception:
+            search_index = None
+        if search_index is None or search_index.source != source:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+            return None
+        return search_index
+
+    @classmethod
+    def file_version_of(cls, head: bytes) -> Optional[int]:
+        """从文件开头解析格式版本（魔数不符时返回 None）"""
+        if len(head) < 8:
+            return None
+        magic, version = struct.unpack_from('<4sI', head, 0)
+        return version if magic == cls.MAGIC else None
+
+    @classmethod
+    def file_version(cls, path: str) -> Optional[int]:
+        """只读取文件开头获取格式版本"""
+        try:
+            with open(path, 'rb') as f:
+                return cls.file_version_of(f.read(8))
+        except OSError:
+            return None
+
+
+class FullTextIndex:
+    """
+    正文全文位置索引（可选，search.fulltext 启用时与 _index.yaml 一同生成）
+
+    正文（Markdown / 文本原文，PDF / Word 经 extract_text.py 提取）按 Tokenizer.tokenize
+    切分为词元，倒排表记录词元所在文档及其位置。查询关键词按同样规则切分后要求位置
+    依次相邻，等价于在正文中查找该关键词（中文按子串，英文按整词）。
+
+    每篇文档记录建立索引时的大小和修改时间，增量更新只重新读取变化的文档。
+
+    正文同时按 Markdown 标题和 PDF 页码（extract_text.py 输出的「[第N页]」标记）切分为分块，
+    超过 CHUNK_TOKENS 个词元的分块在行边界处继续切开。分块只记录起始词元位置和锚点，
+    检索时按命中位置为每个分块单独评分，结果附带最佳分块的标题 / 页码和行号。
+
+    存储位置: <知识库>/.knowledge-index/fulltext.idx（查询时内存映射，按需读取）
+    文件结构: 文件头 | 文档列表（JSON，含分块）| 词典记录 | 词元字符串 | 倒排表（见 TermDictionary）
+    倒排表项: doc_id 差值, 位置数, 位置字节数, 位置差值...（均为 VarByte 编码）
+    分块: [起始词元位置, 起始行号, 标题, 页码]（无标题 / 页码时为 null）
+    """
+
+    VERSION = 3
+    MAGIC = b'KIFT'
+    # 魔数, 版本, 文档数, 词元数, 总词元数, 文档列表偏移, 文档列表长度, 词典偏移, 字符串偏移, 倒排表偏移
+    HEADER = struct.Struct('<4sIIIQQQQQQ')
+
+    CHUNK_TOKENS = 1000
+    HEADING_PATTERN = re.compile(r'^ {0,3}(#{1,6})\s+(.+?)(?:\s+#+)?\s*$')
+    PAGE_PATTERN = re.compile(r'^\[第(\d+)页\]\s*$')
+    FENCE_PATTERN = re.compile(r'^ {0,3}(```|~~~)')
+    # 分块评分：标题中出现的关键词额外加分
+    HEADING_BONUS = 1.0
+
+    def __init__(self, buffer):
+        """
+        初始化全文索引
+
+        Args:
+            buffer: 索引文件内容（mmap 或 bytes）
+        """
+        self.buffer = buffer
+        (_, _, self.document_count, term_count, total_length, self._docs_offset, self._docs_length,
+         dict_offset, heap_offset, postings_offset) = self.HEADER.unpack_from(buffer, 0)
+        self.dictionary = TermDictionary(buffer, term_count, dict_offset, heap_offset, postings_offset)
+        self.avg_length = total_length / self.document_count if self.document_count else 0.0
+        self._documents: Optional[List[Dict]] = None
+        self._ids_by_path: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def get_path(kb_path: str) -> str:
+        """获取全文索引文件路径"""
+        return os.path.join(kb_path, ".knowledge-index", "fulltext.idx")
+
+    @classmethod
+    def is_current(cls, path: str) -> bool:
+        """索引文件是否存在且为当前格式版本（只读取文件头，旧版本需重新生成）"""
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(8)
+        except OSError:
+            return False
+        return len(head) == 8 and struct.unpack('<4sI', head) == (cls.MAGIC, cls.VERSION)
+
+    @property
+    def documents(self) -> List[Dict]:
+        """文档列表 [{"path", "modified", "size", "length", "chunks"}]（首次访问时解析）"""
+        if self._documents is None:
+            start = self._docs_offset
+            self._documents = json.loads(bytes(self.buffer[start:start + self._docs_length]).decode('utf-8'))
+        return self._documents
+
+    def entries(self, start: int, end: int):
+        """遍历倒排表，生成 (doc_id, 位置数, 位置数据起始, 位置数据结束)，不解码位置"""
+        read = VarByte.read
+        chunk = self.buffer[start:end]
+        pos = 0
+        doc_id = 0
+        while pos < len(chunk):
+            # 三个字段多为单字节，先走快速路径
+            gap, count, size = chunk[pos], chunk[pos + 1], chunk[pos + 2]
+            if gap < 0x80 and count < 0x80 and size < 0x80:
+                pos += 3
+            else:
+                gap, pos = read(chunk, pos)
+                count, pos = read(chunk, pos)
+                size, pos = read(chunk, pos)
+            doc_id += gap
+            yield doc_id, count, start + pos, start + pos + size
+            pos += size
+
+    @classmethod
+    def build(cls, documents: List[Dict], read_text,
+              previous: Optional['FullTextIndex'] = None,
+              progress: bool = False) -> Tuple['FullTextIndex', int]:
+        """
+        构建全文索引
+
+        Args:
+            documents: 当前索引中的文档记录
+            read_text: 函数 (doc) -> 正文；返回 None 时该文档不参与全文检索
+            previous: 旧全文索引，大小和修改时间未变的文档直接复制其倒排表项（不解码位置）
+            progress: 是否显示读取进度（需读取的文档数 > 10 时生效）
+
+        Returns:
+            (全文索引, 重新读取的文档数)
+        """
+        previous_docs = {}
+        if previous is not None:
+            previous_docs = {doc['path']: (doc_id, doc) for doc_id, doc in enumerate(previous.documents)}
+
+        # 复用的文档在前（按旧 doc_id 升序编号，使复制的倒排表项仍按 doc_id 递增），需读取的文档在后
+        reused = []
+        pending = []
+        for doc in documents:
+            old_id, old_doc = previous_docs.get(doc['path'], (None, None))
+            if old_doc and old_doc['modified'] == doc.get('modified') and old_doc['size'] == doc.get('size'):
+                reused.append((old_id, old_doc))
+            else:
+                pending.append(doc)
+        reused.sort(key=lambda item: item[0])
+        new_documents = [old_doc for _, old_doc in reused]
+        remap: Dict[int, int] = {old_id: new_id for new_id, (old_id, _) in enumerate(reused)}
+
+        postings: Dict[str, bytearray] = {}
+        last_ids: Dict[str, int] = {}
+
+        def append(token: str, doc_id: int, count: int, positions: bytes):
+            out = postings.get(token)
+            if out is None:
+                out = postings[token] = bytearray()
+            VarByte.encode(doc_id - last_ids.get(token, 0), out)
+            VarByte.encode(count, out)
+            VarByte.encode(len(positions), out)
+            out += positions
+            last_ids[token] = doc_id
+
+        if remap:
+            for token, start, end in previous.dictionary.items():
+                for old_id, count, pos_start, pos_end in previous.entries(start, end):
+                    new_id = remap.get(old_id)
+                    if new_id is not None:
+                        append(token, new_id, count, previous.buffer[pos_start:pos_end])
+
+        reporter = ProgressReporter(len(pending), "全文索引") if progress and len(pending) > 10 else None
+        for doc in pending:
+            text = read_text(doc)
+            tokens, chunks = cls.tokenize_chunks(text) if text else ([], [])
+            doc_id = len(new_documents)
+            new_documents.append({"path": doc['path'], "modified": doc.get('modified'),
+                                  "size": doc.get('size'), "length": len(tokens), "chunks": chunks})
+
+            token_positions: Dict[str, List[int]] = {}
+            for position, token in enumerate(tokens):
+                token_positions.setdefault(token, []).append(position)
+            for token, positions in token_positions.items():
+                encoded = bytearray()
+                previous_position = 0
+                for position in positions:
+                    VarByte.encode(position - previous_position, encoded)
+                    previous_position = position
+                append(token, doc_id, len(positions), encoded)
+
+            if reporter:
+                reporter.update(1, doc['path'][:40] + ('...' if len(doc['path']) > 40 else ''))
+        if reporter:
+            reporter.complete(f"读取 {len(pending)} 个文档")
+
+        return cls(cls.serialize(new_documents, postings)), len(pending)
+
+    @classmethod
+    def tokenize_chunks(cls, text: str) -> Tuple[List[str], List[List]]:
+        """
+        切分正文词元并按标题 / 页码分块（逐行切分，结果与整体 Tokenizer.tokenize 相同）
+
+        代码块内的「#」行不作为标题；标题行本身属于它开启的分块；不含词元的分块被后一个分块替换（末尾的丢弃）。
+
+        Returns:
+            (词元列表, 分块列表 [[起始词元位置, 起始行号, 标题, 页码], ...])
+        """
+        tokens: List[str] = []
+        chunks: List[List] = []
+        heading = page = None
+        in_fence = False
+        for line_number, line in enumerate(text.split('\n'), 1):
+            boundary = False
+            if cls.FENCE_PATTERN.match(line):
+                in_fence = not in_fence
+            elif not in_fence:
+                match = cls.HEADING_PATTERN.match(line)
+                if match:
+                    heading = match.group(2)
+                    boundary = True
+                else:
+                    match = cls.PAGE_PATTERN.match(line)
+                    if match:
+                        page = int(match.group(1))
+                        boundary = True
+
+            if not chunks or boundary or len(tokens) - chunks[-1][0] >= cls.CHUNK_TOKENS:
+                chunk = [len(tokens), line_number, heading, page]
+                if chunks and chunks[-1][0] == len(tokens):
+                    chunks[-1] = chunk
+                else:
+                    chunks.append(chunk)
+            tokens.extend(Tokenizer.tokenize(line))
+        if len(chunks) > 1 and chunks[-1][0] == len(tokens):
+            chunks.pop()
+        return tokens, chunks
+
+    @classmethod
+    def serialize(cls, documents: List[Dict], postings: Dict[str, bytearray]) -> bytes:
+        """生成索引文件内容"""
+        docs_blob = json.dumps(documents, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        dictionary, heap, blob = TermDictionary.serialize(postings)
+
+        docs_offset = cls.HEADER.size
+        dict_offset = docs_offset + len(docs_blob)
+        heap_offset = dict_offset + len(dictionary)
+        postings_offset = heap_offset + len(heap)
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(documents), len(postings),
+                                 sum(doc['length'] for doc in documents), docs_offset, len(docs_blob),
+                                 dict_offset, heap_offset, postings_offset)
+        return b''.join((header, docs_blob, dictionary, heap, blob))
+
+    def phrase_counts(self, keyword: str) -> Dict[int, int]:
+        """
+        关键词在各文档正文中的出现次数
+
+        单个词元直接读取位置数；多个词元先按文档求交（从最短的倒排表开始，
+        跳过位置数据），只对共同文档解码位置并核对相邻关系。
+
+        Returns:
+            {doc_id: 次数}
+        """
+        tokens = Tokenizer.tokenize(keyword)
+        ranges = [self.dictionary.find(token) for token in tokens]
+        if not tokens or None in ranges:
+            return {}
+        if len(tokens) == 1:
+            return {doc_id: count for doc_id, count, _, _ in self.entries(*ranges[0])}
+
+        order = sorted(range(len(tokens)), key=lambda i: ranges[i][1] - ranges[i][0])
+        located: Dict[int, Dict[int, Tuple[int, int]]] = {}
+        docs: Optional[set] = None
+        for i in order:
+            located[i] = {doc_id: (pos_start, pos_end)
+                          for doc_id, _, pos_start, pos_end in self.entries(*ranges[i])
+                          if docs is None or doc_id in docs}
+            docs = set(located[i]) if docs is None else docs & located[i].keys()
+            if not docs:
+                return {}
+
+        counts = {}
+        for doc_id in docs:
+            starts = self._phrase_starts(located, order, doc_id)
+            if starts:
+                counts[doc_id] = len(starts)
+        return counts
+
+    def _phrase_starts(self, located: Dict[int, Dict[int, Tuple[int, int]]], order: List[int],
+                       doc_id: int) -> set:
+        """解码文档中各词元的位置，返回词元依次相邻的起始位置"""
+        starts: Optional[set] = None
+        for i in order:
+            pos_start, pos_end = located[i][doc_id]
+            shifted = {position - i for position in accumulate(VarByte.decode(self.buffer, pos_start, pos_end))}
+            starts = shifted if starts is None else starts & shifted
+            if not starts:
+                break
+        return starts or set()
+
+    def phrase_positions(self, keyword: str, doc_ids: set) -> Dict[int, List[int]]:
+        """
+        关键词在指定文档正文中的出现位置（词元序号）
+
+        Returns:
+            {doc_id: [起始位置, ...]}（升序）
+        """
+        tokens = Tokenizer.tokenize(keyword)
+        ranges = [self.dictionary.find(token) for token in tokens]
+        if not tokens or None in ranges or not doc_ids:
+            return {}
+
+        located: Dict[int, Dict[int, Tuple[int, int]]] = {}
+        for i, token_range in enumerate(ranges):
+            located[i] = {doc_id: (pos_start, pos_end)
+                          for doc_id, _, pos_start, pos_end in self.entries(*token_range)
+                          if doc_id in doc_ids}
+            doc_ids = doc_ids & located[i].keys()
+            if not doc_ids:
+                return {}
+
+        order = list(range(len(tokens)))
+        positions = {}
+        for doc_id in doc_ids:
+            starts = self._phrase_starts(located, order, doc_id)
+            if starts:
+                positions[doc_id] = sorted(starts)
+        return positions
+
+    def best_chunks(self, doc_paths: List[str], keywords: List[str]) -> Dict[str, Dict]:
+        """
+        为每个文档选出与查询最相关的分块
+
+        分块得分 = Σ 命中关键词的 (1 + ln 次数) + 标题包含的关键词数 × HEADING_BONUS，
+        同分时取靠前的分块；正文和标题都未命中的文档不返回。
+
+        Returns:
+            {文档路径: {"heading", "page", "line", "score"}}（标题 / 页码为空时省略）
+        """
+        if self._ids_by_path is None:
+            self._ids_by_path = {doc['path']: doc_id for doc_id, doc in enumerate(self.documents)}
+        doc_ids = {self._ids_by_path[path] for path in doc_paths if path in self._ids_by_path}
+        doc_ids = {doc_id for doc_id in doc_ids if self.documents[doc_id].get('chunks')}
+        if not doc_ids:
+            return {}
+
+        hits: Dict[int, Dict[str, List[int]]] = {}
+        for keyword in keywords:
+            for doc_id, positions in self.phrase_positions(keyword, doc_ids).items():
+                hits.setdefault(doc_id, {})[keyword] = positions
+
+        best = {}
+        for doc_id in doc_ids:
+            chunks = self.documents[doc_id]['chunks']
+            starts = [chunk[0] for chunk in chunks]
+            scores = [0.0] * len(chunks)
+            for positions in hits.get(doc_id, {}).values():
+                counts: Dict[int, int] = {}
+                for position in positions:
+                    index = bisect.bisect_right(starts, position) - 1
+                    counts[index] = counts.get(index, 0) + 1
+                for index, count in counts.items():
+                    scores[index] += 1 + math.log(count)
+            for index, chunk in enumerate(chunks):
+                heading = (chunk[2] or '').lower()
+                if heading:
+                    scores[index] += self.HEADING_BONUS * sum(1 for keyword in keywords if keyword in heading)
+
+            index = max(range(len(chunks)), key=lambda i: (scores[i], -i))
+            if scores[index] <= 0:
+                continue
+            _, line, heading, page = chunks[index]
+            chunk = {"line": line, "score": round(scores[index], 4)}
+            if heading:
+                chunk['heading'] = heading
+            if page is not None:
+                chunk['page'] = page
+            best[self.documents[doc_id]['path']] = chunk
+        return best
+
+    def contains(self, keyword: str) -> bool:
+        """正文中是否出现关键词"""
+        return bool(self.phrase_counts(keyword))
+
+    def search(self, keywords: List[str]) -> Dict[str, Dict[str, int]]:
+        """
+        查找正文命中的文档（各关键词结果取并集）
+
+        Returns:
+            {文档路径: {关键词: 出现次数}}
+        """
+        hits: Dict[str, Dict[str, int]] = {}
+        for keyword in keywords:
+            for doc_id, count in self.phrase_counts(keyword).items():
+                hits.setdefault(self.documents[doc_id]['path'], {})[keyword] = count
+        return hits
+
+    def length(self, doc_path: str) -> int:
+        """文档正文的词元数（未建立全文索引的文档为 0）"""
+        if self._ids_by_path is None:
+            self._ids_by_path = {doc['path']: doc_id for doc_id, doc in enumerate(self.documents)}
+        doc_id = self._ids_by_path.get(doc_path)
+        return self.documents[doc_id]['length'] if doc_id is not None else 0
+
+    def document_chunks(self, doc_path: str) -> List[List]:
+        """文档的分块列表 [[起始词元位置, 起始行号, 标题, 页码], ...]（未建立全文索引的文档为空）"""
+        if self._ids_by_path is None:
+            self._ids_by_path = {doc['path']: doc_id for doc_id, doc in enumerate(self.documents)}
+        doc_id = self._ids_by_path.get(doc_path)
+        return self.documents[doc_id].get('chunks', []) if doc_id is not None else []
+
+    def save(self, path: str):
+        """写入全文索引文件（先写临时文件再替换）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.buffer)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        """释放内存映射（替换文件前调用）"""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    @classmethod
+    def load(cls, path: str) -> Optional['FullTextIndex']:
+        """
+        打开全文索引文件（内存映射，只读取文件头）
+
+        Windows 下映射中的文件无法被替换，因此改为一次性读入。
+
+        Returns:
+            FullTextIndex；文件不存在、损坏或版本不符时返回 None
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                if os.name == 'nt':
+                    buffer = f.read()
+                else:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(buffer) < cls.HEADER.size or struct.unpack_from('<4sI', buffer, 0) != (cls.MAGIC, cls.VERSION):
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+            return None
+        return cls(buffer)
+
+
+class VectorIndex:
+    """
+    语义向量索引（可选，search.semantic 启用时与 _index.yaml 一同生成，完全离线）
+
+    每个文档用文件名、文件夹、摘要、关键词、主题和标签（启用全文索引时再加上正文开头的
+    BODY_CHARS 个字符）拼成一段文本，再转换为单位向量：
+    - 配置了 search.semantic_model 时，使用本地已下载的 sentence-transformers 模型
+      （强制离线加载，不访问网络；加载失败时回退到下一种）
+    - 否则使用哈希 TF-IDF + SVD（潜在语义分析，仅需 NumPy）：Tokenizer.tokenize 的词元按 CRC32
+      哈希到固定数量的桶，TF-IDF 加权后用随机化 SVD 降维，同义、相关的词因共现而在低维空间中接近
+
+    向量以 float16 矩阵保存；文档数超过 IVF_THRESHOLD 时额外训练倒排文件（IVF）：
+    球面 k-means 聚为 √N 个簇，查询只扫描最接近的 nprobe 个簇，否则逐个计算余弦相似度。
+    使用模型时，摘要文本未变的文档直接复用旧向量。
+
+    存储位置: <知识库>/.knowledge-index/vectors.idx（查询时内存映射）
+    文件结构: 文件头 | 元数据（JSON）| 文档向量 float16 | idf float32 + 投影矩阵 float16（仅 SVD）|
+              IVF 簇中心 float32、簇偏移、按簇排列的文档编号
+    """
+
+    VERSION = 1
+    MAGIC = b'KIVE'
+    # 魔数, 版本, 文档数, 维度, 簇数, 元数据偏移, 元数据长度, 向量偏移, 投影矩阵偏移, IVF 偏移
+    HEADER = struct.Struct('<4sIIIIQQQQQ')
+
+    BUCKETS = 1 << 14
+    DEFAULT_DIM = 128
+    # 参与向量化的正文长度上限（与 AI 摘要截取的长度一致）
+    BODY_CHARS = 8000
+    # 语义结果的默认最低余弦相似度（search.semantic_min_score）
+    DEFAULT_MIN_SCORE = 0.2
+    IVF_THRESHOLD = 20000
+    DEFAULT_NPROBE = 8
+    POWER_ITERATIONS = 2
+    BLOCK_ROWS = 1024
+
+    _models: Dict[str, Any] = {}
+    _model_lock = threading.Lock()
+
+    def __init__(self, buffer, numpy):
+        """
+        初始化向量索引
+
+        Args:
+            buffer: 索引文件内容（mmap 或 bytes）
+            numpy: numpy 模块
+        """
+        self.buffer = buffer
+        self.numpy = numpy
+        (_, _, self.count, self.dim, self.nlist, meta_offset, meta_length, matrix_offset,
+         projection_offset, ivf_offset) = self.HEADER.unpack_from(buffer, 0)
+        self.meta = json.loads(bytes(buffer[meta_offset:meta_offset + meta_length]).decode('utf-8'))
+        self.embedder = self.meta['embedder']
+        self.paths: List[str] = self.meta['paths']
+        self._ids_by_path = {path: doc_id for doc_id, path in enumerate(self.paths)}
+        self.matrix = numpy.frombuffer(buffer, dtype=numpy.float16, count=self.count * self.dim,
+                                       offset=matrix_offset).reshape(self.count, self.dim)
+        self.projection = self._idf = None
+        if projection_offset:
+            buckets = self.embedder['buckets']
+            self._idf = numpy.frombuffer(buffer, dtype=numpy.float32, count=buckets, offset=projection_offset)
+            self.projection = numpy.frombuffer(buffer, dtype=numpy.float16, count=buckets * self.dim,
+                                               offset=projection_offset + buckets * 4).reshape(buckets, self.dim)
+        self.centroids = None
+        if self.nlist:
+            self.centroids = numpy.frombuffer(buffer, dtype=numpy.float32, count=self.nlist * self.dim,
+                                              offset=ivf_offset).reshape(self.nlist, self.dim)
+            offsets_offset = ivf_offset + self.nlist * self.dim * 4
+            self._list_offsets = numpy.frombuffer(buffer, dtype=numpy.uint32, count=self.nlist + 1,
+                                                  offset=offsets_offset)
+            self._list_members = numpy.frombuffer(buffer, dtype=numpy.uint32, count=self.count,
+                                                  offset=offsets_offset + (self.nlist + 1) * 4)
+
+    @staticmethod
+    def get_path(kb_path: str) -> str:
+        """获取向量索引文件路径"""
+        return os.path.join(kb_path, ".knowledge-index", "vectors.idx")
+
+    @staticmethod
+    def get_numpy():
+        """加载 NumPy（可选依赖，未安装时返回 None）"""
+        try:
+            import numpy
+        except ImportError:
+            return None
+        return numpy
+
+    @classmethod
+    def embedding_text(cls, doc: Dict, body: Optional[str] = None) -> str:
+        """文档的向量化文本：文件名（去扩展名）、文件夹、摘要、关键词、主题、标签，以及正文开头（提供时）"""
+        path_parts = [p for p in str(doc.get('path', '')).split('/') if p]
+        filename = str(doc.get('filename', path_parts[-1] if path_parts else ''))
+        parts = [filename.rsplit('.', 1)[0]] + path_parts[:-1]
+        parts.append(str(doc.get('summary') or ''))
+        for field in ('keywords', 'topics', 'tags'):
+            parts.extend(str(value) for value in doc.get(field, []) or [])
+        if body:
+            parts.append(body[:cls.BODY_CHARS])
+        return '\n'.join(part for part in parts if part)
+
+    @classmethod
+    def load_model(cls, name: str):
+        """离线加载 sentence-transformers 模型（进程内缓存）"""
+        with cls._model_lock:
+            if name not in cls._models:
+                os.environ.setdefault('HF_HUB_OFFLINE', '1')
+                os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+                from sentence_transformers import SentenceTransformer
+                cls._models[name] = SentenceTransformer(name, device='cpu')
+            return cls._models[name]
+
+    @classmethod
+    def hash_features(cls, text: str, buckets: int) -> Dict[int, float]:
+        """词元哈希到桶，返回 {桶: 1 + log(词频)}"""
+        counts: Dict[int, int] = {}
+        for token in Tokenizer.tokenize(text):
+            bucket = zlib.crc32(token.encode('utf-8')) % buckets
+            counts[bucket] = counts.get(bucket, 0) + 1
+        return {bucket: 1.0 + math.log(count) for bucket, count in counts.items()}
+
+    @classmethod
+    def _sparse_dot(cls, numpy, indptr, indices, data, dense):
+        """CSR 稀疏矩阵（indptr, indices, data）乘稠密矩阵，按行分块累加"""
+        rows = len(indptr) - 1
+        out = numpy.zeros((rows, dense.shape[1]), dtype=numpy.float32)
+        for start in range(0, rows, cls.BLOCK_ROWS):
+            stop = min(start + cls.BLOCK_ROWS, rows)
+            low, high = indptr[start], indptr[stop]
+            if low == high:
+                continue
+            counts = numpy.diff(indptr[start:stop + 1])
+            nonempty = counts > 0
+            contrib = data[low:high, None] * dense[indices[low:high]]
+            block = out[start:stop]
+            block[nonempty] = numpy.add.reduceat(contrib, (indptr[start:stop] - low)[nonempty], axis=0)
+        return out
+
+    @classmethod
+    def fit_lsa(cls, numpy, texts: List[str], dim: int) -> Tuple[Any, Any, Any]:
+        """
+        哈希 TF-IDF + 随机化 SVD
+
+        Returns:
+            (文档向量 float32 N×k, 投影矩阵 float32 桶数×k, idf float32)
+        """
+        buckets = cls.BUCKETS
+        indptr = [0]
+        indices: List[int] = []
+        values: List[float] = []
+        for text in texts:
+            features = cls.hash_features(text, buckets)
+            indices.extend(features)
+            values.extend(features.values())
+            indptr.append(len(indices))
+        indptr = numpy.asarray(indptr, dtype=numpy.int64)
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        data = numpy.asarray(values, dtype=numpy.float32)
+        rows = len(texts)
+
+        # TF-IDF 加权，行归一化
+        df = numpy.bincount(indices, minlength=buckets)
+        idf = (numpy.log((1.0 + rows) / (1.0 + df)) + 1.0).astype(numpy.float32)
+        data *= idf[indices]
+        row_ids = numpy.repeat(numpy.arange(rows), numpy.diff(indptr))
+        norms = numpy.sqrt(numpy.bincount(row_ids, weights=data * data, minlength=rows))
+        data /= numpy.maximum(norms, 1e-12)[row_ids].astype(numpy.float32)
+
+        # 转置（按桶排序）供 Xᵀ 乘法使用
+        order = numpy.argsort(indices, kind='stable')
+        t_indptr = numpy.concatenate(([0], numpy.cumsum(df))).astype(numpy.int64)
+        t_indices = row_ids[order]
+        t_data = data[order]
+
+        def x_dot(dense):
+            return cls._sparse_dot(numpy, indptr, indices, data, dense)
+
+        def xt_dot(dense):
+            return cls._sparse_dot(numpy, t_indptr, t_indices, t_data, dense)
+
+        rank = max(1, min(dim + 10, rows, buckets))
+        rng = numpy.random.default_rng(0)
+        basis = numpy.linalg.qr(x_dot(rng.standard_normal((buckets, rank)).astype(numpy.float32)))[0]
+        for _ in range(cls.POWER_ITERATIONS):
+            basis = numpy.linalg.qr(x_dot(numpy.linalg.qr(xt_dot(basis))[0]))[0]
+        _, singular, vt = numpy.linalg.svd(xt_dot(basis).T, full_matrices=False)
+        k = max(1, min(dim, int((singular > 1e-6).sum())))
+        projection = numpy.ascontiguousarray(vt[:k].T, dtype=numpy.float32)
+        return x_dot(projection), projection, idf
+
+    @staticmethod
+    def normalize_rows(numpy, matrix):
+        """行向量归一化（零向量保持为零）"""
+        norms = numpy.linalg.norm(matrix, axis=1, keepdims=True)
+        return (matrix / numpy.maximum(norms, 1e-12)).astype(numpy.float32)
+
+    @classmethod
+    def train_ivf(cls, numpy, matrix, nlist: int, iterations: int = 10):
+        """
+        球面 k-means 训练 IVF 簇中心（抽样训练，再为全部文档分配簇）
+
+        Returns:
+            (簇中心 float32 nlist×d, 簇偏移 uint32, 按簇排列的文档编号 uint32)
+        """
+        rng = numpy.random.default_rng(0)
+        count = len(matrix)
+        sample = matrix[rng.choice(count, min(count, nlist * 64), replace=False)].astype(numpy.float32)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = numpy.argmax(sample @ centroids.T, axis=1)
+            sums = numpy.zeros_like(centroids)
+            numpy.add.at(sums, assign, sample)
+            filled = numpy.bincount(assign, minlength=nlist) > 0
+            centroids[filled] = cls.normalize_rows(numpy, sums[filled])
+
+        assign = numpy.empty(count, dtype=numpy.int64)
+        for start in range(0, count, cls.BLOCK_ROWS * 16):
+            block = matrix[start:start + cls.BLOCK_ROWS * 16].astype(numpy.float32)
+            assign[start:start + len(block)] = numpy.argmax(block @ centroids.T, axis=1)
+        members = numpy.argsort(assign, kind='stable').astype(numpy.uint32)
+        offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(assign, minlength=nlist))))
+        return centroids, offsets.astype(numpy.uint32), members
+
+    @classmethod
+    def build(cls, documents: List[Dict], model: Optional[str] = None, dim: int = DEFAULT_DIM,
+              previous: Optional['VectorIndex'] = None, read_body=None) -> Optional['VectorIndex']:
+        """
+        构建向量索引
+
+        Args:
+            documents: 文档列表（Markdown 与其他格式）
+            model: sentence-transformers 模型名或本地路径（None 时使用哈希 TF-IDF + SVD）
+            dim: SVD 维度
+            previous: 旧索引（同一模型时复用向量化文本未变的文档向量）
+            read_body: 函数 (doc) -> 正文或 None；提供时正文开头一并参与向量化
+
+        Returns:
+            VectorIndex；未安装 NumPy 时返回 None
+        """
+        numpy = cls.get_numpy()
+        if numpy is None:
+            return None
+
+        paths = [str(doc.get('path', '')) for doc in documents]
+        texts = [cls.embedding_text(doc, read_body(doc) if read_body else None) for doc in documents]
+        hashes = [hashlib.md5(text.encode('utf-8')).hexdigest()[:16] for text in texts]
+        embedder = None
+        vectors = projection = idf = None
+
+        if model:
+            try:
+                encoder = cls.load_model(model)
+                reusable = {}
+                if previous is not None and previous.embedder == {"kind": "model", "model": model}:
+                    reusable = {text_hash: doc_id for doc_id, text_hash in enumerate(previous.meta['hashes'])}
+                pending = [i for i, text_hash in enumerate(hashes) if text_hash not in reusable]
+                if pending:
+                    encoded = numpy.asarray(encoder.encode([texts[i] for i in pending], normalize_embeddings=True,
+                                                           batch_size=64, show_progress_bar=len(pending) > 100),
+                                            dtype=numpy.float32)
+                    width = encoded.shape[1]
+                else:
+                    width = previous.dim if reusable else encoder.get_sentence_embedding_dimension()
+                vectors = numpy.zeros((len(documents), width), dtype=numpy.float32)
+                if pending:
+                    vectors[pending] = encoded
+                reused = [(i, reusable[text_hash]) for i, text_hash in enumerate(hashes) if text_hash in reusable]
+                if reused:
+                    vectors[[i for i, _ in reused]] = previous.matrix[[j for _, j in reused]].astype(numpy.float32)
+                embedder = {"kind": "model", "model": model}
+            except Exception as e:
+                print(f"  ⚠️ 语义模型不可用（{e}），改用哈希 TF-IDF + SVD")
+
+        if embedder is None:
+            if documents:
+                vectors, projection, idf = cls.fit_lsa(numpy, texts, dim)
+                vectors = cls.normalize_rows(numpy, vectors)
+            else:
+                vectors = numpy.zeros((0, 1), dtype=numpy.float32)
+                projection = numpy.zeros((cls.BUCKETS, 1), dtype=numpy.float32)
+                idf = numpy.ones(cls.BUCKETS, dtype=numpy.float32)
+            embedder = {"kind": "lsa", "buckets": cls.BUCKETS}
+
+        return cls(cls.serialize(numpy, paths, hashes, embedder, vectors, projection, idf), numpy)
+
+    @classmethod
+    def serialize(cls, numpy, paths: List[str], hashes: List[str], embedder: Dict,
+                  vectors, projection=None, idf=None) -> bytes:
+        """生成索引文件内容（各段按 8 字节对齐）"""
+        count, dim = vectors.shape
+        nlist = int(math.sqrt(count)) if count > cls.IVF_THRESHOLD else 0
+        meta = {"embedder": embedder, "paths": paths, "hashes": hashes}
+
+        sections = [json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                    vectors.astype(numpy.float16).tobytes()]
+        if projection is not None:
+            sections.append(idf.astype(numpy.float32).tobytes() + projection.astype(numpy.float16).tobytes())
+        if nlist:
+            centroids, list_offsets, members = cls.train_ivf(numpy, vectors, nlist)
+            sections.append(centroids.astype(numpy.float32).tobytes() + list_offsets.tobytes() + members.tobytes())
+
+        offsets = []
+        blob = bytearray()
+        position = cls.HEADER.size
+        for section in sections:
+            padding = -position % 8
+            blob += b'\0' * padding
+            position += padding
+            offsets.append(position)
+            blob += section
+            position += len(section)
+
+        projection_offset = offsets[2] if projection is not None else 0
+        ivf_offset = offsets[-1] if nlist else 0
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, count, dim, nlist, offsets[0], len(sections[0]),
+                                 offsets[1], projection_offset, ivf_offset)
+        return header + bytes(blob)
+
+    def embed_query(self, query: str):
+        """
+        查询文本转换为单位向量
+
+        Returns:
+            float32 向量；查询中没有任何已知词元或模型不可用时返回 None
+        """
+        numpy = self.numpy
+        if self.embedder['kind'] == 'model':
+            try:
+                encoder = self.load_model(self.embedder['model'])
+            except Exception:
+                return None
+            return numpy.asarray(encoder.encode([query], normalize_embeddings=True)[0], dtype=numpy.float32)
+
+        features = self.hash_features(query, self.embedder['buckets'])
+        if not features:
+            return None
+        buckets = numpy.fromiter(features, dtype=numpy.int64, count=len(features))
+        weights = numpy.fromiter(features.values(), dtype=numpy.float32, count=len(features)) * self._idf[buckets]
+        vector = weights @ self.projection[buckets].astype(numpy.float32)
+        norm = float(numpy.linalg.norm(vector))
+        return vector / norm if norm > 1e-12 else None
+
+    def similarities(self, vector, paths: List[str]) -> Dict[str, float]:
+        """指定文档与查询向量的余弦相似度（不在索引中的文档忽略）"""
+        ids = [self._ids_by_path[path] for path in paths if path in self._ids_by_path]
+        if not ids:
+            return {}
+        scores = self.matrix[ids].astype(self.numpy.float32) @ vector
+        return {self.paths[doc_id]: float(score) for doc_id, score in zip(ids, scores)}
+
+    def nearest(self, vector, k: int, nprobe: int = DEFAULT_NPROBE) -> List[Tuple[str, float]]:
+        """
+        最近邻检索（有 IVF 时只扫描最接近的 nprobe 个簇，否则逐个比较）
+
+        Returns:
+            [(文档路径, 余弦相似度), ...]，按相似度降序
+        """
+        numpy = self.numpy
+        if not self.count or k <= 0:
+            return []
+        if self.nlist:
+            probe = numpy.argsort(-(self.centroids @ vector))[:max(1, nprobe)]
+            ids = numpy.concatenate([self._list_members[self._list_offsets[c]:self._list_offsets[c + 1]]
+                                     for c in probe]).astype(numpy.int64)
+        else:
+            ids = numpy.arange(self.count)
+        scores = numpy.empty(len(ids), dtype=numpy.float32)
+        step = self.BLOCK_ROWS * 16
+        for start in range(0, len(ids), step):
+            scores[start:start + step] = self.matrix[ids[start:start + step]].astype(numpy.float32) @ vector
+        if len(ids) > k:
+            top = numpy.argpartition(-scores, k - 1)[:k]
+        else:
+            top = numpy.arange(len(ids))
+        top = top[numpy.argsort(-scores[top], kind='stable')]
+        return [(self.paths[int(ids[i])], float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        """写入向量索引文件（先写临时文件再替换）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.buffer)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        """释放内存映射（替换文件前调用，先丢弃引用映射内存的数组）"""
+        self.matrix = self.projection = self.centroids = self._idf = None
+        self._list_offsets = self._list_members = None
+        if isinstance(self.buffer, mmap.mmap):
+            try:
+                self.buffer.close()
+            except BufferError:
+                # 仍有调用方持有的数组引用映射内存，交由垃圾回收释放
+                pass
+
+    @classmethod
+    def load(cls, path: str) -> Optional['VectorIndex']:
+        """
+        打开向量索引文件（内存映射，向量按需读取）
+
+        Windows 下映射中的文件无法被替换，因此改为一次性读入。
+
+        Returns:
+            VectorIndex；文件不存在、损坏、版本不符或未安装 NumPy 时返回 None
+        """
+        numpy = cls.get_numpy()
+        if numpy is None or not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                if os.name == 'nt':
+                    buffer = f.read()
+                else:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(buffer) < cls.HEADER.size or struct.unpack_from('<4sI', buffer, 0) != (cls.MAGIC, cls.VERSION):
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+            return None
+        try:
+            return cls(buffer, numpy)
+        except Exception:
+            return None
+
+
+class BM25Ranker:
+    """
+    BM25F 相关度评分（--ranker bm25）
+
+    与默认加权评分使用相同的字段和匹配规则（文件名、路径、摘要按子串，
+    关键词、标签按完全相等），但考虑：
+    - 词频：字段内出现次数，按字段权重合并为伪词频后做 k1 饱和
+    - 字段长度：按 SearchIndex 构建时统计的平均长度做 b 归一化
+    - 稀有度：IDF 由文档频率计算，常见词的贡献远小于稀有词
+
+    非 Markdown 文档只参与文件名和路径字段，与默认评分一致。
+    """
+
+    K1 = 1.2
+
+    # 字段权重与默认评分的相对比例一致（0.4 / 0.15 / 0.3 / 0.3 / 0.2）
+    FIELD_WEIGHTS = {
+        SearchIndex.FIELD_FILENAME: 4 / 3,
+        SearchIndex.FIELD_PATH: 0.5,
+        SearchIndex.FIELD_SUMMARY: 1.0,
+        SearchIndex.FIELD_KEYWORDS: 1.0,
+        SearchIndex.FIELD_TAGS: 2 / 3,
+    }
+
+    # 长度归一化强度：摘要为自由文本，其余字段较短
+    FIELD_B = {
+        SearchIndex.FIELD_FILENAME: 0.5,
+        SearchIndex.FIELD_PATH: 0.3,
+        SearchIndex.FIELD_SUMMARY: 0.75,
+        SearchIndex.FIELD_KEYWORDS: 0.3,
+        SearchIndex.FIELD_TAGS: 0.3,
+    }
+
+    MARKDOWN_ONLY_FIELDS = (SearchIndex.FIELD_SUMMARY, SearchIndex.FIELD_KEYWORDS, SearchIndex.FIELD_TAGS)
+
+    # 正文字段（启用全文索引时）：与默认评分 0.1 的相对比例一致
+    BODY_WEIGHT = 1 / 3
+    BODY_B = 0.75
+
+    def __init__(self, search_index: SearchIndex, query_keywords: List[str],
+                 fulltext: Optional[FullTextIndex] = None,
+                 body_hits: Optional[Dict[str, Dict[str, int]]] = None):
+        """
+        初始化评分器（计算各查询关键词的 IDF）
+
+        Args:
+            search_index: 提供集合统计和倒排表的检索索引
+            query_keywords: 小写查询关键词
+            fulltext: 全文索引（提供正文长度，可选）
+            body_hits: 正文命中 {文档路径: {关键词: 出现次数}}（FullTextIndex.search 的结果）
+        """
+        self.query_keywords = query_keywords
+        self.fulltext = fulltext
+        self.body_hits = body_hits or {}
+        stats = search_index.stats
+        self.avg_lengths = {int(flag): length for flag, length in stats["avg_field_lengths"].items()}
+
+        total = stats["documents"]
+        self.idf = {}
+        for keyword in query_keywords:
+            df = search_index.document_frequency(keyword, self.field_frequency)
+            # 只在正文中命中的文档
+            for doc_path, counts in self.body_hits.items():
+                if keyword in counts:
+                    found = search_index.document_by_path(doc_path)
+                    if found and not self.field_frequency(found[0], keyword, found[1]):
+                        df += 1
+            self.idf[keyword] = math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+    def term_frequency(self, doc: Dict, keyword: str, is_markdown: bool = True) -> float:
+        """按字段权重和长度归一化合并的伪词频（含正文）"""
+        tf = self.field_frequency(doc, keyword, is_markdown)
+        count = self.body_hits.get(doc.get('path'), {}).get(keyword)
+        if count and self.fulltext is not None:
+            avg_length = self.fulltext.avg_length
+            norm = (1 - self.BODY_B + self.BODY_B * self.fulltext.length(doc['path']) / avg_length
+                    if avg_length else 1.0)
+            tf += self.BODY_WEIGHT * count / norm
+        return tf
+
+    def field_frequency(self, doc: Dict, keyword: str, is_markdown: bool = True) -> float:
+        """元数据字段的伪词频"""
+        tf = 0.0
+        for flag, texts in SearchIndex.field_texts(doc):
+            if not is_markdown and flag in self.MARKDOWN_ONLY_FIELDS:
+                continue
+            count = SearchIndex.field_term_count(flag, texts, keyword)
+            if not count:
+                continue
+            avg_length = self.avg_lengths.get(flag) or 0.0
+            b = self.FIELD_B[flag]
+            norm = 1 - b + b * SearchIndex.field_length(flag, texts) / avg_length if avg_length else 1.0
+            tf += self.FIELD_WEIGHTS[flag] * count / norm
+        return tf
+
+    def score(self, doc: Dict, is_markdown: bool = True) -> float:
+        """文档的 BM25F 分数"""
+        score = 0.0
+        for keyword in self.query_keywords:
+            tf = self.term_frequency(doc, keyword, is_markdown)
+            if tf > 0:
+                score += self.idf[keyword] * tf * (self.K1 + 1) / (tf + self.K1)
+        return score
+
+
+class SQLiteIndexStore:
+    """
+    SQLite 索引存储后端
+
+    每个文档一行，文件夹/分类各一张表，元数据按键存储，
+    读取知识库信息、文档数量或单个文档时无需解析整个 _index.yaml。
+    _index.yaml 仍会同步写出，作为导出格式供层级检测和人工查看。
+
+    存储位置: <知识库>/.knowledge-index/index.db
+    """
+
+    SCHEMA_VERSION = 1
+    SECTIONS = ('folders', 'categories', 'markdown_documents', 'other_documents')
+    # meta 表中记录写入时 _index.yaml 的 [大小, 修改时间(ns)]，与当前文件不符说明数据库已过期
+    SOURCE_KEY = "__source__"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS documents (
+            position INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            path TEXT NOT NULL UNIQUE,
+            link_count INTEGER NOT NULL DEFAULT 0,
+            backlink_count INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS document_tags (
+            position INTEGER NOT NULL,
+            tag TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS folders (
+            position INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS categories (
+            position INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str):
+        """
+        初始化存储
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+
+    @staticmethod
+    def get_path(kb_path: str) -> str:
+        """获取数据库文件路径"""
+        return os.path.join(kb_path, ".knowledge-index", "index.db")
+
+    def exists(self) -> bool:
+        """数据库文件是否存在"""
+        return os.path.exists(self.db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    @staticmethod
+    def source_signature(index_path: str) -> Optional[List[int]]:
+        """_index.yaml 的签名 [大小, 修改时间(ns)]（文件不存在时返回 None）"""
+        try:
+            stat = os.stat(index_path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def stored_source(self) -> Optional[List[int]]:
+        """读取写入数据库时记录的 _index.yaml 签名（旧版数据库没有记录时返回 None）"""
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute("SELECT value FROM meta WHERE key = ?", (self.SOURCE_KEY,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save(self, index_data: Dict, source: Optional[List[int]] = None):
+        """
+        写入完整索引（单个事务内全量替换）
+
+        Args:
+            index_data: 与 _index.yaml 结构一致的索引字典（v2.1 分类结构）
+            source: 同时写出的 _index.yaml 的签名（见 source_signature）
+        """
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        dumps = lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.executescript(self.SCHEMA)
+                for table in ('meta', 'documents', 'document_tags', 'folders', 'categories'):
+                    conn.execute(f"DELETE FROM {table}")
+
+                conn.executemany(
+                    "INSERT INTO meta (key, position, value) VALUES (?, ?, ?)",
+                    [(key, position, None if key in self.SECTIONS else dumps(value))
+                     for position, (key, value) in enumerate(index_data.items())]
+                    + [("__schema_version__", -1, dumps(self.SCHEMA_VERSION)),
+                       (self.SOURCE_KEY, -2, dumps(source))]
+                )
+
+                docs = [('markdown', doc) for doc in index_data.get('markdown_documents', [])]
+                docs += [('other', doc) for doc in index_data.get('other_documents', [])]
+                conn.executemany(
+                    "INSERT INTO documents (position, kind, path, link_count, backlink_count, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(position, kind, doc['path'], len(doc.get('links', []) or []),
+                      len(doc.get('backlinks', []) or []), dumps(doc))
+                     for position, (kind, doc) in enumerate(docs)]
+                )
+                conn.executemany(
+                    "INSERT INTO document_tags (position, tag) VALUES (?, ?)",
+                    [(position, str(tag))
+                     for position, (kind, doc) in enumerate(docs) if kind == 'markdown'
+                     for tag in doc.get('tags', []) or []]
+                )
+                conn.executemany(
+                    "INSERT INTO folders (position, path, data) VALUES (?, ?, ?)",
+                    [(position, folder.get('path', ''), dumps(folder))
+                     for position, folder in enumerate(index_data.get('folders', []))]
+                )
+                conn.executemany(
+                    "INSERT INTO categories (position, name, data) VALUES (?, ?, ?)",
+                    [(position, category.get('name', ''), dumps(category))
+                     for position, category in enumerate(index_data.get('categories', []))]
+                )
+
+    def load(self) -> Dict:
+        """读取完整索引（结构与 _index.yaml 一致）"""
+        with closing(self._connect()) as conn:
+            index_data = {}
+            for key, value in conn.execute(
+                    "SELECT key, value FROM meta WHERE position >= 0 ORDER BY position"):
+                index_data[key] = None if value is None else json.loads(value)
+
+            for key, query in (
+                    ('folders', "SELECT data FROM folders ORDER BY position"),
+                    ('categories', "SELECT data FROM categories ORDER BY position"),
+                    ('markdown_documents',
+                     "SELECT data FROM documents WHERE kind = 'markdown' ORDER BY position"),
+                    ('other_documents',
+                     "SELECT data FROM documents WHERE kind = 'other' ORDER BY position")):
+                index_data[key] = [json.loads(row[0]) for row in conn.execute(query)]
+
+        return index_data
+
+    def load_meta(self) -> Dict:
+        """读取索引元数据（不含文档、文件夹和分类列表）"""
+        with closing(self._connect()) as conn:
+            return {key: json.loads(value) for key, value in conn.execute(
+                "SELECT key, value FROM meta WHERE position >= 0 AND value IS NOT NULL ORDER BY position")}
+
+    def count(self) -> Tuple[int, int]:
+        """
+        统计文档数量
+
+        Returns:
+            (Markdown 文档数, 其他格式文档数)
+        """
+        with closing(self._connect()) as conn:
+            counts = dict(conn.execute("SELECT kind, COUNT(*) FROM documents GROUP BY kind"))
+        return counts.get('markdown', 0), counts.get('other', 0)
+
+    def get_document(self, doc_path: str) -> Optional[Dict]:
+        """按相对路径读取单个文档记录"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT data FROM documents WHERE path = ?", (doc_path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def link_stats(self, top_tags: int = 10) -> Dict[str, Any]:
+        """
+        统计 Markdown 文档的链接和热门标签
+
+        Returns:
+            {"links": 出链总数, "backlinks": 反向链接总数, "tags": [(标签, 次数), ...]}
+        """
+        with closing(self._connect()) as conn:
+            links, backlinks = conn.execute(
+                "SELECT COALESCE(SUM(link_count), 0), COALESCE(SUM(backlink_count), 0) "
+                "FROM documents WHERE kind = 'markdown'").fetchone()
+            tags = conn.execute(
+                "SELECT tag, COUNT(*) AS n FROM document_tags GROUP BY tag "
+                "ORDER BY n DESC, MIN(position) LIMIT ?", (top_tags,)).fetchall()
+        return {"links": links, "backlinks": backlinks, "tags": tags}
+
+
+class IndexCache:
+    """
+    常驻内存的索引缓存（serve 模式使用）
+
+    每个知识库缓存一份 SearchIndex（旁路索引缺失或过期时在内存中构建）、全文索引和语义索引（如有），
+    每次访问只对 _index.yaml 做一次 stat，签名（大小 + 修改时间）变化时才重新加载。
+    """
+
+    class Entry:
+        """单个知识库的缓存项"""
+
+        def __init__(self, signature: Dict[str, int], search_index: Optional[SearchIndex],
+                     index_data: Dict, fulltext: Optional[FullTextIndex] = None,
+                     vectors: Optional[VectorIndex] = None):
+            self.signature = signature
+            self.search_index = search_index
+            self.index_data = index_data  # 仅旧版 documents 格式使用
+            self.fulltext = fulltext
+            self.vectors = vectors
+            self.loaded_at = time.time()
+            self._docs_by_path: Optional[Dict[str, Dict]] = None
+
+        def documents(self) -> List[Dict]:
+            """全部文档记录（检索快照中的记录按需解码）"""
+            if self.search_index is not None:
+                return self.search_index.documents()
+            return (self.index_data.get('markdown_documents', [])
+                    + self.index_data.get('other_documents', [])
+                    + self.index_data.get('documents', []))
+
+        def document_count(self) -> int:
+            """文档总数"""
+            if self.search_index is not None:
+                return self.search_index.document_count
+            return len(self.documents())
+
+        def get_document(self, doc_path: str) -> Optional[Dict]:
+            """按相对路径查找文档记录（检索快照二分查找，旧版格式首次调用时建立路径索引）"""
+            if self.search_index is not None:
+                doc_id = self.search_index.doc_id(doc_path)
+                return self.search_index.document(doc_id) if doc_id is not None else None
+            if self._docs_by_path is None:
+                self._docs_by_path = {doc.get('path'): doc for doc in self.documents()}
+            return self._docs_by_path.get(doc_path)
+
+    def __init__(self, manager: 'KnowledgeBaseManager'):
+        """
+        初始化缓存
+
+        Args:
+            manager: 用于加载索引和注册表的管理器
+        """
+        self.manager = manager
+        self._entries: Dict[str, 'IndexCache.Entry'] = {}
+        self._lock = threading.Lock()
+        self._registry_signature = self._stat_registry()
+
+    def get(self, kb_path: str) -> Optional['IndexCache.Entry']:
+        """
+        获取知识库的缓存项，索引文件变化时重新加载
+
+        Returns:
+            缓存项；知识库未索引时返回 None（加载失败时抛出异常）
+        """
+        index_path = os.path.join(kb_path, "_index.yaml")
+        try:
+            signature = SearchIndex.source_signature(index_path)
+        except OSError:
+            self._entries.pop(kb_path, None)
+            return None
+
+        entry = self._entries.get(kb_path)
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(kb_path)
+            if entry is None or entry.signature != signature:
+                entry = self._load(kb_path, signature)
+                self._entries[kb_path] = entry
+            return entry
+
+    def _load(self, kb_path: str, signature: Dict[str, int]) -> 'IndexCache.Entry':
+        """从旁路索引加载；旁路索引不可用时读取完整索引并在内存中构建"""
+        search_index = self.manager.load_search_index(kb_path)
+        index_data = {}
+        if search_index is None:
+            index_data = self.manager.load_index(kb_path)
+            if 'documents' not in index_data:
+                search_index = SearchIndex.build(index_data.get('markdown_documents', []),
+                                                 index_data.get('other_documents', []))
+                index_data = {}
+        return IndexCache.Entry(signature, search_index, index_data,
+                                self.manager.load_fulltext_index(kb_path),
+                                self.manager.load_vector_index(kb_path))
+
+    def _stat_registry(self) -> Optional[Tuple[int, int]]:
+        """注册表文件签名"""
+        try:
+            stat = os.stat(self.manager.registry_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def refresh_registry(self) -> bool:
+        """
+        注册表文件变化时重新加载（新建、删除知识库后无需重启服务）
+
+        Returns:
+            是否重新加载
+        """
+        signature = self._stat_registry()
+        if signature == self._registry_signature:
+            return False
+
+        with self._lock:
+            self._registry_signature = signature
+            self.manager.registry = self.manager.load_registry()
+            active = {kb['path'] for kb in self.manager.registry.get('knowledge_bases', [])
+                      if kb.get('status') == 'active'}
+            for kb_path in list(self._entries):
+                if kb_path not in active:
+                    del self._entries[kb_path]
+        return True
+
+    def loaded(self) -> Dict[str, 'IndexCache.Entry']:
+        """当前已加载的缓存项"""
+        return dict(self._entries)
+
+
+class QueryServer:
+    """
+    常驻查询服务（serve 命令）
+
+    启动时把所有已注册知识库的索引加载到内存，通过本机 HTTP 端口或 Unix socket
+    提供 JSON 接口，避免每次检索都重新启动 Python、读取注册表和解析索引。
+    索引或注册表文件变化时自动重新加载。
+
+        GET /search?q=<查询>[&kb=<知识库路径或名称>][&top_k=10][&deadline=秒][&ranker=bm25][&mode=hybrid]
+        GET /info?kb=<知识库路径或名称>[&doc=<文档相对路径>]
+        GET /health
+    """
+
+    def __init__(self, manager: 'KnowledgeBaseManager', host: str = "127.0.0.1",
+                 port: int = 8765, socket_path: Optional[str] = None):
+        """
+        初始化查询服务
+
+        Args:
+            manager: 知识库管理器（会为其启用 IndexCache）
+            host: HTTP 监听地址（默认仅本机）
+            port: HTTP 监听端口
+            socket_path: Unix socket 路径（指定时不监听 TCP 端口）
+        """
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.cache = IndexCache(manager)
+        manager.index_cache = self.cache
+        self.started_at = time.time()
+
+    def preload(self):
+        """加载所有已注册知识库的索引"""
+        for kb in self.manager.registry.get('knowledge_bases', []):
+            if kb.get('status') != 'active':
+                continue
+            start_time = time.time()
+            try:
+                entry = self.cache.get(kb['path'])
+            except Exception as e:
+                print(f"  ⚠️ 加载失败: {kb['path']} ({e})")
+                continue
+            if entry is None:
+                print(f"  ⚠️ 知识库未索引: {kb['path']}")
+                continue
+            print(f"  ✓ {kb['name']}: {entry.document_count()} 个文档"
+                  f"（{(time.time() - start_time) * 1000:.0f} ms）")
+
+    def resolve_kb(self, kb: str) -> Optional[Dict]:
+        """按路径或名称查找已注册的知识库"""
+        knowledge_bases = [k for k in self.manager.registry.get('knowledge_bases', [])
+                           if k.get('status') == 'active']
+        kb_abspath = os.path.abspath(kb)
+        for k in knowledge_bases:
+            if k['path'] == kb or os.path.abspath(k['path']) == kb_abspath:
+                return k
+        for k in knowledge_bases:
+            if k.get('name') == kb:
+                return k
+        return None
+
+    def handle(self, route: str, params: Dict[str, str]) -> Tuple[int, Dict]:
+        """
+        处理一个请求
+
+        Returns:
+            (HTTP 状态码, JSON 响应)
+        """
+        self.cache.refresh_registry()
+
+        if route == "/health":
+            return 200, {
+                "status": "ok",
+                "uptime_sec": round(time.time() - self.started_at, 1),
+                "knowledge_bases": [
+                    {"path": kb_path, "documents": entry.document_count(),
+                     "loaded_at": datetime.fromtimestamp(entry.loaded_at, timezone.utc).isoformat()}
+                    for kb_path, entry in self.cache.loaded().items()
+                ]
+            }
+
+        kb = None
+        if params.get("kb"):
+            kb = self.resolve_kb(params["kb"])
+            if kb is None:
+                return 404, {"error": f"知识库未注册: {params['kb']}"}
+
+        if route == "/search":
+            query = params.get("q", "").strip()
+            if not query:
+                return 400, {"error": "缺少参数 q"}
+            try:
+                top_k = int(params.get("top_k", 10))
+            except ValueError:
+                return 400, {"error": f"无效的 top_k: {params['top_k']}"}
+
+            try:
+                deadline = float(params["deadline"]) if params.get("deadline") else None
+            except ValueError:
+                return 400, {"error": f"无效的 deadline: {params['deadline']}"}
+
+            ranker = params.get("ranker") or None
+            if ranker is not None and ranker not in KnowledgeBaseManager.RANKERS:
+                return 400, {"error": f"无效的 ranker: {ranker}"}
+
+            mode = params.get("mode") or None
+            if mode is not None and mode not in KnowledgeBaseManager.SEARCH_MODES:
+                return 400, {"error": f"无效的 mode: {mode}"}
+
+            start_time = time.perf_counter()
+            unfinished = []
+            if kb:
+                results = self.manager.search_index(query, kb['path'], top_k=top_k, show_progress=False,
+                                                    ranker=ranker, mode=mode)
+                for r in results:
+                    r['kb_name'] = kb['name']
+            else:
+                results, unfinished = self.manager.search_all(query, top_k=top_k, show_progress=False,
+                                                              deadline=deadline, ranker=ranker, mode=mode)
+            return 200, {
+                "query": query,
+                "took_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                "partial": bool(unfinished),
+                "unfinished": unfinished,
+                "results": results
+            }
+
+        if route == "/info":
+            if kb is None:
+                return 400, {"error": "缺少参数 kb"}
+            try:
+                entry = self.cache.get(kb['path'])
+            except Exception as e:
+                return 500, {"error": f"读取索引失败: {e}"}
+            if entry is None:
+                return 404, {"error": f"知识库未索引: {kb['path']}"}
+
+            if params.get("doc"):
+                doc = entry.get_document(params["doc"].replace("\\", "/"))
+                if doc is None:
+                    return 404, {"error": f"索引中不存在文档: {params['doc']}"}
+                return 200, doc
+
+            docs = entry.documents()
+            md_docs = [d for d in docs if d.get('type') == 'markdown']
+            tag_counts: Dict[str, int] = {}
+            for doc in md_docs:
+                for tag in doc.get('tags', []):
+                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
+            return 200, {
+                "knowledge_base": kb,
+                "markdown_documents": len(md_docs),
+                "other_documents": len(docs) - len(md_docs),
+                "links": sum(len(d.get('links', [])) for d in md_docs),
+                "backlinks": sum(len(d.get('backlinks', [])) for d in md_docs),
+                "tags": sorted(tag_counts.items(), key=lambda x: -x[1])[:10]
+            }
+
+        return 404, {"error": f"未知接口: {route}"}
+
+    def _make_handler(self):
+        """创建 HTTP 请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    status, payload = server.handle(url.path.rstrip('/') or '/', params)
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def address_string(self):
+                return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self) -> bool:
+        """
+        启动服务，直到 KeyboardInterrupt
+
+        Returns:
+            是否成功启动
+        """
+        handler = self._make_handler()
+        if self.socket_path:
+            if not hasattr(socketserver, 'UnixStreamServer'):
+                print("❌ 当前平台不支持 Unix socket，请使用 --port")
+                return False
+
+            class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+                daemon_threads = True
+
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            httpd = ThreadingUnixHTTPServer(self.socket_path, handler)
+            os.chmod(self.socket_path, 0o600)
+            address = f"unix:{self.socket_path}"
+        else:
+            httpd = ThreadingHTTPServer((self.host, self.port), handler)
+            address = f"http://{self.host}:{httpd.server_address[1]}"
+
+        print(f"\n✓ 查询服务已启动: {address}（Ctrl+C 退出）")
+        print("  GET /search?q=<查询>[&kb=<知识库>][&top_k=10][&deadline=秒][&ranker=bm25][&mode=hybrid]")
+        print("  GET /info?kb=<知识库>[&doc=<文档路径>]")
+        print("  GET /health")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n✓ 已停止查询服务")
+        finally:
+            httpd.server_close()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        return True
+
+
+class FileWatcher:
+    """
+    知识库文件变更监听
+
+    Linux 下通过 ctypes 调用 inotify（无需第三方依赖），其他平台或 inotify
+    不可用时回退到定时轮询（比较文件大小和修改时间）。
+
+    事件会先收集，在 debounce 秒内没有新事件（或累计等待超过 max_delay 秒）
+    时合并为一组相对路径交给回调处理，避免编辑器保存、批量复制时反复更新。
+    回调收到的路径可能是文件，也可能是新建/删除/移动的目录。
+    """
+
+    # inotify 事件掩码（见 <sys/inotify.h>）
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                  | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, root: str, file_filter, dir_filter,
+                 debounce: float = 1.0, poll_interval: float = 2.0,
+                 max_delay: float = 10.0, use_polling: bool = False):
+        """
+        初始化监听器
+
+        Args:
+            root: 监听的根目录
+            file_filter: 判断文件名是否需要关注的函数
+            dir_filter: 判断子目录名是否需要监听的函数（False 表示跳过整个目录）
+            debounce: 事件静默多少秒后触发回调
+            poll_interval: 轮询模式的扫描间隔（秒）
+            max_delay: 持续有事件时最长等待多少秒触发回调
+            use_polling: 强制使用轮询模式
+        """
+        self.root = os.path.abspath(root)
+        self.file_filter = file_filter
+        self.dir_filter = dir_filter
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_delay = max_delay
+        self._fd = None
+        self._libc = None
+        self._watches: Dict[int, str] = {}  # wd -> 相对目录路径
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+        if not use_polling:
+            self._init_inotify()
+        self.mode = "inotify" if self._fd is not None else "polling"
+
+    def _init_inotify(self):
+        """初始化 inotify，不可用时保持 _fd 为 None"""
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(self.IN_CLOEXEC)
+            if fd < 0:
+                return
+        except (OSError, AttributeError):
+            return
+        self._libc = libc
+        self._fd = fd
+        self._add_watches('')
+
+    def _add_watches(self, rel_dir: str) -> List[str]:
+        """
+        递归为目录及其子目录添加 inotify 监听
+
+        Returns:
+            目录下已存在的需关注文件（新建目录时，监听建立前写入的文件需补充处理）
+        """
+        found = []
+        top = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if self.dir_filter(d)]
+            rel_root = os.path.relpath(root, self.root).replace(os.sep, '/')
+            rel_root = '' if rel_root == '.' else rel_root
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(root), self.WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                print(f"⚠️ 无法监听目录: {root} ({os.strerror(err)})")
+                if err == errno.ENOSPC:
+                    print("  可调大 /proc/sys/fs/inotify/max_user_watches，或使用 --poll")
+                continue
+            self._watches[wd] = rel_root
+            found.extend(f"{rel_root}/{f}" if rel_root else f for f in files if self.file_filter(f))
+        return found
+
+    def _read_inotify(self, timeout: Optional[float]) -> Optional[set]:
+        """
+        等待并读取 inotify 事件
+
+        Returns:
+            变更的相对路径集合；队列溢出时返回 None（需全量核对）
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        data = os.read(self._fd, 65536)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            rel_dir = self._watches.get(wd)
+            if rel_dir is None or not name:
+                continue
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+
+            if mask & self.IN_ISDIR:
+                if not self.dir_filter(name):
+                    continue
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    changed.update(self._add_watches(rel_path))
+                changed.add(rel_path)
+            elif self.file_filter(name):
+                changed.add(rel_path)
+        return changed
+
+    def _scan_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """轮询模式：获取所有需关注文件的 (修改时间, 大小)"""
+        snapshot = {}
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if self.dir_filter(d)]
+            for file in files:
+                if not self.file_filter(file):
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+                snapshot[rel_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _poll(self, timeout: float) -> set:
+        """轮询模式：等待一个扫描间隔后与上次快照比较"""
+        time.sleep(timeout)
+        snapshot = self._scan_snapshot()
+        changed = {path for path, sig in snapshot.items() if self._snapshot.get(path) != sig}
+        changed.update(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def run(self, on_changes, on_overflow=None):
+        """
+        持续监听，直到 KeyboardInterrupt
+
+        Args:
+            on_changes: 回调，参数为变更的相对路径集合
+            on_overflow: inotify 队列溢出（事件丢失）时的回调，用于全量核对
+        """
+        if self.mode == "polling":
+            self._snapshot = self._scan_snapshot()
+
+        pending = set()
+        first_event = last_event = 0.0
+        try:
+            while True:
+                if pending:
+                    now = time.monotonic()
+                    wait = min(last_event + self.debounce, first_event + self.max_delay) - now
+                    if wait <= 0:
+                        batch, pending = pending, set()
+                        on_changes(batch)
+                        continue
+                else:
+                    wait = None
+
+                if self.mode == "inotify":
+                    changed = self._read_inotify(wait)
+                    if changed is None:
+                        pending.clear()
+                        if on_overflow:
+                            on_overflow()
+                        continue
+                else:
+                    changed = self._poll(self.poll_interval if wait is None
+                                         else min(wait, self.poll_interval))
+
+                if changed:
+                    now = time.monotonic()
+                    if not pending:
+                        first_event = now
+                    last_event = now
+                    pending.update(changed)
+        finally:
+            self.close()
+
+    def close(self):
+        """释放 inotify 文件描述符"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watches.clear()
+
+
+class KnowledgeBaseManager:
+    """知识库管理器"""
+
+    # Wikilink 正则模式：匹配 [[link]], [[link#section]], [[link|alias]], [[link#section|alias]]
+    WIKILINK_PATTERN = re.compile(r'\[\[([^\]\|#]+)(?:#([^\]\|]+))?(?:\|([^\]]+))?\]\]')
+
+    # AI 摘要配置
+    SUMMARY_MODEL = "claude-sonnet-4-6-20250514"
+    SUMMARY_MAX_CHARS = 8000          # 单篇文档截断长度
+    SUMMARY_BATCH_MAX_CHARS = 32000   # 批量请求的总字符上限
+
+    # 扫描时跳过的目录（另外跳过所有隐藏目录）和文件
+    SKIP_DIRS = {'.git', '.obsidian', '__pycache__', 'node_modules'}
+    INDEX_FILES = {'_index.yaml', '_index_config.yaml'}
+
+    # 检索评分方式：weighted（固定字段权重，默认）、bm25（BM25F）
+    RANKERS = ('weighted', 'bm25')
+    # 检索模式：keyword（关键词，默认）、semantic（语义向量）、hybrid（关键词与语义加权）
+    SEARCH_MODES = ('keyword', 'semantic', 'hybrid')
+
+    def __init__(self, registry_path: str = None, enable_ai_summary: bool = True,
+                 obsidian_cli_mode: str = "auto", workers: int = None,
+                 storage: str = None, summary_batch_size: int = None,
+                 summary_concurrency: int = None, ranker: str = None,
+                 fulltext: bool = None, semantic: bool = None, search_mode: str = None):
+        """
+        初始化管理器
+
+        Args:
+            registry_path: 注册表路径（默认 ~/.knowledge-index/registry.yaml）
+            enable_ai_summary: 是否启用 AI 摘要（默认 True）
+            obsidian_cli_mode: Obsidian CLI 模式
+                - "auto": 自动检测，CLI 可用时优先使用（默认）
+                - "prefer": 优先使用 CLI，结果与索引合并
+                - "disabled": 禁用 CLI，仅使用索引
+            workers: 文档处理并行线程数（None 时读取知识库配置，默认 1）
+            storage: 索引存储后端 "yaml" 或 "sqlite"（None 时读取知识库配置，默认 yaml）
+            summary_batch_size: 每个 AI 摘要请求包含的文档数（None 时读取知识库配置，默认 1）
+            summary_concurrency: 同时进行的 AI 摘要请求数（None 时读取知识库配置，默认 1）
+            ranker: 检索评分方式 "weighted" 或 "bm25"（None 时读取知识库配置，默认 weighted）
+            fulltext: 是否生成正文全文索引（None 时读取知识库配置）
+            semantic: 是否生成语义向量索引（None 时读取知识库配置）
+            search_mode: 检索模式 "keyword"、"semantic" 或 "hybrid"（None 时读取知识库配置，默认 keyword）
+        """
+        self.registry_path = registry_path or self.get_default_registry_path()
+        self.registry = self.load_registry()
+        self.enable_ai_summary = enable_ai_summary
+        self._cache_dir = None
+        self._summary_cache = None
+        self._extraction_cache = None
+        self.obsidian_cli_mode = obsidian_cli_mode
+        self._obsidian_cli = None
+        self.workers = workers
+        self.storage = storage
+        self.ranker = ranker
+        self.fulltext = fulltext
+        self.semantic = semantic
+        self.search_mode = search_mode
+        self.summary_batch_size = summary_batch_size
+        self.summary_concurrency = summary_concurrency
+        self._client_lock = threading.Lock()
+        self._anthropic_client = None
+        self.index_cache: Optional[IndexCache] = None  # serve 模式下常驻内存的索引
+
+    @property
+    def obsidian_cli(self) -> ObsidianCLIClient:
+        """获取 Obsidian CLI 客户端（延迟初始化）"""
+        if self._obsidian_cli is None:
+            self._obsidian_cli = ObsidianCLIClient()
+        return self._obsidian_cli
+
+    @staticmethod
+    def get_default_registry_path() -> str:
+        """获取默认注册表路径"""
+        home = Path.home()
+        registry_dir = home / ".knowledge-index"
+        registry_dir.mkdir(parents=True, exist_ok=True)
+        return str(registry_dir / "registry.yaml")
+
+    @property
+    def cache_dir(self) -> str:
+        """获取缓存目录"""
+        if self._cache_dir is None:
+            home = Path.home()
+            self._cache_dir = str(home / ".knowledge-index" / "cache")
+            os.makedirs(self._cache_dir, exist_ok=True)
+        return self._cache_dir
+
+    def get_content_hash(self, content: str) -> str:
+        """计算内容哈希"""
+        return hashlib.md5(content.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def get_file_hash(file_path: str) -> str:
+        """计算文件哈希（按块读取，用于增量更新的变更检测）"""
+        hash_func = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                hash_func.update(chunk)
+        return hash_func.hexdigest()[:16]
+
+    @property
+    def summary_cache(self) -> SummaryCache:
+        """获取摘要缓存存储（延迟初始化，容量上限读取注册表的 cache 部分）"""
+        if self._summary_cache is None:
+            settings = self.registry.get("cache") or {}
+            max_disk_mb = settings.get("max_disk_mb")
+            self._summary_cache = SummaryCache(
+                self.cache_dir,
+                max_memory_entries=settings.get("max_memory_entries"),
+                max_disk_bytes=int(max_disk_mb * 1024 * 1024) if max_disk_mb is not None else None)
+        return self._summary_cache
+
+    @property
+    def extraction_cache(self):
+        """
+        获取 PDF / Word 提取结果缓存（延迟初始化，与 extract_text.py 共用同一个数据库）
+
+        容量上限读取注册表 cache.extraction_max_mb；extract_text.py 不可导入时返回 None
+        """
+        if self._extraction_cache is None:
+            try:
+                from extract_text import ExtractionCache
+            except ImportError:
+                return None
+            max_mb = (self.registry.get("cache") or {}).get("extraction_max_mb")
+            self._extraction_cache = ExtractionCache(
+                os.path.join(self.cache_dir, "extractions.db"),
+                max_bytes=int(max_mb * 1024 * 1024) if max_mb is not None else None)
+        return self._extraction_cache
+
+    def get_cached_summary(self, content_hash: str) -> Optional[Dict]:
+        """从缓存获取摘要"""
+        try:
+            return self.summary_cache.get(content_hash)
+        except Exception as e:
+            print(f"⚠️ 摘要缓存读取失败: {e}")
+            return None
+
+    def save_cached_summary(self, content_hash: str, summary_data: Dict):
+        """保存摘要到缓存"""
+        try:
+            self.summary_cache.put(content_hash, summary_data)
+        except Exception as e:
+            print(f"⚠️ 摘要缓存写入失败: {e}")
+
+    def generate_ai_summary(self, content: str, doc_path: str = "") -> Dict[str, Any]:
+        """
+        生成 AI 摘要和关键词
+
+        Args:
+            content: 文档内容
+            doc_path: 文档路径（用于日志）
+
+        Returns:
+            {"summary": "...", "keywords": [...], "topics": [...]}
+        """
+        # 检查缓存
+        content_hash = self.get_content_hash(content)
+        cached = self.get_cached_summary(content_hash)
+        if cached:
+            print(f"    ✓ 使用缓存: {doc_path}")
+            return cached
+
+        # 如果禁用 AI 摘要，返回基础信息
+        if not self.enable_ai_summary:
+            return self._generate_basic_summary(content)
+
+        # 尝试调用 Claude API
+        try:
+            result = self._call_claude_api(content)
+            if result:
+                self.save_cached_summary(content_hash, result)
+                return result
+        except Exception as e:
+            print(f"    ⚠️ AI 摘要失败 ({doc_path}): {e}")
+
+        # 降级为基础摘要
+        return self._generate_basic_summary(content)
+
+    def generate_ai_summaries(self, items: List[Tuple[str, str]], batch_size: int = 1,
+                              options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        批量生成 AI 摘要
+
+        按内容哈希去重并跳过已缓存的文档，其余文档按 batch_size 合并为多文档请求，
+        由 SummaryScheduler 并发调度（限流、重试），结果写回摘要缓存。
+        多文档请求失败或响应中缺失的文档再逐篇请求一次，仍失败的降级为基础摘要。
+
+        Args:
+            items: [(文档内容, 文档路径), ...]
+            batch_size: 每个请求包含的文档数（1 表示逐篇请求）
+            options: 调度参数（concurrency / requests_per_minute / tokens_per_minute / max_retries），
+                     通常来自 get_summary_options
+
+        Returns:
+            与 items 顺序一致的摘要列表
+        """
+        options = options or {}
+        results: List[Optional[Dict]] = [None] * len(items)
+        pending: Dict[str, List[int]] = {}
+
+        for i, (content, doc_path) in enumerate(items):
+            content_hash = self.get_content_hash(content)
+            cached = self.get_cached_summary(content_hash)
+            if cached:
+                print(f"    ✓ 使用缓存: {doc_path}")
+                results[i] = cached
+            else:
+                pending.setdefault(content_hash, []).append(i)
+
+        uncached = [(content_hash, items[indexes[0]][0], items[indexes[0]][1])
+                    for content_hash, indexes in pending.items()]
+
+        summaries: Dict[str, Dict] = {}
+        if uncached and self.enable_ai_summary and os.environ.get("ANTHROPIC_API_KEY"):
+            scheduler = SummaryScheduler(
+                self._request_summaries,
+                concurrency=options.get('concurrency', 1),
+                requests_per_minute=options.get('requests_per_minute'),
+                tokens_per_minute=options.get('tokens_per_minute'),
+                max_retries=options.get('max_retries', 3)
+            )
+
+            # 第一轮：按批次请求；第二轮：失败批次中的文档和批量响应中缺失的文档逐篇补请求
+            batches = self._make_summary_batches(uncached, batch_size)
+            missing = self._run_summary_requests(scheduler, batches, summaries)
+            if missing:
+                self._run_summary_requests(scheduler, [[item] for item in missing], summaries)
+
+        for content_hash, content, doc_path in uncached:
+            summary = summaries.get(content_hash)
+            if summary:
+                self.save_cached_summary(content_hash, summary)
+            else:
+                summary = self._generate_basic_summary(content)
+            for i in pending[content_hash]:
+                results[i] = summary
+
+        return results
+
+    def _run_summary_requests(self, scheduler: SummaryScheduler,
+                              batches: List[List[Tuple[str, str, str]]],
+                              summaries: Dict[str, Dict]) -> List[Tuple[str, str, str]]:
+        """
+        调度一轮摘要请求，结果写入 summaries
+
+        Returns:
+            需要逐篇补请求的多文档批次条目：请求失败（如响应无法解析、重试耗尽）的批次中的全部文档，
+            以及请求成功但响应中缺失的文档
+        """
+        reporter = None
+        if len(batches) > 1:
+            reporter = ProgressReporter(len(batches), "生成摘要")
+
+        def on_done(index: int, ok: bool):
+            if reporter:
+                reporter.update(1, f"{len(batches[index])} 篇{'' if ok else '（失败）'}")
+
+        jobs = [(batch, self._estimate_summary_tokens(batch)) for batch in batches]
+        outcomes = scheduler.run(jobs, on_done)
+
+        if reporter:
+            reporter.complete(f"完成 {len(batches)} 个摘要请求")
+
+        missing = []
+        for batch, (ok, value) in zip(batches, outcomes):
+            if not ok:
+                paths = ', '.join(doc_path for _, _, doc_path in batch[:3])
+                more = f" 等 {len(batch)} 篇" if len(batch) > 3 else ""
+                print(f"    ⚠️ AI 摘要失败 ({paths}{more}): {value}")
+                if len(batch) > 1:
+                    missing.extend(batch)
+                continue
+
+            summaries.update(value)
+            if len(batch) > 1:
+                missing.extend(item for item in batch if item[0] not in value)
+
+        return missing
+
+    def _request_summaries(self, batch: List[Tuple[str, str, str]]) -> Dict[str, Dict]:
+        """
+        发送一个摘要请求（单篇或多文档），API 错误直接抛出由调度器重试
+
+        Returns:
+            {内容哈希: 摘要}，响应中缺失的文档不包含在内
+        """
+        if len(batch) == 1:
+            content_hash, content, _ = batch[0]
+            result = self._call_claude_api(content)
+            return {content_hash: result} if result else {}
+
+        batch_results = self._call_claude_api_batch([content for _, content, _ in batch])
+        return {content_hash: result
+                for (content_hash, _, _), result in zip(batch, batch_results) if result}
+
+    def _estimate_summary_tokens(self, batch: List[Tuple[str, str, str]]) -> int:
+        """估算请求 token 数（输入按字符数保守估计，加上输出上限）"""
+        input_chars = sum(min(len(content), self.SUMMARY_MAX_CHARS) for _, content, _ in batch)
+        return input_chars + 200 + 500 * len(batch)
+
+    def _make_summary_batches(self, uncached: List[Tuple[str, str, str]],
+                              batch_size: int) -> List[List[Tuple[str, str, str]]]:
+        """按文档数和总字符数（SUMMARY_BATCH_MAX_CHARS）切分批次"""
+        batches = []
+        current = []
+        current_chars = 0
+
+        for item in uncached:
+            chars = min(len(item[1]), self.SUMMARY_MAX_CHARS)
+            if current and (len(current) >= batch_size
+                            or current_chars + chars > self.SUMMARY_BATCH_MAX_CHARS):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(item)
+            current_chars += chars
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _get_anthropic_client(self):
+        """
+        获取 Anthropic 客户端（进程内复用，线程安全）
+
+        API 地址可通过 ANTHROPIC_BASE_URL 环境变量指向本地桩服务用于测试。
+
+        Raises:
+            ImportError: anthropic 包未安装
+        """
+        with self._client_lock:
+            if self._anthropic_client is None:
+                import anthropic
+
+                base_url = os.environ.get("ANTHROPIC_BASE_URL")
+                self._anthropic_client = anthropic.Anthropic(
+                    api_key=os.environ.get("ANTHROPIC_API_KEY"),
+                    **({"base_url": base_url} if base_url else {})
+                )
+            return self._anthropic_client
+
+    def _create_message(self, prompt: str, max_tokens: int) -> str:
+        """发送单条消息并返回响应文本"""
+        client = self._get_anthropic_client()
+        message = client.messages.create(
+            model=self.SUMMARY_MODEL,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return message.content[0].text
+
+    def _truncate_for_summary(self, content: str) -> str:
+        """截断过长内容"""
+        if len(content) > self.SUMMARY_MAX_CHARS:
+            return content[:self.SUMMARY_MAX_CHARS] + "\n... (内容已截断)"
+        return content
+
+    @staticmethod
+    def _parse_yaml_response(response_text: str) -> Any:
+        """解析 YAML 响应（移除可能的 markdown 代码块标记）"""
+        if "```yaml" in response_text:
+            response_text = response_text.split("```yaml")[1].split("```")[0]
+        elif "```" in response_text:
+            response_text = response_text.split("```")[1].split("```")[0]
+
+        return yaml_load(response_text.strip())
+
+    @staticmethod
+    def _normalize_summary_result(result: Any) -> Optional[Dict]:
+        """验证并规范化单篇摘要结果"""
+        if isinstance(result, dict) and "summary" in result:
+            return {
+                "summary": result.get("summary", ""),
+                "keywords": result.get("keywords", []),
+                "topics": result.get("topics", [])
+            }
+        return None
+
+    def _call_claude_api(self, content: str) -> Optional[Dict]:
+        """调用 Claude API 生成摘要"""
+        api_key = os.environ.get("ANTHROPIC_API_KEY")
+        if not api_key:
+            return None
+
+        content = self._truncate_for_summary(content)
+
+        prompt = f"""请分析以下文档，生成：
+1. 一句话摘要（50-100字）
+2. 5-10个关键词（具有检索价值）
+3. 3-5个主题标签（反映文档类别）
+
+文档内容：
+{content}
+
+请严格按以下 YAML 格式输出（不要有其他内容）：
+summary: "摘要内容"
+keywords:
+  - 关键词1
+  - 关键词2
+topics:
+  - 主题1
+  - 主题2"""
+
+        try:
+            response_text = self._create_message(prompt, max_tokens=500)
+            return self._normalize_summary_result(self._parse_yaml_response(response_text))
+        except ImportError:
+            # anthropic 包未安装
+            pass
+
+        return None
 
-        try:
-            import anthropic
+    def _call_claude_api_batch(self, contents: List[str]) -> List[Optional[Dict]]:
+        """
+        调用 Claude API 为多篇文档生成摘要（单个请求）
 
-            client = anthropic.Anthropic(api_key=api_key)
-            message = client.messages.create(
-                model="claude-sonnet-4-6-20250514",
-                max_tokens=500,
-                messages=[{"role": "user", "content": prompt}]
-            )
+        Returns:
+            与 contents 顺序一致的结果列表，未返回或格式错误的文档为 None
+        """
+        results: List[Optional[Dict]] = [None] * len(contents)
+
+        api_key = os.environ.get("ANTHROPIC_API_KEY")
+        if not api_key:
+            return results
 
-            response_text = message.content[0].text
+        documents = "\n\n".join(
+            f"=== 文档 {i} ===\n{self._truncate_for_summary(content)}"
+            for i, content in enumerate(contents, 1)
+        )
 
-            # 解析 YAML 响应
-            # 移除可能的 markdown 代码块标记
-            if "```yaml" in response_text:
-                response_text = response_text.split("```yaml")[1].split("```")[0]
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0]
+        prompt = f"""请分别分析以下 {len(contents)} 篇文档，为每篇生成：
+1. 一句话摘要（50-100字）
+2. 5-10个关键词（具有检索价值）
+3. 3-5个主题标签（反映文档类别）
 
-            result = yaml.safe_load(response_text.strip())
+{documents}
 
-            # 验证结果
-            if isinstance(result, dict) and "summary" in result:
-                return {
-                    "summary": result.get("summary", ""),
-                    "keywords": result.get("keywords", []),
-                    "topics": result.get("topics", [])
-                }
+请严格按以下 YAML 格式输出（不要有其他内容），id 为文档编号，每篇文档一项：
+documents:
+  - id: 1
+    summary: "摘要内容"
+    keywords:
+      - 关键词1
+      - 关键词2
+    topics:
+      - 主题1
+      - 主题2"""
+
+        try:
+            response_text = self._create_message(prompt, max_tokens=500 * len(contents))
+            parsed = self._parse_yaml_response(response_text)
         except ImportError:
             # anthropic 包未安装
-            pass
-        except Exception as e:
-            raise e
+            return results
 
-        return None
+        items = parsed.get("documents", []) if isinstance(parsed, dict) else []
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                doc_id = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if 1 <= doc_id <= len(contents):
+                results[doc_id - 1] = self._normalize_summary_result(item)
+
+        return results
 
     def _generate_basic_summary(self, content: str) -> Dict[str, Any]:
         """生成基础摘要（无 AI 时降级）"""
@@ -464,7 +3815,7 @@ topics:
 
         try:
             with open(self.registry_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f) or {
+                return yaml_load(f) or {
                     "version": "1.0",
                     "last_updated": self.get_timestamp(),
                     "knowledge_bases": []
@@ -485,7 +3836,256 @@ topics:
         self.registry["last_updated"] = self.get_timestamp()
 
         with open(self.registry_path, 'w', encoding='utf-8') as f:
-            yaml.dump(self.registry, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+            yaml_dump(self.registry, f)
+
+    def load_kb_config(self, kb_path: str) -> Dict:
+        """
+        加载知识库配置（_index_config.yaml 中的 indexing 部分）
+
+        Args:
+            kb_path: 知识库路径
+
+        Returns:
+            indexing 配置字典（文件不存在或损坏时返回空字典）
+        """
+        config_path = os.path.join(kb_path, "_index_config.yaml")
+        if not os.path.exists(config_path):
+            return {}
+
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = yaml_load(f) or {}
+        except Exception as e:
+            print(f"⚠️ 配置文件加载失败: {e}")
+            return {}
+
+        indexing = config.get('indexing', {}) if isinstance(config, dict) else {}
+        return indexing if isinstance(indexing, dict) else {}
+
+    def get_workers(self, kb_path: str) -> int:
+        """
+        获取文档处理并行线程数
+
+        优先级：命令行 --workers > _index_config.yaml 的 performance.parallel_workers > 1
+        """
+        workers = self.workers
+        if workers is None:
+            performance = self.load_kb_config(kb_path).get('performance', {}) or {}
+            workers = performance.get('parallel_workers', 1)
+
+        try:
+            return max(1, int(workers))
+        except (TypeError, ValueError):
+            return 1
+
+    def get_summary_options(self, kb_path: str) -> Dict[str, Any]:
+        """
+        获取 AI 摘要生成参数
+
+        命令行（--batch-size / --concurrency）优先，其次 _index_config.yaml 的 summary 部分：
+            batch_size: 每个请求合并的文档数（默认 1）
+            concurrency: 同时进行的请求数（默认 1）
+            requests_per_minute / tokens_per_minute: 每分钟预算（默认不限制）
+            max_retries: 429/5xx 重试次数（默认 3）
+        """
+        summary = self.load_kb_config(kb_path).get('summary', {}) or {}
+
+        def positive_int(value, default):
+            try:
+                return max(1, int(value))
+            except (TypeError, ValueError):
+                return default
+
+        def optional_int(value):
+            return positive_int(value, None) if value is not None else None
+
+        try:
+            max_retries = max(0, int(summary.get('max_retries', 3)))
+        except (TypeError, ValueError):
+            max_retries = 3
+
+        return {
+            "batch_size": positive_int(self.summary_batch_size if self.summary_batch_size is not None
+                                       else summary.get('batch_size', 1), 1),
+            "concurrency": positive_int(self.summary_concurrency if self.summary_concurrency is not None
+                                        else summary.get('concurrency', 1), 1),
+            "requests_per_minute": optional_int(summary.get('requests_per_minute')),
+            "tokens_per_minute": optional_int(summary.get('tokens_per_minute')),
+            "max_retries": max_retries
+        }
+
+    def get_update_detection(self, kb_path: str) -> str:
+        """
+        获取变更检测方法（_index_config.yaml 的 update_detection.method）
+
+        Returns:
+            "mtime"（大小+修改时间，默认）、"hash"（内容哈希）或 "hybrid"（mtime 初筛 + hash 验证）
+        """
+        detection = self.load_kb_config(kb_path).get('update_detection', {}) or {}
+        method = str(detection.get('method', 'mtime')).lower()
+        return method if method in ('mtime', 'hash', 'hybrid') else 'mtime'
+
+    def get_storage_backend(self, kb_path: str) -> str:
+        """
+        获取索引存储后端
+
+        优先级：命令行 --storage > _index_config.yaml 的 storage.backend >
+        已存在 SQLite 数据库时继续使用 sqlite（否则 yaml）
+        """
+        backend = self.storage
+        if backend is None:
+            storage = self.load_kb_config(kb_path).get('storage', {}) or {}
+            backend = storage.get('backend')
+        if backend is None:
+            return 'sqlite' if os.path.exists(SQLiteIndexStore.get_path(kb_path)) else 'yaml'
+
+        backend = str(backend).lower()
+        return backend if backend in ('yaml', 'sqlite') else 'yaml'
+
+    def get_ranker(self, kb_path: str) -> str:
+        """
+        获取检索评分方式
+
+        优先级：命令行 --ranker > _index_config.yaml 的 search.ranker > weighted
+        """
+        ranker = self.ranker
+        if ranker is None:
+            search = self.load_kb_config(kb_path).get('search', {}) or {}
+            ranker = search.get('ranker', 'weighted')
+
+        ranker = str(ranker).lower()
+        return ranker if ranker in self.RANKERS else 'weighted'
+
+    def is_fulltext_enabled(self, kb_path: str) -> bool:
+        """
+        是否生成正文全文索引
+
+        优先级：命令行 --fulltext > _index_config.yaml 的 search.fulltext >
+        已存在全文索引时继续维护（否则不生成）
+        """
+        if self.fulltext:
+            return True
+        search = self.load_kb_config(kb_path).get('search', {}) or {}
+        enabled = search.get('fulltext')
+        if enabled is None:
+            return os.path.exists(FullTextIndex.get_path(kb_path))
+        return bool(enabled)
+
+    def is_semantic_enabled(self, kb_path: str) -> bool:
+        """
+        是否生成语义向量索引
+
+        优先级：命令行 --semantic > _index_config.yaml 的 search.semantic >
+        已存在向量索引时继续维护（否则不生成）
+        """
+        if self.semantic:
+            return True
+        search = self.load_kb_config(kb_path).get('search', {}) or {}
+        enabled = search.get('semantic')
+        if enabled is None:
+            return os.path.exists(VectorIndex.get_path(kb_path))
+        return bool(enabled)
+
+    def get_semantic_options(self, kb_path: str) -> Dict[str, Any]:
+        """
+        读取语义检索配置（search 部分）
+
+        Returns:
+            {"model": 本地模型名或路径（None 使用哈希 TF-IDF + SVD）, "dim": SVD 维度,
+             "weight": 混合检索中语义分数的权重, "nprobe": IVF 扫描的簇数,
+             "min_score": 计入结果的最低余弦相似度}
+        """
+        search = self.load_kb_config(kb_path).get('search', {}) or {}
+
+        def number(key, default, cast):
+            try:
+                return cast(search.get(key, default))
+            except (TypeError, ValueError):
+                return default
+
+        return {
+            "model": search.get('semantic_model') or None,
+            "dim": max(1, number('semantic_dim', VectorIndex.DEFAULT_DIM, int)),
+            "weight": min(1.0, max(0.0, number('hybrid_weight', 0.5, float))),
+            "nprobe": max(1, number('semantic_nprobe', VectorIndex.DEFAULT_NPROBE, int)),
+            "min_score": min(1.0, max(0.0, number('semantic_min_score', VectorIndex.DEFAULT_MIN_SCORE, float)))
+        }
+
+    def get_search_mode(self, kb_path: str) -> str:
+        """
+        获取检索模式
+
+        优先级：命令行 --mode > _index_config.yaml 的 search.mode > keyword
+        """
+        mode = self.search_mode
+        if mode is None:
+            search = self.load_kb_config(kb_path).get('search', {}) or {}
+            mode = search.get('mode', 'keyword')
+
+        mode = str(mode).lower()
+        return mode if mode in self.SEARCH_MODES else 'keyword'
+
+    def get_sqlite_store(self, kb_path: str) -> Optional[SQLiteIndexStore]:
+        """
+        获取 SQLite 存储
+
+        未启用 sqlite 后端、数据库不存在或与 _index.yaml 不一致（_index.yaml 在数据库之后被改写）
+        时返回 None，调用方回退到解析 _index.yaml。
+        """
+        if self.get_storage_backend(kb_path) != 'sqlite':
+            return None
+
+        store = SQLiteIndexStore(SQLiteIndexStore.get_path(kb_path))
+        if not store.exists():
+            return None
+        source = SQLiteIndexStore.source_signature(os.path.join(kb_path, "_index.yaml"))
+        return store if source is None or store.stored_source() == source else None
+
+    def save_sqlite_index(self, kb_path: str, index_data: Dict):
+        """
+        同步 SQLite 索引（在写出 _index.yaml 之后调用）
+
+        sqlite 后端写入数据库并记录 _index.yaml 的签名；显式选择 yaml 后端时删除已有的数据库。
+        """
+        db_path = SQLiteIndexStore.get_path(kb_path)
+        if self.get_storage_backend(kb_path) != 'sqlite':
+            if os.path.exists(db_path):
+                os.remove(db_path)
+                print(f"  ✓ 已删除 SQLite 索引: {db_path}")
+            return
+
+        store = SQLiteIndexStore(db_path)
+        store.save(index_data, SQLiteIndexStore.source_signature(os.path.join(kb_path, "_index.yaml")))
+        print(f"  ✓ 写入 SQLite 索引: {store.db_path}")
+
+    def load_index(self, kb_path: str) -> Dict:
+        """
+        读取索引（sqlite 后端优先读取数据库，否则解析 _index.yaml）
+
+        Raises:
+            读取或解析失败时抛出异常，由调用方处理
+        """
+        store = self.get_sqlite_store(kb_path)
+        if store:
+            return store.load()
+
+        index_path = os.path.join(kb_path, "_index.yaml")
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return yaml_load(f)
+
+    def write_index(self, kb_path: str, index_data: Dict):
+        """
+        写入索引：_index.yaml（始终写出，作为导出格式）、sqlite 数据库（启用时）、
+        检索旁路索引和全文索引（启用时）
+        """
+        index_path = os.path.join(kb_path, "_index.yaml")
+        with open(index_path, 'w', encoding='utf-8') as f:
+            yaml_dump(index_data, f)
+
+        self.save_sqlite_index(kb_path, index_data)
+        self.save_search_index(kb_path, index_data)
+        self.save_fulltext_index(kb_path, index_data)
+        self.save_vector_index(kb_path, index_data)
 
     # ========== 核心方法 ==========
 
@@ -802,8 +4402,7 @@ topics:
         }
 
         # 写入文件
-        with open(index_path, 'w', encoding='utf-8') as f:
-            yaml.dump(index_data, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+        self.write_index(kb_path, index_data)
 
         print(f"  ✓ 写入索引文件: {index_path}")
 
@@ -839,17 +4438,11 @@ topics:
         # 读取现有索引
         print("[1/4] 读取现有索引...")
         try:
-            with open(index_path, 'r', encoding='utf-8') as f:
-                old_index = yaml.safe_load(f)
+            old_index = self.load_index(kb_path)
         except Exception as e:
             print(f"❌ 索引文件损坏: {e}")
             return False
 
-        # 检测变更
-        print("\n[2/4] 检测变更...")
-        markdown_docs, other_docs = self.scan_documents(kb_path, generate_summaries=self.enable_ai_summary)
-        current_docs = {doc['path']: doc for doc in markdown_docs + other_docs}
-
         # 兼容旧版索引格式
         old_docs = {}
         if 'documents' in old_index:
@@ -861,13 +4454,23 @@ topics:
             for doc in old_index.get('other_documents', []):
                 old_docs[doc['path']] = doc
 
+        # 检测变更：先 stat，未变更的文档直接复用旧记录，仅处理新增和修改的文件
+        print("\n[2/4] 检测变更...")
+        has_obsidian = os.path.exists(os.path.join(kb_path, '.obsidian'))
+        old_kb_info = old_index.get('knowledge_base', {})
+        reusable = 'documents' not in old_index and old_kb_info.get('has_obsidian') == has_obsidian
+        markdown_docs, other_docs = self.scan_documents(
+            kb_path, generate_summaries=self.enable_ai_summary,
+            previous_docs=old_docs if reusable else None)
+        current_docs = {doc['path']: doc for doc in markdown_docs + other_docs}
+
         changes = {"added": [], "modified": [], "deleted": []}
 
-        # 检测新增和修改
+        # 检测新增和修改（复用的记录与旧记录一致，backlinks 变化不计入）
         for doc_path, doc in current_docs.items():
             if doc_path not in old_docs:
                 changes["added"].append(doc)
-            elif doc['modified'] > old_docs[doc_path]['modified']:
+            elif self._strip_backlinks(doc) != self._strip_backlinks(old_docs[doc_path]):
                 changes["modified"].append(doc)
 
         # 检测删除
@@ -879,67 +4482,385 @@ topics:
         print(f"  - 修改: {len(changes['modified'])} 个")
         print(f"  - 删除: {len(changes['deleted'])} 个")
 
-        if not any(changes.values()):
+        # 文档未变更但反向链接不同（旧版索引未能解析子文件夹中的笔记）时同样重写索引
+        backlinks_changed = any(set(doc.get('backlinks', [])) != set(old_docs[doc_path].get('backlinks', []) or [])
+                                for doc_path, doc in current_docs.items() if doc_path in old_docs)
+
+        if not any(changes.values()) and not backlinks_changed:
             print("\n✓ 索引已是最新，无需更新")
+            if self.get_storage_backend(kb_path) == 'sqlite' and not self.get_sqlite_store(kb_path):
+                self.save_sqlite_index(kb_path, old_index)
+            if self.is_search_index_stale(kb_path):
+                self.save_search_index(kb_path, old_index)
+            if self.is_fulltext_enabled(kb_path) and not FullTextIndex.is_current(FullTextIndex.get_path(kb_path)):
+                self.save_fulltext_index(kb_path, old_index)
+            if self.is_semantic_enabled(kb_path) and not os.path.exists(VectorIndex.get_path(kb_path)):
+                self.save_vector_index(kb_path, old_index)
             return True
 
         # 更新索引
         print("\n[3/4] 更新索引文件...")
-        total_size = sum(doc['size'] for doc in markdown_docs + other_docs)
+        self._refresh_index_data(old_index, markdown_docs, other_docs, has_obsidian)
 
-        # 检测 Obsidian
+        # 写入
+        self.write_index(kb_path, old_index)
+
+        # 更新注册表
+        print("\n[4/4] 更新注册表...")
+        self.update_registry_entry(kb_path, {
+            "document_count": len(markdown_docs) + len(other_docs),
+            "last_updated": self.get_timestamp()
+        })
+
+        print(f"\n{'='*60}")
+        print("✓ 索引更新完成")
+        print(f"{'='*60}")
+        print(f"  - 新增: {len(changes['added'])} 个文档")
+        print(f"  - 修改: {len(changes['modified'])} 个文档")
+        print(f"  - 删除: {len(changes['deleted'])} 个文档")
+        print(f"  - 当前总数: {len(markdown_docs) + len(other_docs)} 个文档")
+
+        return True
+
+    def apply_file_changes(self, kb_path: str, index_data: Dict,
+                           changed_paths: set) -> Dict[str, List[str]]:
+        """
+        将一组文件变更增量应用到内存中的索引数据（不重新扫描整个知识库）
+
+        只读取和解析变更的文件；反向链接、文件夹分区和语义分类基于内存中的
+        文档列表重新计算。
+
+        Args:
+            kb_path: 知识库路径
+            index_data: 当前索引数据（原地修改）
+            changed_paths: 变更的相对路径（文件，或新建/删除/移动的目录）
+
+        Returns:
+            {"added": [...], "modified": [...], "deleted": [...]}（相对路径）
+        """
         has_obsidian = os.path.exists(os.path.join(kb_path, '.obsidian'))
+        docs = {doc['path']: doc for doc in
+                index_data.get('markdown_documents', []) + index_data.get('other_documents', [])}
+
+        # 展开目录：存在的目录处理其下所有文件，不存在的路径同时删除其下所有记录
+        targets = set()
+        for rel_path in changed_paths:
+            full_path = os.path.join(kb_path, rel_path)
+            prefix = rel_path.rstrip('/') + '/'
+            targets.update(path for path in docs if path.startswith(prefix))
+            if os.path.isdir(full_path):
+                for root, dirs, files in os.walk(full_path):
+                    dirs[:] = [d for d in dirs if self.is_scanned_dir(d)]
+                    targets.update(
+                        os.path.relpath(os.path.join(root, f), kb_path).replace(os.sep, '/')
+                        for f in files if self.is_indexed_file(f))
+            elif self.is_indexed_file(os.path.basename(rel_path)):
+                targets.add(rel_path)
+
+        detection = self.get_update_detection(kb_path)
+        summary_options = self.get_summary_options(kb_path)
+        generate_summaries = self.enable_ai_summary
+        defer_summary = generate_summaries and (summary_options['batch_size'] > 1
+                                                or summary_options['concurrency'] > 1)
+
+        changes = {"added": [], "modified": [], "deleted": []}
+        deferred = []
+        for rel_path in sorted(targets):
+            file_path = os.path.join(kb_path, rel_path)
+            old_doc = docs.get(rel_path)
+
+            if not os.path.isfile(file_path):
+                if old_doc:
+                    del docs[rel_path]
+                    changes["deleted"].append(rel_path)
+                continue
+
+            root, file = os.path.split(file_path)
+            try:
+                # 仅触碰文件（如属性变化、内容未变的保存）时不重新处理
+                if old_doc and self._reuse_document(kb_path, root, file, {rel_path: old_doc}, detection,
+                                                    require_summary=generate_summaries) is not None:
+                    continue
+                doc_info, content = self._process_document(kb_path, root, file, self.get_file_type(file),
+                                                           has_obsidian, generate_summaries,
+                                                           store_hash=detection != 'mtime',
+                                                           defer_summary=defer_summary)
+            except Exception as e:
+                print(f"⚠️ 跳过文件: {file_path} ({e})")
+                continue
+
+            if content is not None:
+                deferred.append((doc_info, content))
+            docs[rel_path] = doc_info
+            changes["modified" if old_doc else "added"].append(rel_path)
+
+        if deferred:
+            summaries = self.generate_ai_summaries(
+                [(content, doc_info['path']) for doc_info, content in deferred],
+                summary_options['batch_size'], summary_options)
+            for (doc_info, _), summary_data in zip(deferred, summaries):
+                self._apply_summary(doc_info, summary_data)
+
+        if not any(changes.values()):
+            return changes
+
+        # 已有文档保持原有顺序，新增文档追加在末尾
+        markdown_docs = [doc for doc in docs.values() if doc['type'] == 'markdown']
+        other_docs = [doc for doc in docs.values() if doc['type'] != 'markdown']
+        if has_obsidian:
+            self._apply_backlinks(markdown_docs)
+        self._refresh_index_data(index_data, markdown_docs, other_docs, has_obsidian)
+
+        return changes
+
+    def watch_index(self, kb_path: str, use_polling: bool = False, debounce: float = 1.0) -> bool:
+        """
+        监听知识库文件变更，持续增量更新索引（Ctrl+C 退出）
+
+        启动时先执行一次 update 补上未监听期间的变更，之后每批变更只处理
+        涉及的文件，并写回 _index.yaml 及旁路索引。
+
+        Args:
+            kb_path: 知识库路径
+            use_polling: 强制使用轮询模式（网络盘、容器挂载等 inotify 不可用的场景）
+            debounce: 事件静默多少秒后应用变更
+        """
+        if not self.update_index(kb_path):
+            return False
+
+        try:
+            index_data = self.load_index(kb_path)
+        except Exception as e:
+            print(f"❌ 索引文件损坏: {e}")
+            return False
+
+        watcher = FileWatcher(kb_path, self.is_indexed_file, self.is_scanned_dir,
+                              debounce=debounce, use_polling=use_polling)
+
+        print(f"\n{'='*60}")
+        print(f"监听知识库: {kb_path}")
+        print(f"{'='*60}")
+        print(f"  - 模式: {watcher.mode}")
+        print(f"  - 防抖: {debounce} 秒")
+        print("  按 Ctrl+C 退出\n")
+
+        def on_changes(paths: set):
+            start_time = time.time()
+            changes = self.apply_file_changes(kb_path, index_data, paths)
+            if not any(changes.values()):
+                return
+
+            self.write_index(kb_path, index_data)
+            self.update_registry_entry(kb_path, {
+                "document_count": index_data['knowledge_base']['total_documents'],
+                "last_updated": self.get_timestamp()
+            })
+
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✓ 索引已更新"
+                  f"（新增 {len(changes['added'])}，修改 {len(changes['modified'])}，"
+                  f"删除 {len(changes['deleted'])}，耗时 {time.time() - start_time:.2f} 秒）")
+            for mark, key in (('+', 'added'), ('~', 'modified'), ('-', 'deleted')):
+                for rel_path in changes[key][:10]:
+                    print(f"    {mark} {rel_path}")
+                if len(changes[key]) > 10:
+                    print(f"    {mark} ... 另有 {len(changes[key]) - 10} 个")
+
+        def on_overflow():
+            print("⚠️ 文件事件过多，部分事件已丢失，执行一次完整增量更新")
+            if self.update_index(kb_path):
+                index_data.clear()
+                index_data.update(self.load_index(kb_path))
+
+        try:
+            watcher.run(on_changes, on_overflow)
+        except KeyboardInterrupt:
+            print("\n✓ 已停止监听")
+        return True
+
+    def _refresh_index_data(self, index_data: Dict, markdown_docs: List[Dict],
+                            other_docs: List[Dict], has_obsidian: bool):
+        """用新的文档列表更新索引数据：统计信息、文件夹分区和语义分类"""
+        total_size = sum(doc['size'] for doc in markdown_docs + other_docs)
+
         kb_type = "obsidian" if has_obsidian else "generic"
 
         # 生成文件夹分区索引和语义分类索引
         folders = self._generate_folder_index(markdown_docs, other_docs)
         categories = self._generate_category_index(markdown_docs, other_docs, folders)
 
-        old_index['version'] = '2.1'
-        old_index['knowledge_base']['type'] = kb_type
-        old_index['knowledge_base']['has_obsidian'] = has_obsidian
-        old_index['knowledge_base']['last_updated'] = self.get_timestamp()
-        old_index['knowledge_base']['total_documents'] = len(markdown_docs) + len(other_docs)
-        old_index['knowledge_base']['total_size_mb'] = round(total_size / (1024 * 1024), 2)
+        index_data['version'] = '2.1'
+        index_data['knowledge_base']['type'] = kb_type
+        index_data['knowledge_base']['has_obsidian'] = has_obsidian
+        index_data['knowledge_base']['last_updated'] = self.get_timestamp()
+        index_data['knowledge_base']['total_documents'] = len(markdown_docs) + len(other_docs)
+        index_data['knowledge_base']['total_size_mb'] = round(total_size / (1024 * 1024), 2)
 
         # 添加文件夹和分类索引
-        old_index['folders'] = folders
-        old_index['categories'] = categories
+        index_data['folders'] = folders
+        index_data['categories'] = categories
 
         # 使用分类索引结构
-        old_index['markdown_documents'] = markdown_docs
-        old_index['other_documents'] = other_docs
-        if 'documents' in old_index:
-            del old_index['documents']
+        index_data['markdown_documents'] = markdown_docs
+        index_data['other_documents'] = other_docs
+        if 'documents' in index_data:
+            del index_data['documents']
 
-        # 写入
-        with open(index_path, 'w', encoding='utf-8') as f:
-            yaml.dump(old_index, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+        # 运行过 graph 命令的知识库随文档变更重新计算中心度
+        if 'graph' in index_data:
+            self.apply_link_graph(index_data)
 
-        # 更新注册表
-        print("\n[4/4] 更新注册表...")
-        self.update_registry_entry(kb_path, {
-            "document_count": len(markdown_docs) + len(other_docs),
-            "last_updated": self.get_timestamp()
-        })
+    @staticmethod
+    def _strip_backlinks(doc: Dict) -> Dict:
+        """返回不含 backlinks 的文档记录（用于变更比较）"""
+        return {k: v for k, v in doc.items() if k != 'backlinks'}
+
+    def delete_index(self, kb_path: str):
+        """删除索引"""
+        index_path = os.path.join(kb_path, "_index.yaml")
+
+        if os.path.exists(index_path):
+            os.remove(index_path)
+            print(f"  ✓ 已删除索引: {index_path}")
+
+        for sidecar_path in (SearchIndex.get_path(kb_path), SearchIndex.get_legacy_path(kb_path),
+                             SQLiteIndexStore.get_path(kb_path), FullTextIndex.get_path(kb_path),
+                             VectorIndex.get_path(kb_path)):
+            if os.path.exists(sidecar_path):
+                os.remove(sidecar_path)
+
+    def save_search_index(self, kb_path: str, index_data: Dict):
+        """
+        生成倒排检索旁路索引（需在 _index.yaml 写入后调用）
+
+        旧版 documents 格式不生成，检索时回退到逐个文档扫描。
+        """
+        if 'documents' in index_data:
+            return
+
+        index_path = os.path.join(kb_path, "_index.yaml")
+        try:
+            search_index = SearchIndex.build(index_data.get('markdown_documents', []),
+                                             index_data.get('other_documents', []))
+            search_index.save(SearchIndex.get_path(kb_path), SearchIndex.source_signature(index_path))
+            print(f"  ✓ 写入检索索引: {SearchIndex.get_path(kb_path)}")
+            if os.path.exists(SearchIndex.get_legacy_path(kb_path)):
+                os.remove(SearchIndex.get_legacy_path(kb_path))
+        except Exception as e:
+            print(f"  ⚠️ 检索索引生成失败: {e}")
+
+    def load_search_index(self, kb_path: str) -> Optional[SearchIndex]:
+        """读取倒排检索旁路索引（不存在或已过期时返回 None）"""
+        index_path = os.path.join(kb_path, "_index.yaml")
+        try:
+            return SearchIndex.load(SearchIndex.get_path(kb_path), SearchIndex.source_signature(index_path))
+        except OSError:
+            return None
+
+    def save_fulltext_index(self, kb_path: str, index_data: Dict):
+        """
+        生成或增量更新正文全文索引（search.fulltext 启用时）
+
+        大小和修改时间未变的文档复用旧索引，只读取新增和修改的文档正文；
+        配置中显式关闭时删除已有的全文索引。
+        """
+        fulltext_path = FullTextIndex.get_path(kb_path)
+        if not self.is_fulltext_enabled(kb_path):
+            if os.path.exists(fulltext_path):
+                os.remove(fulltext_path)
+                print(f"  ✓ 已删除全文索引: {fulltext_path}")
+            return
+        if 'documents' in index_data:
+            return
+
+        try:
+            documents = index_data.get('markdown_documents', []) + index_data.get('other_documents', [])
+            previous = FullTextIndex.load(fulltext_path)
+            fulltext, read_count = FullTextIndex.build(
+                documents, lambda doc: self.read_document_text(kb_path, doc), previous, progress=True)
+            if previous is not None:
+                previous.close()
+            fulltext.save(fulltext_path)
+            print(f"  ✓ 写入全文索引: {fulltext_path}（重新读取 {read_count} 个文档）")
+        except Exception as e:
+            print(f"  ⚠️ 全文索引生成失败: {e}")
+
+    def read_document_text(self, kb_path: str, doc: Dict) -> Optional[str]:
+        """
+        读取文档正文（Markdown / 文本直接读取，PDF / Word 调用 extract_text.py 提取）
+
+        PDF / Word 经提取缓存读取：文件未变化时只计算哈希（索引中已记录 hash 时直接复用），不重新解析。
+
+        Returns:
+            正文；无法读取或缺少提取依赖时返回 None
+        """
+        file_path = os.path.join(kb_path, doc['path'])
+        if doc.get('type') in ('markdown', 'text'):
+            return self._read_file_content(file_path)
+
+        try:
+            from extract_text import extract_text
+        except ImportError:
+            return None
+        try:
+            result = extract_text(file_path, cache=self.extraction_cache, content_hash=doc.get('hash'))
+        except Exception:
+            return None
+        return result.get('text') if result.get('success') else None
+
+    def load_fulltext_index(self, kb_path: str) -> Optional[FullTextIndex]:
+        """读取正文全文索引（未启用或不存在时返回 None）"""
+        return FullTextIndex.load(FullTextIndex.get_path(kb_path))
+
+    def save_vector_index(self, kb_path: str, index_data: Dict):
+        """
+        生成语义向量索引（search.semantic 启用时）
+
+        需要 NumPy；配置了本地模型时向量化文本未变的文档复用旧向量。启用全文索引时正文开头
+        也参与向量化，使只出现在正文中的内容同样能被语义检索找到。
+        配置中显式关闭时删除已有的向量索引。
+        """
+        vector_path = VectorIndex.get_path(kb_path)
+        if not self.is_semantic_enabled(kb_path):
+            if os.path.exists(vector_path):
+                os.remove(vector_path)
+                print(f"  ✓ 已删除语义索引: {vector_path}")
+            return
+        if 'documents' in index_data:
+            return
+        if VectorIndex.get_numpy() is None:
+            print("  ⚠️ 语义索引需要 NumPy（pip install numpy），已跳过")
+            return
 
-        print(f"\n{'='*60}")
-        print("✓ 索引更新完成")
-        print(f"{'='*60}")
-        print(f"  - 新增: {len(changes['added'])} 个文档")
-        print(f"  - 修改: {len(changes['modified'])} 个文档")
-        print(f"  - 删除: {len(changes['deleted'])} 个文档")
-        print(f"  - 当前总数: {len(markdown_docs) + len(other_docs)} 个文档")
+        try:
+            options = self.get_semantic_options(kb_path)
+            documents = index_data.get('markdown_documents', []) + index_data.get('other_documents', [])
+            previous = VectorIndex.load(vector_path) if options['model'] else None
+            read_body = None
+            if self.is_fulltext_enabled(kb_path):
+                read_body = lambda doc: self.read_document_text(kb_path, doc)
+            vectors = VectorIndex.build(documents, model=options['model'], dim=options['dim'], previous=previous,
+                                        read_body=read_body)
+            if previous is not None:
+                previous.close()
+            vectors.save(vector_path)
+            kind = f"模型 {options['model']}" if vectors.embedder['kind'] == 'model' else "哈希 TF-IDF + SVD"
+            print(f"  ✓ 写入语义索引: {vector_path}（{kind}，{vectors.dim} 维）")
+        except Exception as e:
+            print(f"  ⚠️ 语义索引生成失败: {e}")
 
-        return True
+    def load_vector_index(self, kb_path: str) -> Optional[VectorIndex]:
+        """读取语义向量索引（不存在或未安装 NumPy 时返回 None）"""
+        return VectorIndex.load(VectorIndex.get_path(kb_path))
 
-    def delete_index(self, kb_path: str):
-        """删除索引"""
+    def is_search_index_stale(self, kb_path: str) -> bool:
+        """检查旁路索引是否缺失、格式版本过旧或早于 _index.yaml（不读取完整内容）"""
         index_path = os.path.join(kb_path, "_index.yaml")
-
-        if os.path.exists(index_path):
-            os.remove(index_path)
-            print(f"  ✓ 已删除索引: {index_path}")
+        search_index_path = SearchIndex.get_path(kb_path)
+        if not os.path.exists(search_index_path):
+            return True
+        if SearchIndex.file_version(search_index_path) != SearchIndex.VERSION:
+            return True
+        return os.stat(search_index_path).st_mtime_ns < os.stat(index_path).st_mtime_ns
 
     # ========== 注册表操作 ==========
 
@@ -1045,7 +4966,8 @@ topics:
     # ========== 工具方法 ==========
 
     def scan_documents(self, kb_path: str, generate_summaries: bool = True,
-                       progress: bool = True) -> Tuple[List[Dict], List[Dict]]:
+                       progress: bool = True,
+                       previous_docs: Optional[Dict[str, Dict]] = None) -> Tuple[List[Dict], List[Dict]]:
         """
         扫描文档，返回分类结构（markdown_documents, other_documents）
 
@@ -1053,18 +4975,14 @@ topics:
             kb_path: 知识库路径
             generate_summaries: 是否生成 AI 摘要
             progress: 是否显示进度
+            previous_docs: 旧索引文档 {path: doc}，未变更的文件直接复用旧记录，
+                           不再读取、解析和生成摘要
 
         Returns:
             (markdown_documents, other_documents)
         """
         markdown_docs = []
         other_docs = []
-        supported_extensions = {
-            'markdown': ['.md', '.markdown'],
-            'pdf': ['.pdf'],
-            'word': ['.docx', '.doc'],
-            'text': ['.txt']
-        }
 
         # 检测是否有 Obsidian
         has_obsidian = os.path.exists(os.path.join(kb_path, '.obsidian'))
@@ -1073,103 +4991,231 @@ topics:
         all_files = []
         for root, dirs, files in os.walk(kb_path):
             # 跳过隐藏文件夹和特殊文件夹
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['.git', '.obsidian', '__pycache__', 'node_modules']]
+            dirs[:] = [d for d in dirs if self.is_scanned_dir(d)]
 
             for file in files:
-                # 跳过索引文件
-                if file in ['_index.yaml', '_index_config.yaml']:
-                    continue
-
-                # 检查文件扩展名
-                ext = os.path.splitext(file)[1].lower()
-
-                # 确定文件类型
-                doc_type = None
-                for type_name, extensions in supported_extensions.items():
-                    if ext in extensions:
-                        doc_type = type_name
-                        break
-
-                if doc_type:
-                    all_files.append((root, file, doc_type))
+                # 跳过索引文件和不支持的格式
+                if self.is_indexed_file(file):
+                    all_files.append((root, file, self.get_file_type(file)))
 
         # 初始化进度报告器
         reporter = None
         if progress and len(all_files) > 10:
             reporter = ProgressReporter(len(all_files), "扫描文档")
 
-        # Phase 2: 逐个处理文件
-        for idx, (root, file, doc_type) in enumerate(all_files):
-            file_path = os.path.join(root, file)
-            rel_path = os.path.relpath(file_path, kb_path).replace(os.sep, '/')
+        # Phase 2: 处理文件（workers > 1 时并行，结果按扫描顺序汇总）
+        workers = self.get_workers(kb_path)
+        detection = self.get_update_detection(kb_path)
+        summary_options = self.get_summary_options(kb_path)
+        # 批量或并发摘要时，扫描阶段只使用缓存，其余文档在扫描结束后统一调度
+        defer_summary = generate_summaries and (summary_options['batch_size'] > 1
+                                                or summary_options['concurrency'] > 1)
+        results: List[Optional[Tuple[Dict, Optional[str]]]] = [None] * len(all_files)
 
-            # 更新进度
+        def report(idx: int):
             if reporter:
+                rel_path = os.path.relpath(os.path.join(all_files[idx][0], all_files[idx][1]),
+                                           kb_path).replace(os.sep, '/')
                 reporter.update(1, rel_path[:40] + ('...' if len(rel_path) > 40 else ''))
 
-            # 获取文件信息
-            try:
-                stat = os.stat(file_path)
-                doc_info = {
-                    "path": rel_path,
-                    "filename": file,
-                    "type": doc_type,
-                    "modified": self.get_file_modified(stat),
-                    "size": stat.st_size
-                }
-
-                if doc_type == 'markdown':
-                    # Markdown 文档：提取 wikilink、tags、生成摘要
-                    content = self._read_file_content(file_path)
-
-                    if content:
-                        # 提取 wikilinks
-                        if has_obsidian:
-                            doc_info['links'] = self.extract_wikilinks(content)
-
-                        # 提取 tags
-                        tags = self.extract_frontmatter_tags(content)
-                        tags.extend(self.extract_content_tags(content))
-                        if tags:
-                            doc_info['tags'] = list(set(tags))
-
-                        # 生成 AI 摘要
-                        if generate_summaries:
-                            summary_data = self.generate_ai_summary(content, rel_path)
-                            doc_info['summary'] = summary_data.get('summary', '')
-                            doc_info['keywords'] = summary_data.get('keywords', [])
-                            if summary_data.get('topics'):
-                                doc_info['topics'] = summary_data['topics']
-
-                    markdown_docs.append(doc_info)
-                else:
-                    # 其他格式文档：基础信息
-                    other_docs.append(doc_info)
-
-            except Exception as e:
-                print(f"\n⚠️ 跳过文件: {file_path} ({e})")
+        def process(idx: int) -> Tuple[Dict, Optional[str]]:
+            root, file, doc_type = all_files[idx]
+            if previous_docs:
+                reused = self._reuse_document(kb_path, root, file, previous_docs, detection,
+                                              require_summary=generate_summaries)
+                if reused is not None:
+                    return reused, None
+            return self._process_document(kb_path, root, file, doc_type,
+                                          has_obsidian, generate_summaries,
+                                          store_hash=detection != 'mtime',
+                                          defer_summary=defer_summary)
+
+        if workers > 1 and len(all_files) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(process, idx): idx for idx in range(len(all_files))}
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        file_path = os.path.join(all_files[idx][0], all_files[idx][1])
+                        print(f"\n⚠️ 跳过文件: {file_path} ({e})")
+                    report(idx)
+        else:
+            for idx in range(len(all_files)):
+                report(idx)
+                try:
+                    results[idx] = process(idx)
+                except Exception as e:
+                    file_path = os.path.join(all_files[idx][0], all_files[idx][1])
+                    print(f"\n⚠️ 跳过文件: {file_path} ({e})")
+
+        deferred = []
+        for result in results:
+            if result is None:
                 continue
+            doc_info, content = result
+            if doc_info['type'] == 'markdown':
+                markdown_docs.append(doc_info)
+                if content is not None:
+                    deferred.append((doc_info, content))
+            else:
+                other_docs.append(doc_info)
 
         # 完成进度
         if reporter:
             reporter.complete(f"发现 {len(markdown_docs)} 个 Markdown, {len(other_docs)} 个其他文档")
 
+        # Phase 3: 批量 / 并发生成摘要
+        if deferred:
+            summaries = self.generate_ai_summaries(
+                [(content, doc_info['path']) for doc_info, content in deferred],
+                summary_options['batch_size'], summary_options)
+            for (doc_info, _), summary_data in zip(deferred, summaries):
+                self._apply_summary(doc_info, summary_data)
+
+        if self._summary_cache is not None:
+            self._summary_cache.flush()
+
         # 计算反向链接
-        if has_obsidian and markdown_docs:
-            backlinks = self.calculate_backlinks(markdown_docs)
-            for doc in markdown_docs:
-                doc_path = doc.get('path', '')
-                # 尝试多种匹配方式
-                backlink_paths = backlinks.get(doc_path, [])
-                if not backlink_paths:
-                    # 尝试不带扩展名匹配
-                    base_name = doc_path.rsplit('.', 1)[0]
-                    backlink_paths = backlinks.get(f"{base_name}.md", [])
-                if backlink_paths:
-                    doc['backlinks'] = list(set(backlink_paths))
+        if has_obsidian:
+            self._apply_backlinks(markdown_docs)
 
         return markdown_docs, other_docs
 
+    @classmethod
+    def is_scanned_dir(cls, name: str) -> bool:
+        """目录是否参与扫描（跳过隐藏文件夹和特殊文件夹）"""
+        return not name.startswith('.') and name not in cls.SKIP_DIRS
+
+    @classmethod
+    def is_indexed_file(cls, name: str) -> bool:
+        """文件是否需要索引（支持的格式，且不是索引文件本身）"""
+        return name not in cls.INDEX_FILES and cls.get_file_type(name) != "unknown"
+
+    def _apply_backlinks(self, markdown_docs: List[Dict]):
+        """重新计算并写入所有 Markdown 文档的 backlinks 字段"""
+        backlinks = self.calculate_backlinks(markdown_docs) if markdown_docs else {}
+        for doc in markdown_docs:
+            doc.pop('backlinks', None)
+            backlink_paths = backlinks.get(doc.get('path', ''))
+            if backlink_paths:
+                doc['backlinks'] = backlink_paths
+
+    def _reuse_document(self, kb_path: str, root: str, file: str,
+                        previous_docs: Dict[str, Dict], detection: str,
+                        require_summary: bool = False) -> Optional[Dict]:
+        """
+        检查文件是否未变更，未变更时返回旧索引记录的副本
+
+        - mtime: 大小和修改时间均一致
+        - hybrid: 大小/修改时间一致，或内容哈希与旧记录的 hash 一致
+        - hash: 内容哈希与旧记录的 hash 一致
+
+        Args:
+            require_summary: 本次需要生成摘要；旧记录是没有摘要的 Markdown 文档（如来自 --no-ai 构建）时不复用
+
+        Returns:
+            可复用的文档记录（backlinks 会在扫描结束后重新计算），需重新处理时返回 None
+        """
+        file_path = os.path.join(root, file)
+        rel_path = os.path.relpath(file_path, kb_path).replace(os.sep, '/')
+
+        old_doc = previous_docs.get(rel_path)
+        if not old_doc:
+            return None
+        if require_summary and old_doc.get('type') == 'markdown' and 'summary' not in old_doc:
+            return None
+
+        stat = os.stat(file_path)
+        modified = self.get_file_modified(stat)
+
+        if detection != 'hash' and old_doc.get('modified') == modified \
+                and old_doc.get('size') == stat.st_size:
+            reused = dict(old_doc)
+        elif detection != 'mtime' and old_doc.get('hash') \
+                and old_doc['hash'] == self.get_file_hash(file_path):
+            reused = dict(old_doc)
+            reused['modified'] = modified
+            reused['size'] = stat.st_size
+        else:
+            return None
+
+        reused.pop('backlinks', None)
+        return reused
+
+    def _process_document(self, kb_path: str, root: str, file: str, doc_type: str,
+                          has_obsidian: bool, generate_summaries: bool,
+                          store_hash: bool = False,
+                          defer_summary: bool = False) -> Tuple[Dict, Optional[str]]:
+        """
+        处理单个文档：获取文件信息，Markdown 额外提取 wikilink、tags 并生成摘要
+
+        可在工作线程中调用，异常由调用方处理。
+
+        Args:
+            store_hash: 是否记录内容哈希（update_detection 为 hash/hybrid 时）
+            defer_summary: 未命中缓存时不立即生成摘要，返回内容留待批量生成
+
+        Returns:
+            (文档信息字典, 待批量生成摘要的内容或 None)
+        """
+        file_path = os.path.join(root, file)
+        rel_path = os.path.relpath(file_path, kb_path).replace(os.sep, '/')
+
+        stat = os.stat(file_path)
+        doc_info = {
+            "path": rel_path,
+            "filename": file,
+            "type": doc_type,
+            "modified": self.get_file_modified(stat),
+            "size": stat.st_size
+        }
+
+        if store_hash:
+            doc_info['hash'] = self.get_file_hash(file_path)
+
+        if doc_type != 'markdown':
+            return doc_info, None
+
+        content = self._read_file_content(file_path)
+        if content:
+            frontmatter = self.parse_frontmatter(content)
+
+            # 提取 wikilinks 和别名（别名用于解析指向本文档的链接）
+            if has_obsidian:
+                doc_info['links'] = self.extract_wikilinks(content)
+                aliases = self.extract_frontmatter_aliases(content, frontmatter)
+                if aliases:
+                    doc_info['aliases'] = aliases
+
+            # 提取 tags
+            tags = self.extract_frontmatter_tags(content, frontmatter)
+            tags.extend(self.extract_content_tags(content))
+            if tags:
+                doc_info['tags'] = list(set(tags))
+
+            # 生成 AI 摘要（批量模式下仅使用缓存，未命中的留待批量生成）
+            if generate_summaries:
+                if defer_summary:
+                    cached = self.get_cached_summary(self.get_content_hash(content))
+                    if not cached:
+                        return doc_info, content
+                    print(f"    ✓ 使用缓存: {rel_path}")
+                    self._apply_summary(doc_info, cached)
+                else:
+                    self._apply_summary(doc_info, self.generate_ai_summary(content, rel_path))
+
+        return doc_info, None
+
+    @staticmethod
+    def _apply_summary(doc_info: Dict, summary_data: Dict):
+        """将摘要结果写入文档信息"""
+        doc_info['summary'] = summary_data.get('summary', '')
+        doc_info['keywords'] = summary_data.get('keywords', [])
+        if summary_data.get('topics'):
+            doc_info['topics'] = summary_data['topics']
+
     def _read_file_content(self, file_path: str) -> Optional[str]:
         """读取文件内容"""
         try:
@@ -1331,15 +5377,25 @@ topics:
             return False
 
         try:
-            with open(index_path, 'r', encoding='utf-8') as f:
-                index_data = yaml.safe_load(f)
-
-            # 验证必填字段
-            required_fields = ["version", "knowledge_base", "documents"]
-            for field in required_fields:
+            # 两种后端读出的结构一致，执行相同的检查
+            index_data = self.load_index(kb_path)
+            if not isinstance(index_data, dict):
+                print("  ❌ 索引格式无效")
+                return False
+
+            # 验证必填字段（文档列表为 v2.1 的 markdown_documents / other_documents 或旧版 documents）
+            for field in ("version", "knowledge_base"):
                 if field not in index_data:
                     print(f"  ❌ 索引缺少必填字段: {field}")
                     return False
+            sections = [key for key in ("documents", "markdown_documents", "other_documents") if key in index_data]
+            if not sections:
+                print("  ❌ 索引缺少必填字段: markdown_documents / documents")
+                return False
+            for key in sections:
+                if not isinstance(index_data[key] or [], list):
+                    print(f"  ❌ 索引字段格式无效: {key}")
+                    return False
 
             print("  ✓ 索引验证通过")
             return True
@@ -1356,8 +5412,12 @@ topics:
             return 0
 
         try:
+            store = self.get_sqlite_store(kb_path)
+            if store:
+                return sum(store.count())
+
             with open(index_path, 'r', encoding='utf-8') as f:
-                index_data = yaml.safe_load(f)
+                index_data = yaml_load(f)
 
             # 兼容新旧格式
             if 'documents' in index_data:
@@ -1423,73 +5483,91 @@ topics:
         """
         计算每个文档的反向链接
 
+        链接按 LinkResolver 解析到文档的实际路径（子文件夹中的笔记、别名、相对路径均可解析），
+        无法解析的链接忽略。
+
         Args:
             documents: 文档列表（每个文档需包含 'path' 和 'links' 字段）
 
         Returns:
-            {文档路径: [引用它的文档路径列表]}
+            {文档路径: [引用它的文档路径列表（去重，按文档顺序）]}
         """
+        resolver = LinkResolver(documents)
         backlinks = {}
 
         for doc in documents:
             doc_path = doc.get('path', '')
-            links = doc.get('links', [])
-
-            for link in links:
-                # 规范化链接目标
-                link_target = self._normalize_link_target(link, doc_path)
-                if link_target not in backlinks:
-                    backlinks[link_target] = []
-                backlinks[link_target].append(doc_path)
+            for target in resolver.targets(doc.get('links', []), doc_path):
+                backlinks.setdefault(documents[target].get('path', ''), []).append(doc_path)
 
         return backlinks
 
-    def _normalize_link_target(self, link: str, source_path: str) -> str:
+    @staticmethod
+    def parse_frontmatter(content: str) -> Dict:
         """
-        规范化链接目标
+        解析 YAML frontmatter
 
-        将 wikilink 转换为相对路径格式
+        Returns:
+            frontmatter 字典（不存在或解析失败时为空字典）
         """
-        # 移除扩展名（如果有）
-        if link.endswith('.md'):
-            return link
+        # 检查是否有 frontmatter
+        if not content.startswith('---'):
+            return {}
+
+        parts = content.split('---', 2)
+        if len(parts) < 3:
+            return {}
+
+        try:
+            frontmatter = yaml_load(parts[1])
+        except:
+            return {}
+        return frontmatter if isinstance(frontmatter, dict) else {}
 
-        # 尝试添加 .md 扩展名
-        return f"{link}.md"
+    @staticmethod
+    def _frontmatter_list(frontmatter: Dict, *names: str) -> List:
+        """读取 frontmatter 中的列表字段（按顺序取第一个存在的字段名，字符串视为单元素列表）"""
+        for name in names:
+            if name in frontmatter:
+                value = frontmatter[name]
+                if isinstance(value, str):
+                    return [value]
+                if isinstance(value, list):
+                    return list(value)
+                return []
+        return []
 
-    def extract_frontmatter_tags(self, content: str) -> List[str]:
+    def extract_frontmatter_tags(self, content: str, frontmatter: Optional[Dict] = None) -> List[str]:
         """
         提取 YAML frontmatter 中的 tags
 
         Args:
             content: 文档内容
+            frontmatter: 已解析的 frontmatter（省略时从 content 解析）
 
         Returns:
             标签列表
         """
-        tags = []
-
-        # 检查是否有 frontmatter
-        if not content.startswith('---'):
-            return tags
+        if frontmatter is None:
+            frontmatter = self.parse_frontmatter(content)
+        # 支持 tags 和 tag 字段
+        return self._frontmatter_list(frontmatter, 'tags', 'tag')
 
-        parts = content.split('---', 2)
-        if len(parts) < 3:
-            return tags
+    def extract_frontmatter_aliases(self, content: str, frontmatter: Optional[Dict] = None) -> List[str]:
+        """
+        提取 YAML frontmatter 中的别名（aliases / alias），用于 wikilink 解析
 
-        try:
-            frontmatter = yaml.safe_load(parts[1])
-            if isinstance(frontmatter, dict):
-                # 支持 tags 和 tag 字段
-                raw_tags = frontmatter.get('tags', frontmatter.get('tag', []))
-                if isinstance(raw_tags, str):
-                    tags.append(raw_tags)
-                elif isinstance(raw_tags, list):
-                    tags.extend(raw_tags)
-        except:
-            pass
+        Args:
+            content: 文档内容
+            frontmatter: 已解析的 frontmatter（省略时从 content 解析）
 
-        return tags
+        Returns:
+            别名列表
+        """
+        if frontmatter is None:
+            frontmatter = self.parse_frontmatter(content)
+        return [str(alias).strip() for alias in self._frontmatter_list(frontmatter, 'aliases', 'alias')
+                if alias is not None and str(alias).strip()]
 
     def extract_content_tags(self, content: str) -> List[str]:
         """
@@ -1509,7 +5587,8 @@ topics:
     # ========== 其他命令 ==========
 
     def search_index(self, query: str, kb_path: str, top_k: int = 10,
-                     show_progress: bool = True) -> List[Dict]:
+                     show_progress: bool = True, ranker: Optional[str] = None,
+                     mode: Optional[str] = None) -> List[Dict]:
         """
         智能检索
 
@@ -1518,6 +5597,9 @@ topics:
             kb_path: 知识库路径
             top_k: 返回结果数量
             show_progress: 是否显示进度（文档数 > 100 时生效）
+            ranker: 评分方式 "weighted" 或 "bm25"（None 时读取知识库配置）
+            mode: 检索模式 "keyword"、"semantic" 或 "hybrid"（None 时读取知识库配置；
+                  未生成语义索引时按 keyword 检索）
 
         Returns:
             排序后的结果列表
@@ -1527,21 +5609,58 @@ topics:
         if not os.path.exists(index_path):
             return []
 
+        # 优先使用倒排检索索引，仅对候选文档打分
         try:
-            with open(index_path, 'r', encoding='utf-8') as f:
-                index_data = yaml.safe_load(f)
-        except:
+            search_index, index_data = self._get_search_source(kb_path)
+        except Exception:
             return []
+        # BM25 需要集合统计：旁路索引不可用时在内存中构建（旧版 documents 格式仍用默认评分）
+        ranker = ranker or self.get_ranker(kb_path)
+        if ranker == 'bm25' and search_index is None and 'documents' not in index_data:
+            search_index = SearchIndex.build(index_data.get('markdown_documents', []),
+                                             index_data.get('other_documents', []))
+        md_docs = index_data.get('markdown_documents', [])
+        other_docs = index_data.get('other_documents', [])
+
+        # 正文全文索引（启用时）
+        fulltext = self._get_fulltext_index(kb_path) if 'documents' not in index_data else None
+
+        # 提取查询关键词（整体无匹配的中文长词拆分为词典词或二元组）
+        if search_index is not None:
+            field_matches = search_index.contains
+        else:
+            all_docs = md_docs + other_docs + index_data.get('documents', [])
+
+            def field_matches(term: str) -> bool:
+                return any(SearchIndex.doc_matches(doc, term) for doc in all_docs)
 
-        # 提取查询关键词
-        query_keywords = self._extract_query_keywords(query)
+        def matches(term: str) -> bool:
+            return field_matches(term) or (fulltext is not None and fulltext.contains(term))
+
+        query_keywords = Tokenizer.expand_terms(self._extract_query_keywords(query), matches)
+        body_hits = fulltext.search(query_keywords) if fulltext is not None else {}
+
+        if ranker == 'bm25' and search_index is not None:
+            score_doc = BM25Ranker(search_index, query_keywords, fulltext, body_hits).score
+        else:
+            def score_doc(doc: Dict, is_markdown: bool = True) -> float:
+                return self._calculate_relevance_score(doc, query_keywords, is_markdown,
+                                                       body_hits.get(doc.get('path')))
 
         results = []
 
-        # 统计文档总数（用于进度显示）
-        md_docs = index_data.get('markdown_documents', [])
-        other_docs = index_data.get('other_documents', [])
-        total_docs = len(md_docs) + len(other_docs)
+        # 确定待打分文档（候选按 doc_id 排序，保持与逐个扫描相同的顺序；
+        # 检索快照只解码候选文档的评分字段，完整记录在取前 top_k 条时解码）
+        if search_index is not None:
+            candidates = search_index.candidates(query_keywords)
+            candidates.update(doc_id for doc_id in map(search_index.doc_id, body_hits) if doc_id is not None)
+            candidates = sorted(candidates)
+            md_scan = [search_index.scoring_document(i) for i in candidates if search_index.is_markdown(i)]
+            other_scan = [search_index.scoring_document(i) for i in candidates if not search_index.is_markdown(i)]
+        else:
+            md_scan = md_docs
+            other_scan = other_docs
+        total_docs = len(md_scan) + len(other_scan)
 
         # 初始化进度报告器（文档数 > 100 时显示）
         reporter = None
@@ -1550,8 +5669,8 @@ topics:
 
         # 统一检索 Markdown 文档
         processed = 0
-        for doc in md_docs:
-            score = self._calculate_relevance_score(doc, query_keywords)
+        for doc in md_scan:
+            score = score_doc(doc)
             if score > 0:
                 doc_copy = doc.copy()
                 doc_copy['score'] = score * 1.1  # Markdown 软加权 +10%
@@ -1563,12 +5682,20 @@ topics:
                 reporter.update(10, f"扫描 {processed}/{total_docs}")
 
         # 利用 wikilink 扩展相关文档
-        if results:
-            results = self._expand_by_links(results, md_docs, query_keywords)
+        if any(r.get('links') for r in results):
+            if search_index is not None:
+                def linked_documents(result: Dict) -> List[Dict]:
+                    return search_index.linked_documents(result['path'])
+            else:
+                resolver = LinkResolver(md_docs)
+
+                def linked_documents(result: Dict) -> List[Dict]:
+                    return [md_docs[i] for i in resolver.targets(result.get('links', []), result['path'])]
+            results = self._expand_by_links(results, linked_documents, score_doc)
 
         # 检索其他格式文档
-        for doc in other_docs:
-            score = self._calculate_relevance_score(doc, query_keywords, is_markdown=False)
+        for doc in other_scan:
+            score = score_doc(doc, is_markdown=False)
             if score > 0:
                 doc_copy = doc.copy()
                 doc_copy['score'] = score  # 其他格式不加权
@@ -1593,24 +5720,160 @@ topics:
                     doc_copy['doc_type'] = doc.get('type', 'unknown')
                     results.append(doc_copy)
 
-        # 按分数排序，同名文件 Markdown 优先
+        # 语义 / 混合检索
+        mode = mode or self.get_search_mode(kb_path)
+        if mode != 'keyword' and 'documents' not in index_data:
+            results = self._apply_semantic(query, kb_path, mode, results, top_k,
+                                           search_index, md_docs, other_docs)
+
+        # 按分数排序，同名文件 Markdown 优先，分数相同时链接图中心度高的优先（需运行 graph 命令）
         def sort_key(x):
             type_priority = 0 if x.get('doc_type') == 'markdown' else 1
-            return (x['score'], -type_priority)
+            return (x['score'], -type_priority, x.get('centrality', 0) or 0)
 
         results.sort(key=sort_key, reverse=True)
 
-        return results[:top_k]
+        results = results[:top_k]
+        if search_index is not None:
+            results = [search_index.full_result(r) for r in results]
+
+        # 正文分块定位：为每个结果附带最相关的标题 / 页码（需全文索引）
+        if fulltext is not None and results:
+            chunks = fulltext.best_chunks([r['path'] for r in results], query_keywords)
+            for result in results:
+                chunk = chunks.get(result['path'])
+                if chunk is not None:
+                    result['chunk'] = dict(chunk, anchor=self.chunk_anchor(result['path'], chunk))
+        return results
+
+    @staticmethod
+    def chunk_anchor(doc_path: str, chunk: Dict) -> str:
+        """分块的 Obsidian 链接目标：PDF 为「路径#page=N」，Markdown 为「路径#标题」"""
+        if chunk.get('page') is not None:
+            return f"{doc_path}#page={chunk['page']}"
+        if chunk.get('heading'):
+            return f"{doc_path}#{chunk['heading']}"
+        return doc_path
+
+    def _apply_semantic(self, query: str, kb_path: str, mode: str, results: List[Dict], top_k: int,
+                        search_index: Optional[SearchIndex], md_docs: List[Dict],
+                        other_docs: List[Dict]) -> List[Dict]:
+        """
+        语义 / 混合检索
+
+        - semantic: 返回查询向量的最近邻文档，分数为余弦相似度
+        - hybrid: 候选为关键词命中的文档加上语义最近邻；关键词分数按本次最高分归一化到 [0, 1]，
+          与语义相似度按 hybrid_weight 加权求和（结果附带 keyword_score 和 semantic_score）
+
+        相似度低于 search.semantic_min_score 的视为不相关：不作为语义结果，也不参与混合加权；
+        混合后总分为 0 的文档不返回。
+
+        语义索引不可用或查询无法向量化时原样返回关键词结果。
+        """
+        vectors = self._get_vector_index(kb_path)
+        vector = vectors.embed_query(query) if vectors is not None else None
+        if vector is None:
+            return results
+        options = self.get_semantic_options(kb_path)
+
+        if search_index is not None:
+            lookup = search_index.document_by_path
+        else:
+            by_path = {doc['path']: (doc, False) for doc in other_docs}
+            by_path.update((doc['path'], (doc, True)) for doc in md_docs)
+            lookup = by_path.get
+
+        def as_result(doc_path: str, score: float) -> Optional[Dict]:
+            found = lookup(doc_path)
+            if found is None:
+                return None
+            doc, is_markdown = found
+            doc_copy = doc.copy()
+            doc_copy['score'] = score
+            doc_copy['doc_type'] = 'markdown' if is_markdown else doc.get('type', 'other')
+            return doc_copy
+
+        min_score = options['min_score']
+        neighbors = [(doc_path, similarity)
+                     for doc_path, similarity in vectors.nearest(vector, top_k if mode == 'semantic' else top_k * 3,
+                                                                 options['nprobe'])
+                     if similarity > 0 and similarity >= min_score]
+
+        if mode == 'semantic':
+            semantic_results = []
+            for doc_path, similarity in neighbors:
+                result = as_result(doc_path, similarity)
+                if result is not None:
+                    result['semantic_score'] = round(similarity, 4)
+                    semantic_results.append(result)
+            return semantic_results
+
+        similarities = vectors.similarities(vector, [r['path'] for r in results])
+        seen = {r['path'] for r in results}
+        for doc_path, similarity in neighbors:
+            if doc_path not in seen:
+                result = as_result(doc_path, 0.0)
+                if result is not None:
+                    results.append(result)
+                    seen.add(doc_path)
+                    similarities[doc_path] = similarity
+
+        weight = options['weight']
+        top_score = max((r['score'] for r in results), default=0.0)
+        fused = []
+        for result in results:
+            similarity = similarities.get(result['path'], 0.0)
+            if similarity < min_score:
+                similarity = 0.0
+            keyword_score = result['score'] / top_score if top_score > 0 else 0.0
+            result['keyword_score'] = round(result['score'], 4)
+            result['semantic_score'] = round(max(0.0, similarity), 4)
+            result['score'] = (1 - weight) * keyword_score + weight * max(0.0, similarity)
+            if result['score'] > 0:
+                fused.append(result)
+        return fused
+
+    def _get_search_source(self, kb_path: str) -> Tuple[Optional[SearchIndex], Dict]:
+        """
+        获取检索数据源：倒排检索索引，或（旁路索引不可用时）完整索引数据
+
+        serve 模式下从常驻内存的 IndexCache 读取，否则每次从磁盘加载。
+
+        Returns:
+            (SearchIndex 或 None, 索引数据；使用 SearchIndex 时为空字典)
+        """
+        if self.index_cache is not None:
+            entry = self.index_cache.get(kb_path)
+            if entry is None:
+                raise FileNotFoundError(os.path.join(kb_path, "_index.yaml"))
+            return entry.search_index, entry.index_data
+
+        search_index = self.load_search_index(kb_path)
+        if search_index is not None:
+            return search_index, {}
+        return None, self.load_index(kb_path)
+
+    def _get_fulltext_index(self, kb_path: str) -> Optional[FullTextIndex]:
+        """获取正文全文索引（serve 模式下从 IndexCache 读取）"""
+        if self.index_cache is not None:
+            entry = self.index_cache.get(kb_path)
+            return entry.fulltext if entry else None
+        return self.load_fulltext_index(kb_path)
+
+    def _get_vector_index(self, kb_path: str) -> Optional[VectorIndex]:
+        """获取语义向量索引（serve 模式下从 IndexCache 读取）"""
+        if self.index_cache is not None:
+            entry = self.index_cache.get(kb_path)
+            return entry.vectors if entry else None
+        return self.load_vector_index(kb_path)
 
     def _extract_query_keywords(self, query: str) -> List[str]:
-        """从查询中提取关键词"""
-        # 简单实现：按空格和标点分割
-        import re
-        keywords = re.split(r'[\s,，、。？！;；：:\+\-\*]+', query)
-        return [k.strip().lower() for k in keywords if k.strip() and len(k.strip()) > 1]
+        """从查询中提取关键词（按空格和标点分割）"""
+        return Tokenizer.split_query(query)
 
     def _calculate_relevance_score(self, doc: Dict, query_keywords: List[str],
-                                   is_markdown: bool = True) -> float:
+                                   is_markdown: bool = True,
+                                   body_hits: Optional[Dict[str, int]] = None) -> float:
         """
         计算文档相关度分数
 
@@ -1620,9 +5883,14 @@ topics:
         - summary: 0.3（摘要匹配）
         - keywords: 0.3（关键词匹配）
         - tags: 0.2（标签匹配）
+        - body: 0.1（正文匹配，启用全文索引时；body_hits 为 {关键词: 出现次数}）
         """
         score = 0.0
 
+        # 正文匹配
+        if body_hits:
+            score += 0.1 * sum(1 for keyword in query_keywords if keyword in body_hits)
+
         # 文件名匹配
         filename = doc.get('filename', doc.get('path', '')).lower()
         for keyword in query_keywords:
@@ -1659,42 +5927,110 @@ topics:
 
         return score
 
-    def _expand_by_links(self, results: List[Dict], all_docs: List[Dict],
-                         query_keywords: List[str]) -> List[Dict]:
-        """通过 wikilink 扩展相关文档"""
+    def _expand_by_links(self, results: List[Dict], linked_documents,
+                         score_doc) -> List[Dict]:
+        """
+        通过 wikilink 扩展相关文档
+
+        Args:
+            linked_documents: 函数 (result) -> 出链解析后的 Markdown 文档列表
+                              （检索快照读取预先解析的邻接表，无快照时由 LinkResolver 解析）
+            score_doc: 评分函数 (doc) -> 分数（与主检索使用同一评分方式）
+        """
         result_paths = {r['path'] for r in results}
         expanded = []
 
         for result in results:
-            # 查找出链文档
-            links = result.get('links', [])
-            for link in links:
-                # 规范化链接
-                link_path = self._normalize_link_target(link, result['path'])
-
-                # 查找链接的文档
-                for doc in all_docs:
-                    if doc['path'] not in result_paths:
-                        doc_path = doc['path']
-                        # 尝试多种匹配
-                        if doc_path == link_path or doc_path == link or \
-                           doc_path.rsplit('.', 1)[0] == link_path.rsplit('.', 1)[0]:
-                            # 计算链接文档的分数（略低）
-                            link_score = self._calculate_relevance_score(doc, query_keywords)
-                            if link_score > 0:
-                                doc_copy = doc.copy()
-                                doc_copy['score'] = (link_score * 0.5 + result['score'] * 0.1) * 1.1  # Markdown 软加权
-                                doc_copy['doc_type'] = 'markdown'
-                                doc_copy['linked_from'] = result['path']
-                                expanded.append(doc_copy)
-                                result_paths.add(doc['path'])
-                            break
+            if not result.get('links'):
+                continue
+            for doc in linked_documents(result):
+                if doc['path'] in result_paths:
+                    continue
+                # 计算链接文档的分数（略低）
+                link_score = score_doc(doc)
+                if link_score > 0:
+                    doc_copy = doc.copy()
+                    doc_copy['score'] = (link_score * 0.5 + result['score'] * 0.1) * 1.1  # Markdown 软加权
+                    doc_copy['doc_type'] = 'markdown'
+                    doc_copy['linked_from'] = result['path']
+                    expanded.append(doc_copy)
+                    result_paths.add(doc['path'])
 
         results.extend(expanded)
         return results
 
+    def search_all(self, query: str, top_k: int = 10, show_progress: bool = True,
+                   deadline: Optional[float] = None, ranker: Optional[str] = None,
+                   mode: Optional[str] = None) -> Tuple[List[Dict], List[str]]:
+        """
+        在所有已注册的知识库中并行检索
+
+        各知识库的检索分发到工作池同时执行：serve 模式下索引已常驻内存，使用线程；
+        否则使用进程池，让各知识库的索引解析真正并行。每个知识库返回自己的 top_k
+        （已按分数降序），再用堆归并取全局 top_k，不对全部结果排序。
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+            show_progress: 是否显示进度（仅串行检索时生效）
+            deadline: 总超时秒数，超时后只返回已完成知识库的结果
+            ranker: 评分方式（None 时按各知识库配置）
+            mode: 检索模式（None 时按各知识库配置）
+
+        Returns:
+            (按分数排序的结果列表（每项带 kb_name）, 未完成检索的知识库名称列表)
+        """
+        kbs = [kb for kb in self.registry.get('knowledge_bases', []) if kb.get('status') == 'active']
+        workers = min(len(kbs), self.workers or os.cpu_count() or 1)
+        end_time = time.monotonic() + deadline if deadline is not None else None
+        per_kb: Dict[int, List[Dict]] = {}
+
+        if workers <= 1:
+            for i, kb in enumerate(kbs):
+                if end_time is not None and time.monotonic() >= end_time:
+                    break
+                per_kb[i] = self.search_index(query, kb['path'], top_k=top_k, show_progress=show_progress,
+                                              ranker=ranker, mode=mode)
+        elif self.index_cache is not None:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            futures = {executor.submit(self.search_index, query, kb['path'], top_k, False, ranker, mode): i
+                       for i, kb in enumerate(kbs)}
+            done, _ = wait(futures, timeout=deadline)
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in done:
+                try:
+                    per_kb[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"⚠️ 检索失败: {kbs[futures[future]]['path']} ({e})")
+        else:
+            # 退出 with 时 terminate()，超时仍在运行的检索进程会被直接结束
+            with multiprocessing.Pool(workers) as pool:
+                pending = [pool.apply_async(_search_kb_worker, (self.registry_path, kb['path'], query, top_k,
+                                                                ranker or self.ranker, mode or self.search_mode))
+                           for kb in kbs]
+                for i, async_result in enumerate(pending):
+                    timeout = None if end_time is None else max(0.0, end_time - time.monotonic())
+                    try:
+                        per_kb[i] = async_result.get(timeout)
+                    except multiprocessing.TimeoutError:
+                        continue
+                    except Exception as e:
+                        print(f"⚠️ 检索失败: {kbs[i]['path']} ({e})")
+
+        for i, kb_results in per_kb.items():
+            for r in kb_results:
+                r['kb_name'] = kbs[i]['name']
+
+        # 各列表已按分数降序，归并保持与整体稳定排序相同的顺序（同分时按注册顺序）
+        merged = heapq.merge(*(per_kb[i] for i in sorted(per_kb)),
+                             key=lambda x: x['score'], reverse=True)
+        results = list(islice(merged, top_k))
+        unfinished = [kb['name'] for i, kb in enumerate(kbs) if i not in per_kb]
+        return results, unfinished
+
     def search_cli(self, query: str, kb_path: str = None,
-                   prefer_obsidian: bool = False, no_obsidian: bool = False):
+                   prefer_obsidian: bool = False, no_obsidian: bool = False,
+                   deadline: Optional[float] = None):
         """
         CLI 搜索命令
 
@@ -1703,6 +6039,7 @@ topics:
             kb_path: 知识库路径（可选，不指定则全局搜索）
             prefer_obsidian: 优先使用 Obsidian CLI
             no_obsidian: 禁用 Obsidian CLI
+            deadline: 全局搜索的总超时秒数（超时返回部分结果）
         """
         print(f"\n{'='*60}")
         print(f"搜索: {query}")
@@ -1735,6 +6072,8 @@ topics:
                     return
 
             # 回退到索引搜索
+            if self.get_search_mode(kb_path) != 'keyword' and self._get_vector_index(kb_path) is None:
+                print("⚠️ 未找到语义索引（需 build/update --semantic 和 NumPy），按关键词检索")
             results = self.search_index(query, kb_path)
         else:
             print("搜索范围: 所有知识库")
@@ -1747,17 +6086,9 @@ topics:
                     return
 
             # 回退到全局索引搜索
-            results = []
-            for kb in self.registry.get('knowledge_bases', []):
-                if kb.get('status') != 'active':
-                    continue
-                kb_results = self.search_index(query, kb['path'])
-                for r in kb_results:
-                    r['kb_name'] = kb['name']
-                results.extend(kb_results)
-
-            results.sort(key=lambda x: x['score'], reverse=True)
-            results = results[:10]
+            results, unfinished = self.search_all(query, deadline=deadline)
+            if unfinished:
+                print(f"⚠️ 已超时，以下知识库未完成检索: {', '.join(unfinished)}")
 
         if not results:
             print("\n未找到相关文档")
@@ -1780,6 +6111,10 @@ topics:
                 print(f"   关键词: {', '.join(doc['keywords'][:5])}")
             if doc.get('linked_from'):
                 print(f"   关联自: {doc['linked_from']}")
+            if doc.get('chunk'):
+                chunk = doc['chunk']
+                location = f"第 {chunk['page']} 页" if chunk.get('page') is not None else f"第 {chunk['line']} 行"
+                print(f"   定位: {chunk['anchor']}（{location}）")
             print()
 
     def _search_with_obsidian_cli(self, query: str, kb_path: str = None) -> Tuple[List[str], str]:
@@ -1819,23 +6154,101 @@ topics:
 
         print("💡 提示: 使用 --no-obsidian 可切换到索引搜索模式（含相关度分数）")
 
-    def show_info(self, kb_path: str):
-        """显示知识库信息"""
+    def get_document(self, kb_path: str, doc_path: str) -> Optional[Dict]:
+        """
+        按相对路径读取单个文档记录（sqlite 后端直接按主键查询）
+
+        Args:
+            kb_path: 知识库路径
+            doc_path: 文档相对路径（如 "子系统/GitLab.md"）
+
+        Returns:
+            文档记录，不存在时返回 None
+        """
+        doc_path = doc_path.replace("\\", "/")
+        if self.index_cache is not None:
+            entry = self.index_cache.get(kb_path)
+            return entry.get_document(doc_path) if entry else None
+
+        store = self.get_sqlite_store(kb_path)
+        if store:
+            return store.get_document(doc_path)
+
+        index_data = self.load_index(kb_path) or {}
+        for doc in (index_data.get('markdown_documents', []) + index_data.get('other_documents', [])
+                    + index_data.get('documents', [])):
+            if doc.get('path') == doc_path:
+                return doc
+        return None
+
+    def show_info(self, kb_path: str, doc_path: str = None):
+        """
+        显示知识库信息
+
+        Args:
+            kb_path: 知识库路径
+            doc_path: 文档相对路径（可选，指定时仅显示该文档的索引记录）
+        """
         index_path = os.path.join(kb_path, "_index.yaml")
 
         if not os.path.exists(index_path):
             print(f"❌ 知识库未索引: {kb_path}")
             return
 
+        if doc_path:
+            try:
+                doc = self.get_document(kb_path, doc_path)
+            except Exception as e:
+                print(f"❌ 读取索引失败: {e}")
+                return
+            if doc is None:
+                print(f"❌ 索引中不存在文档: {doc_path}")
+                return
+            print(yaml_dump(doc))
+
+            # 正文分块大纲（需全文索引），可按行号 / 页码只读取相关章节
+            fulltext = self.load_fulltext_index(kb_path)
+            if fulltext is not None:
+                chunks = fulltext.document_chunks(doc['path'])
+                fulltext.close()
+                if len(chunks) > 1:
+                    print(f"正文分块（{len(chunks)} 个）:")
+                    for _, line, heading, page in chunks:
+                        location = f"第 {page} 页" if page is not None else f"第 {line} 行"
+                        print(f"  - {location}: {heading or '（无标题）'}")
+            return
+
+        # sqlite 后端只读取元数据和统计结果，不加载文档列表
+        store = self.get_sqlite_store(kb_path)
         try:
-            with open(index_path, 'r', encoding='utf-8') as f:
-                index_data = yaml.safe_load(f)
+            if store:
+                meta = store.load_meta()
+                kb_info = meta.get('knowledge_base', {})
+                graph_stats = meta.get('graph')
+                md_count, other_count = store.count()
+                link_stats = store.link_stats()
+            else:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index_data = yaml_load(f)
+                kb_info = index_data.get('knowledge_base', {})
+                graph_stats = index_data.get('graph')
+                md_docs = index_data.get('markdown_documents', [])
+                md_count = len(md_docs)
+                other_count = len(index_data.get('other_documents', []))
+
+                all_tags = []
+                for doc in md_docs:
+                    all_tags.extend(doc.get('tags', []))
+                from collections import Counter
+                link_stats = {
+                    "links": sum(len(d.get('links', [])) for d in md_docs),
+                    "backlinks": sum(len(d.get('backlinks', [])) for d in md_docs),
+                    "tags": Counter(all_tags).most_common(10)
+                }
         except Exception as e:
             print(f"❌ 读取索引失败: {e}")
             return
 
-        kb_info = index_data.get('knowledge_base', {})
-
         print(f"\n{'='*60}")
         print("知识库信息")
         print(f"{'='*60}\n")
@@ -1844,36 +6257,129 @@ topics:
         print(f"路径: {kb_info.get('path', kb_path)}")
         print(f"类型: {kb_info.get('type', 'generic')}")
         print(f"Obsidian: {'是' if kb_info.get('has_obsidian') else '否'}")
+        print(f"存储: {'SQLite' if store else 'YAML'}")
+        fulltext_path = FullTextIndex.get_path(kb_path)
+        if os.path.exists(fulltext_path):
+            print(f"全文索引: 已启用（{os.path.getsize(fulltext_path) / (1024 * 1024):.2f} MB）")
+        vector_path = VectorIndex.get_path(kb_path)
+        if os.path.exists(vector_path):
+            print(f"语义索引: 已启用（{os.path.getsize(vector_path) / (1024 * 1024):.2f} MB）")
         print(f"创建时间: {kb_info.get('created', 'N/A')[:19]}")
         print(f"更新时间: {kb_info.get('last_updated', 'N/A')[:19]}")
 
-        md_docs = index_data.get('markdown_documents', [])
-        other_docs = index_data.get('other_documents', [])
-
         print(f"\n文档统计:")
-        print(f"  - Markdown: {len(md_docs)} 个")
-        print(f"  - 其他格式: {len(other_docs)} 个")
+        print(f"  - Markdown: {md_count} 个")
+        print(f"  - 其他格式: {other_count} 个")
         print(f"  - 总大小: {kb_info.get('total_size_mb', 0)} MB")
 
         # 统计链接
-        if md_docs:
-            total_links = sum(len(d.get('links', [])) for d in md_docs)
-            total_backlinks = sum(len(d.get('backlinks', [])) for d in md_docs)
+        if md_count:
             print(f"\n链接统计:")
-            print(f"  - 出链: {total_links} 个")
-            print(f"  - 反向链接: {total_backlinks} 个")
+            print(f"  - 出链: {link_stats['links']} 个")
+            print(f"  - 反向链接: {link_stats['backlinks']} 个")
+            if graph_stats:
+                print(f"  - 链接图: {graph_stats['components']} 个连通分量，"
+                      f"{graph_stats['orphans']} 篇孤立笔记（{str(graph_stats.get('computed', ''))[:19]}）")
 
             # 统计标签
-            all_tags = []
-            for doc in md_docs:
-                all_tags.extend(doc.get('tags', []))
-            if all_tags:
-                from collections import Counter
-                tag_counts = Counter(all_tags)
+            if link_stats['tags']:
                 print(f"\n热门标签:")
-                for tag, count in tag_counts.most_common(10):
+                for tag, count in link_stats['tags']:
                     print(f"  - {tag}: {count}")
 
+    def apply_link_graph(self, index_data: Dict) -> LinkGraph:
+        """
+        计算链接图，写入每个 Markdown 文档的中心度和索引的 graph 统计
+
+        中心度为 PageRank × 文档数（平均值为 1，大于 1 表示比一般笔记更核心），
+        检索时作为同分结果的次级排序依据。
+
+        Returns:
+            LinkGraph
+        """
+        md_docs = index_data.get('markdown_documents', [])
+        graph = LinkGraph(md_docs)
+        ranks = graph.pagerank()
+        for doc, rank in zip(md_docs, ranks):
+            doc['centrality'] = round(rank * len(md_docs), 4)
+
+        components = graph.components()
+        index_data['graph'] = {
+            "nodes": graph.node_count,
+            "edges": len(graph.edges),
+            "components": len(components),
+            "largest_component": len(components[0]) if components else 0,
+            "orphans": len(graph.orphans()),
+            "computed": self.get_timestamp()
+        }
+        return graph
+
+    def analyze_graph(self, kb_path: str, top: int = 10) -> bool:
+        """
+        分析知识库链接图：PageRank、连通分量、孤立笔记、枢纽笔记，
+        并把中心度写入索引（此后 update / watch 会随文档变更重新计算）
+
+        Args:
+            kb_path: 知识库路径
+            top: 各列表显示的条数
+        """
+        kb_path = os.path.abspath(kb_path)
+        index_path = os.path.join(kb_path, "_index.yaml")
+        if not os.path.exists(index_path):
+            print(f"❌ 知识库未索引: {kb_path}")
+            return False
+
+        try:
+            index_data = self.load_index(kb_path)
+        except Exception as e:
+            print(f"❌ 读取索引失败: {e}")
+            return False
+        if 'documents' in index_data:
+            print("❌ 旧版索引格式不支持链接图分析，请先执行 update")
+            return False
+
+        print(f"\n{'='*60}")
+        print(f"链接图分析: {kb_path}")
+        print(f"{'='*60}\n")
+
+        start = time.time()
+        graph = self.apply_link_graph(index_data)
+        elapsed = time.time() - start
+        md_docs = index_data.get('markdown_documents', [])
+        stats = index_data['graph']
+
+        print(f"节点: {stats['nodes']} 篇笔记")
+        print(f"边: {stats['edges']} 条链接（已解析、去重）")
+        print(f"连通分量: {stats['components']} 个（最大 {stats['largest_component']} 篇）")
+        print(f"孤立笔记: {stats['orphans']} 篇")
+        print(f"耗时: {elapsed:.2f}s")
+
+        if graph.node_count:
+            print(f"\n中心度最高（PageRank）:")
+            ranked = sorted(range(graph.node_count), key=lambda node: -md_docs[node]['centrality'])
+            for node in ranked[:top]:
+                print(f"  - {graph.paths[node]}  {md_docs[node]['centrality']:.4f}"
+                      f"（被 {graph.in_degree[node]} 篇链接）")
+
+            hubs = graph.hubs(top)
+            if hubs:
+                print(f"\n枢纽笔记（出链最多）:")
+                for node in hubs:
+                    print(f"  - {graph.paths[node]}  出链 {graph.out_degree[node]}")
+
+            orphans = graph.orphans()
+            if orphans:
+                print(f"\n孤立笔记:")
+                for node in orphans[:top]:
+                    print(f"  - {graph.paths[node]}")
+                if len(orphans) > top:
+                    print(f"  ... 另有 {len(orphans) - top} 篇")
+
+        print("\n写入索引...")
+        self.write_index(kb_path, index_data)
+        print("✓ 中心度已写入索引")
+        return True
+
     def list_knowledge_bases(self):
         """列出所有知识库"""
         print(f"\n{'='*60}")
@@ -1895,6 +6401,75 @@ topics:
             print(f"   更新: {kb['last_updated'][:19]}")
             print()
 
+    def show_cache_stats(self):
+        """显示摘要缓存与提取缓存统计"""
+        stats = self.summary_cache.stats()
+        print(f"\n{'='*60}")
+        print("AI 摘要缓存")
+        print(f"{'='*60}\n")
+        print(f"  位置: {self.summary_cache.db_path}")
+        print(f"  条目: {stats['entries']} 个（内存中 {stats['memory_entries']} 个，"
+              f"上限 {stats['max_memory_entries']}）")
+        max_disk = (f"{stats['max_disk_bytes'] / 1024 / 1024:.1f} MB"
+                    if stats['max_disk_bytes'] else "不限制")
+        print(f"  数据: {stats['data_bytes'] / 1024 / 1024:.2f} MB（上限 {max_disk}）")
+        print(f"  文件: {stats['file_bytes'] / 1024 / 1024:.2f} MB")
+
+        if self.extraction_cache is None or not os.path.exists(self.extraction_cache.db_path):
+            return
+        stats = self.extraction_cache.stats()
+        print(f"\n{'='*60}")
+        print("PDF / Word 提取缓存")
+        print(f"{'='*60}\n")
+        print(f"  位置: {self.extraction_cache.db_path}")
+        print(f"  条目: {stats['entries']} 个")
+        max_bytes = f"{stats['max_bytes'] / 1024 / 1024:.1f} MB" if stats['max_bytes'] else "不限制"
+        print(f"  数据: {stats['data_bytes'] / 1024 / 1024:.2f} MB（上限 {max_bytes}）")
+        print(f"  文件: {stats['file_bytes'] / 1024 / 1024:.2f} MB")
+
+    def gc_summary_cache(self) -> Tuple[int, int]:
+        """
+        清理摘要缓存：删除不再被任何已注册知识库索引中文档引用的条目
+
+        缓存以文档内容哈希为键，因此按索引中 Markdown 文档的当前内容计算哈希。
+        有知识库索引无法读取时放弃清理，避免误删仍在使用的摘要。
+
+        Returns:
+            (删除条目数, 释放字节数)
+        """
+        referenced = set()
+        for kb in self.registry.get("knowledge_bases", []):
+            kb_path = kb.get("path", "")
+            if kb.get("status") != "active" or not os.path.exists(kb_path):
+                continue
+            try:
+                index_data = self.load_index(kb_path)
+            except Exception as e:
+                print(f"❌ 无法读取索引，已取消清理: {kb_path} ({e})")
+                return 0, 0
+            if not index_data:
+                continue
+
+            docs = index_data.get('markdown_documents', [])
+            if not docs:
+                docs = [d for d in index_data.get('documents', []) if d.get('type') == 'markdown']
+            for doc in docs:
+                content = self._read_file_content(os.path.join(kb_path, doc.get('path', '')))
+                if content:
+                    referenced.add(self.get_content_hash(content))
+
+        removed, freed = self.summary_cache.remove_unreferenced(referenced)
+        print(f"✓ 已清理 {removed} 条摘要缓存，释放 {freed / 1024 / 1024:.2f} MB"
+              f"（保留 {len(referenced)} 个被引用的内容哈希）")
+        return removed, freed
+
+
+def _search_kb_worker(registry_path: str, kb_path: str, query: str, top_k: int,
+                      ranker: Optional[str] = None, mode: Optional[str] = None) -> List[Dict]:
+    """进程池任务：在单个知识库中检索（search_all 使用）"""
+    manager = KnowledgeBaseManager(registry_path=registry_path, enable_ai_summary=False)
+    return manager.search_index(query, kb_path, top_k=top_k, show_progress=False, ranker=ranker, mode=mode)
+
 
 def main():
     """主函数"""
@@ -1907,11 +6482,71 @@ def main():
     # 解析通用参数
     enable_ai = "--no-ai" not in sys.argv
 
-    manager = KnowledgeBaseManager(enable_ai_summary=enable_ai)
+    workers = None
+    if "--workers" in sys.argv:
+        workers_idx = sys.argv.index("--workers")
+        if workers_idx + 1 < len(sys.argv):
+            try:
+                workers = int(sys.argv[workers_idx + 1])
+            except ValueError:
+                print(f"❌ 无效的 --workers 参数: {sys.argv[workers_idx + 1]}")
+                sys.exit(1)
+
+    storage = None
+    if "--storage" in sys.argv:
+        storage_idx = sys.argv.index("--storage")
+        if storage_idx + 1 < len(sys.argv):
+            storage = sys.argv[storage_idx + 1].lower()
+            if storage not in ('yaml', 'sqlite'):
+                print(f"❌ 无效的 --storage 参数: {storage}（可选 yaml / sqlite）")
+                sys.exit(1)
+
+    batch_size = None
+    if "--batch-size" in sys.argv:
+        batch_idx = sys.argv.index("--batch-size")
+        if batch_idx + 1 < len(sys.argv):
+            try:
+                batch_size = int(sys.argv[batch_idx + 1])
+            except ValueError:
+                print(f"❌ 无效的 --batch-size 参数: {sys.argv[batch_idx + 1]}")
+                sys.exit(1)
+
+    concurrency = None
+    if "--concurrency" in sys.argv:
+        concurrency_idx = sys.argv.index("--concurrency")
+        if concurrency_idx + 1 < len(sys.argv):
+            try:
+                concurrency = int(sys.argv[concurrency_idx + 1])
+            except ValueError:
+                print(f"❌ 无效的 --concurrency 参数: {sys.argv[concurrency_idx + 1]}")
+                sys.exit(1)
+
+    ranker = None
+    if "--ranker" in sys.argv:
+        ranker_idx = sys.argv.index("--ranker")
+        if ranker_idx + 1 < len(sys.argv):
+            ranker = sys.argv[ranker_idx + 1].lower()
+            if ranker not in KnowledgeBaseManager.RANKERS:
+                print(f"❌ 无效的 --ranker 参数: {ranker}（可选 weighted / bm25）")
+                sys.exit(1)
+
+    search_mode = None
+    if "--mode" in sys.argv:
+        mode_idx = sys.argv.index("--mode")
+        if mode_idx + 1 < len(sys.argv):
+            search_mode = sys.argv[mode_idx + 1].lower()
+            if search_mode not in KnowledgeBaseManager.SEARCH_MODES:
+                print(f"❌ 无效的 --mode 参数: {search_mode}（可选 keyword / semantic / hybrid）")
+                sys.exit(1)
+
+    manager = KnowledgeBaseManager(enable_ai_summary=enable_ai, workers=workers, storage=storage,
+                                   summary_batch_size=batch_size, summary_concurrency=concurrency,
+                                   ranker=ranker, fulltext=True if "--fulltext" in sys.argv else None,
+                                   semantic=True if "--semantic" in sys.argv else None, search_mode=search_mode)
 
     if command == "build":
         if len(sys.argv) < 3:
-            print("用法: python knowledge-index-manager.py build <知识库路径> [--force] [--no-ai]")
+            print("用法: python knowledge-index-manager.py build <知识库路径> [--force] [--no-ai] [--workers N] [--batch-size N] [--concurrency N] [--storage yaml|sqlite] [--fulltext] [--semantic]")
             sys.exit(1)
 
         kb_path = sys.argv[2]
@@ -1920,7 +6555,7 @@ def main():
 
     elif command == "update":
         if len(sys.argv) < 3:
-            print("用法: python knowledge-index-manager.py update <知识库路径> [--no-ai]")
+            print("用法: python knowledge-index-manager.py update <知识库路径> [--no-ai] [--workers N] [--batch-size N] [--concurrency N] [--storage yaml|sqlite] [--fulltext] [--semantic]")
             sys.exit(1)
 
         kb_path = sys.argv[2]
@@ -1931,7 +6566,7 @@ def main():
 
     elif command == "search":
         if len(sys.argv) < 3:
-            print("用法: python knowledge-index-manager.py search <查询> [--kb <知识库路径>] [--prefer-obsidian] [--no-obsidian]")
+            print("用法: python knowledge-index-manager.py search <查询> [--kb <知识库路径>] [--ranker weighted|bm25] [--mode keyword|semantic|hybrid] [--deadline 秒] [--workers N] [--prefer-obsidian] [--no-obsidian]")
             sys.exit(1)
 
         query = sys.argv[2]
@@ -1944,15 +6579,107 @@ def main():
             if kb_idx + 1 < len(sys.argv):
                 kb_path = sys.argv[kb_idx + 1]
 
-        manager.search_cli(query, kb_path, prefer_obsidian=prefer_obsidian, no_obsidian=no_obsidian)
+        deadline = None
+        if "--deadline" in sys.argv:
+            deadline_idx = sys.argv.index("--deadline")
+            if deadline_idx + 1 < len(sys.argv):
+                try:
+                    deadline = float(sys.argv[deadline_idx + 1])
+                except ValueError:
+                    print(f"❌ 无效的 --deadline 参数: {sys.argv[deadline_idx + 1]}")
+                    sys.exit(1)
+
+        manager.search_cli(query, kb_path, prefer_obsidian=prefer_obsidian, no_obsidian=no_obsidian,
+                           deadline=deadline)
 
     elif command == "info":
         if len(sys.argv) < 3:
-            print("用法: python knowledge-index-manager.py info <知识库路径>")
+            print("用法: python knowledge-index-manager.py info <知识库路径> [--doc <文档路径>]")
+            sys.exit(1)
+
+        kb_path = sys.argv[2]
+        doc_path = None
+        if "--doc" in sys.argv:
+            doc_idx = sys.argv.index("--doc")
+            if doc_idx + 1 < len(sys.argv):
+                doc_path = sys.argv[doc_idx + 1]
+
+        manager.show_info(kb_path, doc_path)
+
+    elif command == "graph":
+        if len(sys.argv) < 3:
+            print("用法: python knowledge-index-manager.py graph <知识库路径> [--top N]")
+            sys.exit(1)
+
+        kb_path = sys.argv[2]
+        top = 10
+        if "--top" in sys.argv:
+            top_idx = sys.argv.index("--top")
+            if top_idx + 1 < len(sys.argv):
+                try:
+                    top = int(sys.argv[top_idx + 1])
+                except ValueError:
+                    print(f"❌ 无效的 --top 参数: {sys.argv[top_idx + 1]}")
+                    sys.exit(1)
+
+        if not manager.analyze_graph(kb_path, top=top):
+            sys.exit(1)
+
+    elif command == "watch":
+        if len(sys.argv) < 3:
+            print("用法: python knowledge-index-manager.py watch <知识库路径> [--poll] [--debounce 秒] [--no-ai]")
             sys.exit(1)
 
         kb_path = sys.argv[2]
-        manager.show_info(kb_path)
+        debounce = 1.0
+        if "--debounce" in sys.argv:
+            debounce_idx = sys.argv.index("--debounce")
+            if debounce_idx + 1 < len(sys.argv):
+                try:
+                    debounce = float(sys.argv[debounce_idx + 1])
+                except ValueError:
+                    print(f"❌ 无效的 --debounce 参数: {sys.argv[debounce_idx + 1]}")
+                    sys.exit(1)
+
+        if not manager.watch_index(kb_path, use_polling="--poll" in sys.argv, debounce=debounce):
+            sys.exit(1)
+
+    elif command == "serve":
+        host = "127.0.0.1"
+        port = 8765
+        socket_path = None
+        if "--host" in sys.argv:
+            host_idx = sys.argv.index("--host")
+            if host_idx + 1 < len(sys.argv):
+                host = sys.argv[host_idx + 1]
+        if "--port" in sys.argv:
+            port_idx = sys.argv.index("--port")
+            if port_idx + 1 < len(sys.argv):
+                try:
+                    port = int(sys.argv[port_idx + 1])
+                except ValueError:
+                    print(f"❌ 无效的 --port 参数: {sys.argv[port_idx + 1]}")
+                    sys.exit(1)
+        if "--socket" in sys.argv:
+            socket_idx = sys.argv.index("--socket")
+            if socket_idx + 1 < len(sys.argv):
+                socket_path = sys.argv[socket_idx + 1]
+
+        server = QueryServer(manager, host=host, port=port, socket_path=socket_path)
+        print("加载索引...")
+        server.preload()
+        if not server.serve_forever():
+            sys.exit(1)
+
+    elif command == "cache":
+        action = sys.argv[2] if len(sys.argv) > 2 else "stats"
+        if action == "stats":
+            manager.show_cache_stats()
+        elif action == "gc":
+            manager.gc_summary_cache()
+        else:
+            print("用法: python knowledge-index-manager.py cache [stats|gc]")
+            sys.exit(1)
 
     else:
         print(f"未知命令: {command}")
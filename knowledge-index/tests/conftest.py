@@ -0,0 +1,62 @@
+"""
+knowledge-index 测试公共夹具
+
+脚本文件名含连字符，按路径加载为模块；命令行测试在子进程中运行，
+HOME 指向临时目录，避免读写真实的注册表和缓存。
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+MANAGER_SCRIPT = SCRIPTS_DIR / "knowledge-index-manager.py"
+EXTRACT_SCRIPT = SCRIPTS_DIR / "extract_text.py"
+
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+@pytest.fixture(scope="session")
+def kim():
+    """knowledge-index-manager.py 模块"""
+    spec = importlib.util.spec_from_file_location("knowledge_index_manager", MANAGER_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """临时 HOME 目录（注册表与缓存位于其中）"""
+    path = tmp_path / "home"
+    path.mkdir()
+    monkeypatch.setenv("HOME", str(path))
+    monkeypatch.setenv("USERPROFILE", str(path))
+    return path
+
+
+@pytest.fixture
+def run_cli(home):
+    """在子进程中运行脚本，返回 CompletedProcess（stdout / stderr 为文本）"""
+    def run(script, *args, check=True):
+        env = dict(os.environ, HOME=str(home), USERPROFILE=str(home), PYTHONIOENCODING="utf-8")
+        result = subprocess.run([sys.executable, str(script), *map(str, args)],
+                                capture_output=True, text=True, encoding="utf-8", env=env, timeout=120)
+        if check and result.returncode != 0:
+            raise AssertionError(f"{script.name} {args} 退出码 {result.returncode}\n"
+                                 f"{result.stdout}\n{result.stderr}")
+        return result
+    return run
+
+
+def write_note(path: Path, text: str, mtime: float = None):
+    """写入笔记；指定 mtime 时设置修改时间（保证增量更新能检测到变化）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
@@ -0,0 +1,84 @@
+"""extract_text.py：页码范围与错误报告"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+import extract_text
+from conftest import EXTRACT_SCRIPT
+
+
+def test_parse_page_range():
+    assert extract_text.parse_page_range("1-3,5,9-", 10) == [0, 1, 2, 4, 8, 9]
+    assert extract_text.parse_page_range("-2, 20", 10) == [0, 1]
+
+
+@pytest.mark.parametrize("spec", ["abc", "3-1", "0", "1-x", "", ","])
+def test_invalid_page_range_is_rejected(spec):
+    with pytest.raises(ValueError, match="无效的页码范围"):
+        extract_text.page_spans(spec)
+
+
+def test_invalid_pages_reported_before_extraction(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+    result = extract_text.extract_text(str(pdf), pages="abc")
+    assert result == {"success": False, "error": "无效的页码范围: abc（格式如 1-10,15,20-）"}
+
+
+@pytest.mark.parametrize("output_format", ["json", "text", "jsonl"])
+def test_cli_rejects_invalid_pages(run_cli, tmp_path, output_format):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+    result = run_cli(EXTRACT_SCRIPT, pdf, "--format", output_format, "--pages", "abc", check=False)
+    assert result.returncode == 1
+    assert result.stdout == ""
+    assert "无效的 --pages 参数: 无效的页码范围: abc" in result.stderr
+
+
+def test_failure_keeps_each_extractor_error(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf at all")
+    result = extract_text.extract_text(str(broken))
+    assert not result["success"]
+    assert result["error"].startswith("所有提取方法均失败（PyMuPDF: ")
+    assert "pdfplumber: " in result["error"]
+
+
+def test_batch_reports_failure_reasons(run_cli, tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "broken.pdf").write_bytes(b"not a pdf at all")
+    (library / "empty.docx").write_bytes(b"")
+    output = tmp_path / "results.jsonl"
+
+    result = run_cli(EXTRACT_SCRIPT, "--batch", library, "--output", output, "--workers", "1", check=False)
+    assert result.returncode == 1
+
+    records = {Path(record["file"]).name: record
+               for record in map(json.loads, output.read_text(encoding="utf-8").splitlines())}
+    assert set(records) == {"broken.pdf", "empty.docx"}
+    for name, record in records.items():
+        assert not record["success"]
+        assert record["error"] and "所有提取方法均失败" != record["error"]
+        assert f"{name}: {record['error']}" in result.stderr
+    assert "0 个成功" in result.stderr and "2 个失败" in result.stderr
+
+
+def test_batch_applies_pages_to_pdfs(run_cli, tmp_path):
+    fitz = pytest.importorskip("fitz")
+    library = tmp_path / "library"
+    library.mkdir()
+    document = fitz.open()
+    for number in range(1, 4):
+        document.new_page().insert_text((72, 72), f"page {number} body")
+    document.save(str(library / "three.pdf"))
+    document.close()
+    output = tmp_path / "results.jsonl"
+
+    run_cli(EXTRACT_SCRIPT, "--batch", library, "--output", output, "--pages", "2", "--workers", "1")
+    record = json.loads(output.read_text(encoding="utf-8"))
+    assert record["success"]
+    assert "[第2页]" in record["text"] and "page 2 body" in record["text"]
+    assert "[第1页]" not in record["text"] and "[第3页]" not in record["text"]
@@ -0,0 +1,72 @@
+"""提取结果缓存"""
+
+import os
+
+import pytest
+
+import extract_text
+from extract_text import ExtractionCache
+
+
+def test_put_get_roundtrip(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "extractions.db"))
+    result = {"text": "正文" * 100, "metadata": {"extractor": "pymupdf"}, "success": True}
+    cache.put("k1", result)
+    assert cache.get("k1") == result
+    assert cache.get("missing") is None
+    assert cache.stats()["entries"] == 1
+    cache.close()
+
+
+def test_eviction_keeps_total_under_limit(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "extractions.db"), max_bytes=4000)
+    for i in range(40):
+        cache.put(f"k{i}", {"text": os.urandom(200).hex(), "success": True})
+    stats = cache.stats()
+    assert stats["data_bytes"] <= 4000
+    assert 0 < stats["entries"] < 40
+    # 最近写入的条目保留，最早的被淘汰
+    assert cache.get("k39") is not None
+    assert cache.get("k0") is None
+    cache.close()
+
+
+def test_key_changes_with_content_and_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_text, "extractor_signature", lambda ext: "PyMuPDF-1.0")
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 one")
+    key = ExtractionCache.make_key(str(pdf))
+    assert key.endswith(f":PyMuPDF-1.0:v{extract_text.EXTRACT_VERSION}:")
+    assert ExtractionCache.make_key(str(pdf), pages="1-2") != key
+    assert ExtractionCache.make_key(str(pdf), content_hash=extract_text.file_hash(str(pdf))) == key
+    pdf.write_bytes(b"%PDF-1.4 two")
+    assert ExtractionCache.make_key(str(pdf)) != key
+
+
+def test_no_extractor_means_no_caching(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_text, "extractor_signature", lambda ext: "")
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    assert ExtractionCache.make_key(str(pdf)) == ""
+
+
+def test_extract_text_hits_cache_without_parsing(tmp_path, monkeypatch):
+    pymupdf = pytest.importorskip("pymupdf")
+    pdf = tmp_path / "a.pdf"
+    document = pymupdf.open()
+    document.new_page().insert_text((72, 72), "cached page text")
+    document.save(str(pdf))
+    document.close()
+
+    cache = ExtractionCache(str(tmp_path / "extractions.db"))
+    first = extract_text.extract_text(str(pdf), cache=cache)
+    assert first["success"] and "cached" not in first["metadata"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("缓存命中时不应重新解析")
+
+    monkeypatch.setattr(extract_text, "iter_pdf_pages_pymupdf", fail)
+    second = extract_text.extract_text(str(pdf), cache=cache)
+    assert second["metadata"].pop("cached") is True
+    assert second == first
+    cache.close()
@@ -0,0 +1,58 @@
+"""全文索引增量更新：复用旧倒排表项后结果应与从头构建一致"""
+
+from conftest import MANAGER_SCRIPT, write_note
+
+
+def build(kim, tmp_path, texts, previous=None, name="fulltext.idx"):
+    documents = [{"path": path, "modified": modified, "size": len(text)}
+                 for path, (modified, text) in texts.items()]
+    fulltext, read_count = kim.FullTextIndex.build(documents, lambda doc: texts[doc["path"]][1], previous)
+    path = str(tmp_path / name)
+    fulltext.save(path)
+    return kim.FullTextIndex.load(path), read_count
+
+
+def snapshot(index, keywords):
+    return {keyword: index.search([keyword]) for keyword in keywords}
+
+
+def test_repeated_incremental_builds_match_full_build(kim, tmp_path):
+    texts = {f"n{i}.md": ("2026-01-01", f"# 笔记 {i}\ncommon alpha{i} shared words\n") for i in range(1, 6)}
+    index, read_count = build(kim, tmp_path, texts)
+    assert read_count == 5
+
+    edits = [
+        {"n1.md": ("2026-01-02", "# 笔记 1\ncommon beta edited first\n")},
+        {"n2.md": ("2026-01-03", "# 笔记 2\ncommon gamma edited second\n")},
+        {"n4.md": ("2026-01-04", "# 笔记 4\ncommon delta\n"), "n6.md": ("2026-01-04", "common 新增笔记\n")},
+        {"n1.md": ("2026-01-05", "# 笔记 1\ncommon epsilon\n")},
+    ]
+    keywords = ["common", "alpha3", "alpha5", "beta", "gamma", "delta", "epsilon", "shared", "新增"]
+    for step, edit in enumerate(edits):
+        texts.update(edit)
+        if step == 2:
+            del texts["n3.md"]
+        updated, read_count = build(kim, tmp_path, texts, previous=index, name=f"step{step}.idx")
+        assert read_count == len(edit)
+        fresh, _ = build(kim, tmp_path, texts, name=f"fresh{step}.idx")
+        assert snapshot(updated, keywords) == snapshot(fresh, keywords)
+        assert {doc["path"] for doc in updated.documents} == set(texts)
+        index.close()
+        fresh.close()
+        index = updated
+    assert set(index.search(["common"])) == set(texts)
+    index.close()
+
+
+def test_cli_updates_keep_fulltext_searchable(run_cli, tmp_path):
+    kb = tmp_path / "kb"
+    for i in range(1, 6):
+        write_note(kb / f"n{i}.md", f"# 笔记 {i}\n正文内容 token{i}\n", mtime=1_700_000_000)
+    run_cli(MANAGER_SCRIPT, "build", kb, "--no-ai", "--fulltext")
+
+    for step, name in enumerate(["n1.md", "n2.md", "n3.md"], 1):
+        write_note(kb / name, f"# 笔记\n修改后的正文 marker{step}\n", mtime=1_700_000_000 + step * 100)
+        result = run_cli(MANAGER_SCRIPT, "update", kb, "--no-ai")
+        assert "全文索引生成失败" not in result.stdout
+        found = run_cli(MANAGER_SCRIPT, "search", f"marker{step}", "--kb", kb, "--no-obsidian").stdout
+        assert name in found
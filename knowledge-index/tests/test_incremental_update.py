@@ -0,0 +1,57 @@
+"""增量更新：未变更文档的复用"""
+
+import yaml
+
+from conftest import write_note
+
+
+def load_docs(kb):
+    with open(kb / "_index.yaml", encoding="utf-8") as f:
+        return {doc["path"]: doc for doc in yaml.safe_load(f)["markdown_documents"]}
+
+
+def record_processed(manager, monkeypatch):
+    """记录 update 中重新读取处理的文件名"""
+    processed = []
+    original = manager._process_document
+
+    def process(kb_path, root, file, *args, **kwargs):
+        processed.append(file)
+        return original(kb_path, root, file, *args, **kwargs)
+
+    monkeypatch.setattr(manager, "_process_document", process)
+    return processed
+
+
+def test_update_summarizes_docs_built_without_ai(kim, home, tmp_path, monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    kb = tmp_path / "kb"
+    write_note(kb / "a.md", "# A\n\n第一篇笔记的正文\n", mtime=1_700_000_000)
+    write_note(kb / "sub" / "b.md", "# B\n\n第二篇笔记的正文\n", mtime=1_700_000_000)
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False).build_index(str(kb))
+    assert all("summary" not in doc for doc in load_docs(kb).values())
+
+    # 启用摘要后的 update 为缺少摘要的旧记录生成摘要（无 API key 时为基础摘要）
+    assert kim.KnowledgeBaseManager(enable_ai_summary=True).update_index(str(kb))
+    docs = load_docs(kb)
+    assert docs["a.md"]["summary"].startswith("【A】")
+    assert docs["sub/b.md"]["summary"].startswith("【B】")
+
+    # 已有摘要的未变更文档直接复用，不再读取
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=True)
+    processed = record_processed(manager, monkeypatch)
+    assert manager.update_index(str(kb))
+    assert processed == []
+
+
+def test_no_ai_update_reuses_unchanged_docs(kim, home, tmp_path, monkeypatch):
+    kb = tmp_path / "kb"
+    for name in ("a.md", "b.md", "c.md"):
+        write_note(kb / name, f"# {name}\n", mtime=1_700_000_000)
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False).build_index(str(kb))
+
+    write_note(kb / "b.md", "# b.md\n修改\n", mtime=1_700_000_100)
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False)
+    processed = record_processed(manager, monkeypatch)
+    assert manager.update_index(str(kb))
+    assert processed == ["b.md"]
@@ -0,0 +1,59 @@
+"""wikilink 解析与反向链接"""
+
+import yaml
+
+from conftest import write_note
+
+PATHS = ["首页.md", "项目/计划.md", "项目/归档/计划.md", "资料/计划.md", "资料/术语表.md", "深/层/笔记.md"]
+
+
+def resolver(kim, aliases=None):
+    documents = [{"path": path} for path in PATHS]
+    for path, names in (aliases or {}).items():
+        documents[PATHS.index(path)]["aliases"] = names
+    return kim.LinkResolver(documents)
+
+
+def resolve(kim, link, source, **kwargs):
+    doc_id = resolver(kim, **kwargs).resolve(link, source)
+    return PATHS[doc_id] if doc_id is not None else None
+
+
+def test_same_folder_wins_then_shallowest(kim):
+    assert resolve(kim, "计划", "资料/术语表.md") == "资料/计划.md"
+    # 层级相同时按路径排序（资 U+8D44 < 项 U+9879）
+    assert resolve(kim, "计划", "首页.md") == "资料/计划.md"
+    assert resolve(kim, "计划", "项目/归档/计划.md") == "项目/归档/计划.md"
+
+
+def test_paths_relative_links_and_case(kim):
+    assert resolve(kim, "归档/计划", "首页.md") == "项目/归档/计划.md"
+    assert resolve(kim, "项目/计划.md", "资料/术语表.md") == "项目/计划.md"
+    assert resolve(kim, "../资料/术语表", "项目/计划.md") == "资料/术语表.md"
+    assert resolve(kim, "./笔记", "深/层/其他.md") == "深/层/笔记.md"
+    assert resolve(kim, "../../../外部", "项目/计划.md") is None
+    assert resolve(kim, "首页.MD", "深/层/笔记.md") == "首页.md"
+
+
+def test_aliases_are_a_fallback(kim):
+    aliases = {"资料/术语表.md": ["Glossary", "计划"]}
+    assert resolve(kim, "glossary", "首页.md", aliases=aliases) == "资料/术语表.md"
+    assert resolve(kim, "计划", "首页.md", aliases=aliases) == "资料/计划.md"
+    assert resolve(kim, "不存在", "首页.md", aliases=aliases) is None
+
+
+def test_backlinks_for_notes_in_subfolders(kim, home, tmp_path):
+    kb = tmp_path / "kb"
+    (kb / ".obsidian").mkdir(parents=True)
+    write_note(kb / "首页.md", "# 首页\n[[笔记]] [[术语表|词汇]] [[计划#目标]]\n")
+    write_note(kb / "资料/术语表.md", "---\naliases: [Glossary]\n---\n# 术语表\n[[首页]]\n")
+    write_note(kb / "项目/计划.md", "# 计划\n[[glossary]]\n")
+    write_note(kb / "深/层/笔记.md", "# 笔记\n")
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False).build_index(str(kb))
+
+    with open(kb / "_index.yaml", encoding="utf-8") as f:
+        docs = {doc["path"]: doc for doc in yaml.safe_load(f)["markdown_documents"]}
+    assert sorted(docs["深/层/笔记.md"]["backlinks"]) == ["首页.md"]
+    assert sorted(docs["资料/术语表.md"]["backlinks"]) == ["项目/计划.md", "首页.md"]
+    assert sorted(docs["项目/计划.md"]["backlinks"]) == ["首页.md"]
+    assert sorted(docs["首页.md"]["backlinks"]) == ["资料/术语表.md"]
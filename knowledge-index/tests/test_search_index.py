@@ -0,0 +1,47 @@
+"""检索旁路索引：排序应与逐篇评分的回退路径一致"""
+
+import os
+
+import pytest
+
+from conftest import write_note
+
+NOTES = {
+    "索引/增量更新.md": "---\ntags: [索引, 性能]\n---\n# 增量更新\n\n索引增量更新只处理修改过的文件\n",
+    "索引/全量构建.md": "# 全量构建\n\n首次构建索引时扫描全部文档 [[增量更新]]\n",
+    "网络/TCP.md": "# TCP\n\nTCP 三次握手与拥塞控制 #network\n",
+    "网络/HTTP 缓存.md": "# HTTP 缓存\n\nCache-Control 与 ETag，缓存更新策略 [[TCP]]\n",
+    "日记/2026-01-01.md": "# 日记\n\n今天整理了索引和网络笔记 [[增量更新]] [[TCP]]\n",
+}
+QUERIES = ["索引", "索引增量更新", "TCP", "缓存 更新", "network", "性能", "不存在的词"]
+
+
+@pytest.fixture(scope="module")
+def vault(kim, tmp_path_factory):
+    kb = tmp_path_factory.mktemp("search") / "kb"
+    for path, text in NOTES.items():
+        write_note(kb / path, text)
+    home = kb.parent / "home"
+    home.mkdir()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("HOME", str(home))
+        assert kim.KnowledgeBaseManager(enable_ai_summary=False).build_index(str(kb))
+        assert os.path.exists(kim.SearchIndex.get_path(str(kb)))
+        yield kb
+
+
+@pytest.mark.parametrize("ranker", ["weighted", "bm25"])
+@pytest.mark.parametrize("query", QUERIES)
+def test_side_car_matches_fallback(kim, vault, monkeypatch, ranker, query):
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False)
+    with_index = manager.search_index(query, str(vault), show_progress=False, ranker=ranker)
+    monkeypatch.setattr(manager, "load_search_index", lambda kb_path: None)
+    fallback = manager.search_index(query, str(vault), show_progress=False, ranker=ranker)
+    assert with_index == fallback
+    assert bool(with_index) == (query != "不存在的词")
+
+
+def test_long_chinese_query_is_split(kim, vault):
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False)
+    results = manager.search_index("索引增量更新", str(vault), show_progress=False)
+    assert results and results[0]["path"] == "索引/增量更新.md"
@@ -0,0 +1,58 @@
+"""语义 / 混合检索：最低相似度与正文参与向量化"""
+
+import pytest
+
+from conftest import write_note
+
+pytest.importorskip("numpy")
+
+NOTES = {
+    "cooking/note0.md": "番茄炒蛋 的做法 需要 鸡蛋 番茄 盐 糖 油 翻炒",
+    "cooking/note1.md": "红烧肉 五花肉 酱油 冰糖 慢炖 两小时",
+    "cooking/note2.md": "饺子 面粉 和面 猪肉馅 白菜 包饺子 煮",
+    "network/note0.md": "TCP 三次握手 SYN ACK 连接建立 拥塞控制 窗口",
+    "network/note1.md": "HTTP 请求 响应 状态码 缓存 头部 keep-alive",
+    "network/note2.md": "TLS 证书 加密 握手 密钥交换 HTTPS",
+    "garden/note0.md": "月季 修剪 施肥 浇水 病虫害 蚜虫",
+    "garden/note1.md": "多肉 植物 浇水 阳光 充足 土壤 透气",
+    "orphan.md": "随便写点东西 今天天气 不错",
+}
+
+
+@pytest.fixture
+def vault(kim, home, tmp_path):
+    kb = tmp_path / "kb"
+    for path, body in NOTES.items():
+        write_note(kb / path, f"# 笔记\n\n{body}\n")
+    write_note(kb / "network/deep.md", "# 杂记\n\n" + "无关 填充 段落\n" * 30 + "\n量子纠缠 贝尔不等式\n")
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False, fulltext=True, semantic=True)
+    assert manager.build_index(str(kb))
+    return kb
+
+
+def search(kim, kb, query, mode):
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False)
+    return manager.search_index(query, str(kb), show_progress=False, mode=mode)
+
+
+def test_unrelated_query_returns_nothing(kim, vault):
+    assert search(kim, vault, "火箭 发射 轨道", "semantic") == []
+    assert search(kim, vault, "火箭", "hybrid") == []
+
+
+def test_semantic_results_respect_min_score(kim, vault):
+    results = search(kim, vault, "网络 协议 握手", "semantic")
+    assert results and all(r["semantic_score"] >= kim.VectorIndex.DEFAULT_MIN_SCORE for r in results)
+    assert {r["path"] for r in results} <= {p for p in NOTES if p.startswith("network/")} | {"network/deep.md"}
+
+
+def test_hybrid_drops_zero_scores(kim, vault):
+    results = search(kim, vault, "握手", "hybrid")
+    assert results and all(r["score"] > 0 for r in results)
+
+
+def test_body_only_content_is_found_semantically(kim, vault):
+    results = search(kim, vault, "量子纠缠", "semantic")
+    assert [r["path"] for r in results][:1] == ["network/deep.md"]
+    # 结果来自向量相似度，而不是查询无法向量化时回退的关键词检索
+    assert results[0]["semantic_score"] >= kim.VectorIndex.DEFAULT_MIN_SCORE
@@ -0,0 +1,88 @@
+"""SQLite 存储后端与 _index.yaml 的一致性"""
+
+import os
+
+import yaml
+
+from conftest import MANAGER_SCRIPT, write_note
+
+
+def load_yaml(kb):
+    with open(kb / "_index.yaml", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def make_kb(tmp_path):
+    kb = tmp_path / "kb"
+    write_note(kb / "a.md", "# A\n链接 [[b]]\n", mtime=1_700_000_000)
+    write_note(kb / "b.md", "# B\n", mtime=1_700_000_000)
+    write_note(kb / "sub" / "c.md", "# C\n", mtime=1_700_000_000)
+    return kb
+
+
+def test_plain_update_keeps_sqlite_in_sync(kim, home, tmp_path):
+    kb = make_kb(tmp_path)
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False, storage="sqlite").build_index(str(kb))
+
+    write_note(kb / "a.md", "# A\n修改后更长的正文 [[b]]\n", mtime=1_700_000_500)
+    write_note(kb / "d.md", "# D\n", mtime=1_700_000_500)
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False)
+    assert manager.update_index(str(kb))
+
+    store = manager.get_sqlite_store(str(kb))
+    assert store is not None
+    assert store.load() == load_yaml(kb)
+    assert store.count() == (4, 0)
+    assert store.get_document("a.md")["size"] == os.path.getsize(kb / "a.md")
+
+
+def test_stale_database_is_ignored_and_refreshed(kim, home, tmp_path):
+    kb = make_kb(tmp_path)
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False, storage="sqlite").build_index(str(kb))
+
+    # _index.yaml 被不维护数据库的工具改写后，读取回退到 YAML
+    index_data = load_yaml(kb)
+    index_data["markdown_documents"] = index_data["markdown_documents"][:1]
+    with open(kb / "_index.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(index_data, f, allow_unicode=True, sort_keys=False)
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False, storage="sqlite")
+    assert manager.get_sqlite_store(str(kb)) is None
+    assert manager.load_index(str(kb)) == index_data
+
+    assert manager.update_index(str(kb))
+    store = manager.get_sqlite_store(str(kb))
+    assert store is not None and store.load() == load_yaml(kb)
+    assert store.count() == (3, 0)
+
+
+def test_explicit_yaml_backend_removes_database(kim, home, tmp_path):
+    kb = make_kb(tmp_path)
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False, storage="sqlite").build_index(str(kb))
+    write_note(kb / "b.md", "# B\n修改\n", mtime=1_700_000_500)
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False, storage="yaml").update_index(str(kb))
+    assert not os.path.exists(kim.SQLiteIndexStore.get_path(str(kb)))
+
+
+def test_validate_index_same_result_for_both_backends(kim, home, tmp_path):
+    kb = make_kb(tmp_path)
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False, storage="sqlite").build_index(str(kb))
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False, storage="sqlite").validate_index(str(kb))
+    assert kim.KnowledgeBaseManager(enable_ai_summary=False, storage="yaml").validate_index(str(kb))
+
+    index_data = load_yaml(kb)
+    del index_data["knowledge_base"]
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=False, storage="sqlite")
+    with open(kb / "_index.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(index_data, f, allow_unicode=True, sort_keys=False)
+    manager.save_sqlite_index(str(kb), index_data)
+    assert not manager.validate_index(str(kb))
+    assert not kim.KnowledgeBaseManager(enable_ai_summary=False, storage="yaml").validate_index(str(kb))
+
+
+def test_cli_info_after_update_matches_yaml(run_cli, tmp_path):
+    kb = make_kb(tmp_path)
+    run_cli(MANAGER_SCRIPT, "build", kb, "--no-ai", "--storage", "sqlite")
+    write_note(kb / "e.md", "# E\n", mtime=1_700_000_500)
+    run_cli(MANAGER_SCRIPT, "update", kb, "--no-ai")
+    info = run_cli(MANAGER_SCRIPT, "info", kb, "--storage", "sqlite").stdout
+    assert "4" in info.split("Markdown")[1].splitlines()[0]
@@ -0,0 +1,156 @@
+"""批量 AI 摘要：批次切分、按 id 解析、失败批次逐篇补请求、写回摘要缓存"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+DOC_MARKER = re.compile(r"=== 文档 (\d+) ===")
+SINGLE = 'summary: "单篇摘要"\nkeywords: [单篇]\ntopics: [测试]\n'
+
+
+def batch_response(ids, skip=()):
+    """按文档编号生成多文档 YAML 响应（skip 中的编号不返回）"""
+    lines = ["documents:"]
+    for doc_id in ids:
+        if doc_id not in skip:
+            lines += [f"  - id: {doc_id}", f'    summary: "批量摘要 {doc_id}"', f"    keywords: [k{doc_id}]"]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def manager(kim, home, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.delenv("ANTHROPIC_BASE_URL", raising=False)
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=True)
+    yield manager
+    manager.summary_cache.close()
+
+
+def stub_messages(manager, monkeypatch, batch_reply):
+    """替换 _create_message：多文档提示交给 batch_reply(编号列表)，单篇提示返回 SINGLE"""
+    calls = []
+
+    def create_message(prompt, max_tokens):
+        ids = [int(i) for i in DOC_MARKER.findall(prompt)]
+        calls.append(len(ids) or 1)
+        return batch_reply(ids) if ids else SINGLE
+
+    monkeypatch.setattr(manager, "_create_message", create_message)
+    return calls
+
+
+def items(count):
+    return [(f"# T{i}\n\n第 {i} 篇文档的正文\n", f"doc{i}.md") for i in range(1, count + 1)]
+
+
+def test_batches_split_by_count_and_chars(manager):
+    uncached = [(f"h{i}", "x" * 10, f"d{i}") for i in range(5)]
+    assert [len(b) for b in manager._make_summary_batches(uncached, 2)] == [2, 2, 1]
+
+    # 单篇按截断后的长度计入总字符上限
+    per_batch = manager.SUMMARY_BATCH_MAX_CHARS // manager.SUMMARY_MAX_CHARS
+    big = [(f"h{i}", "x" * (manager.SUMMARY_MAX_CHARS * 2), f"d{i}") for i in range(per_batch + 1)]
+    assert [len(b) for b in manager._make_summary_batches(big, 10)] == [per_batch, 1]
+
+
+def test_batch_response_parsed_by_id(manager, monkeypatch):
+    reply = ('```yaml\ndocuments:\n'
+             '  - id: 3\n    summary: "第三"\n'
+             '  - id: "1"\n    summary: "第一"\n    topics: [主题]\n'
+             '  - id: 9\n    summary: "越界"\n'
+             '  - id: x\n    summary: "无效"\n'
+             '  - 不是字典\n```')
+    monkeypatch.setattr(manager, "_create_message", lambda prompt, max_tokens: reply)
+    results = manager._call_claude_api_batch(["a", "b", "c"])
+    assert [r and r["summary"] for r in results] == ["第一", None, "第三"]
+    assert results[0]["topics"] == ["主题"]
+
+
+def test_malformed_batch_response_retries_each_document(manager, monkeypatch):
+    calls = stub_messages(manager, monkeypatch, lambda ids: "documents: [未闭合")
+    results = manager.generate_ai_summaries(items(4), batch_size=4, options={"max_retries": 0})
+
+    assert calls == [4, 1, 1, 1, 1]
+    assert [r["summary"] for r in results] == ["单篇摘要"] * 4
+    for content, _ in items(4):
+        assert manager.get_cached_summary(manager.get_content_hash(content))["summary"] == "单篇摘要"
+
+
+def test_document_missing_from_batch_is_requested_alone(manager, monkeypatch):
+    calls = stub_messages(manager, monkeypatch, lambda ids: batch_response(ids, skip={2}))
+    results = manager.generate_ai_summaries(items(4), batch_size=4, options={"max_retries": 0})
+
+    assert calls == [4, 1]
+    assert [r["summary"] for r in results] == ["批量摘要 1", "单篇摘要", "批量摘要 3", "批量摘要 4"]
+
+
+def test_failed_single_request_falls_back_to_basic_summary(manager, monkeypatch):
+    def create_message(prompt, max_tokens):
+        raise ValueError("不可重试")
+
+    monkeypatch.setattr(manager, "_create_message", create_message)
+    results = manager.generate_ai_summaries(items(2), batch_size=2, options={"max_retries": 0})
+    assert [r["summary"] for r in results] == ["【T1】第 1 篇文档的正文", "【T2】第 2 篇文档的正文"]
+    assert manager.summary_cache.stats()["entries"] == 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Messages API 桩：多文档提示按编号返回摘要，单篇提示返回 SINGLE"""
+
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        ids = [int(i) for i in DOC_MARKER.findall(body["messages"][0]["content"])]
+        self.requests.append(len(ids) or 1)
+        text = batch_response(ids) if ids else SINGLE
+        payload = json.dumps({
+            "id": "msg_stub", "type": "message", "role": "assistant", "model": body["model"],
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    pytest.importorskip("anthropic")
+    StubHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield StubHandler.requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_stub_server_batches_and_cache(kim, home, monkeypatch, stub_server):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    documents = items(5) + [items(1)[0]]  # 重复内容只请求一次
+
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=True)
+    results = manager.generate_ai_summaries(documents, batch_size=2, options={"concurrency": 2})
+    assert sorted(stub_server) == [1, 2, 2]
+    assert [r["summary"] for r in results[:5]] == ["批量摘要 1", "批量摘要 2"] * 2 + ["单篇摘要"]
+    assert results[5] == results[0]
+    manager.summary_cache.close()
+
+    # 新进程（新的管理器）直接从摘要缓存读取，不再请求
+    manager = kim.KnowledgeBaseManager(enable_ai_summary=True)
+    assert manager.generate_ai_summaries(documents, batch_size=2) == results
+    assert len(stub_server) == 3
+    stats = manager.summary_cache.stats()
+    assert stats["entries"] == 5
+    manager.summary_cache.close()
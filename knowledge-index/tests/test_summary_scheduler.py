@@ -0,0 +1,111 @@
+"""SummaryScheduler：重试、退避与限流窗口"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+
+class StatusError(Exception):
+    """带 status_code（及可选响应头）的 API 错误"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def flaky(failures, error_factory):
+    """前 failures 次调用抛出错误，之后返回负载"""
+    calls = []
+
+    def request(payload):
+        calls.append(payload)
+        if len(calls) <= failures:
+            raise error_factory()
+        return f"ok:{payload}"
+
+    return request, calls
+
+
+def test_is_retryable(kim):
+    scheduler = kim.SummaryScheduler
+    assert scheduler.is_retryable(StatusError(429))
+    assert scheduler.is_retryable(StatusError(529))
+    assert not scheduler.is_retryable(StatusError(400))
+    assert scheduler.is_retryable(APIConnectionError())
+    assert not scheduler.is_retryable(ValueError("bad yaml"))
+
+
+def test_retry_delay_prefers_retry_after(kim):
+    scheduler = kim.SummaryScheduler(lambda payload: payload, base_delay=1.0, max_delay=10.0)
+    assert scheduler.retry_delay(0, StatusError(429, {"retry-after": "3"})) == 3.0
+    assert scheduler.retry_delay(0, StatusError(429, {"retry-after": "120"})) == 10.0
+    for attempt in range(5):
+        delay = scheduler.retry_delay(attempt, StatusError(429, {"retry-after": "soon"}))
+        expected = min(10.0, 2 ** attempt)
+        assert expected / 2 <= delay <= expected
+
+
+def test_retries_429_then_succeeds(kim):
+    request, calls = flaky(2, lambda: StatusError(429))
+    scheduler = kim.SummaryScheduler(request, max_retries=3, base_delay=0)
+    assert scheduler.run([("job", 10)]) == [(True, "ok:job")]
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries(kim):
+    request, calls = flaky(100, lambda: StatusError(503))
+    scheduler = kim.SummaryScheduler(request, max_retries=2, base_delay=0)
+    [(ok, error)] = scheduler.run([("job", 10)])
+    assert not ok and error.status_code == 503
+    assert len(calls) == 3
+
+
+def test_non_retryable_error_fails_immediately(kim):
+    request, calls = flaky(100, lambda: StatusError(400))
+    scheduler = kim.SummaryScheduler(request, max_retries=5, base_delay=0)
+    [(ok, _)] = scheduler.run([("job", 10)])
+    assert not ok and len(calls) == 1
+
+
+def test_results_keep_job_order_and_report_progress(kim):
+    done = []
+    scheduler = kim.SummaryScheduler(lambda payload: payload * 2, concurrency=3)
+    results = scheduler.run([(i, 1) for i in range(6)], on_done=lambda index, ok: done.append((index, ok)))
+    assert results == [(True, i * 2) for i in range(6)]
+    assert sorted(done) == [(i, True) for i in range(6)]
+
+
+def timed_run(kim, window, jobs, **limits):
+    """以缩短的窗口运行，返回各任务开始时间（相对首个任务）"""
+    started = {}
+
+    def request(payload):
+        started[payload] = time.monotonic()
+        return payload
+
+    scheduler = kim.SummaryScheduler(request, concurrency=len(jobs), **limits)
+    scheduler.WINDOW_SECONDS = window
+    scheduler.run(jobs)
+    first = min(started.values())
+    return {payload: started[payload] - first for payload in started}
+
+
+@pytest.mark.parametrize("limits, jobs", [
+    ({"requests_per_minute": 2}, [("a", 1), ("b", 1), ("c", 1)]),
+    ({"tokens_per_minute": 100}, [("a", 40), ("b", 40), ("c", 40)]),
+])
+def test_window_limits_delay_excess_requests(kim, limits, jobs):
+    offsets = timed_run(kim, 0.3, jobs, **limits)
+    assert sorted(offsets.values())[1] < 0.2
+    assert sorted(offsets.values())[2] >= 0.25
+
+
+def test_oversized_job_passes_on_empty_window(kim):
+    offsets = timed_run(kim, 5.0, [("huge", 1000)], tokens_per_minute=100)
+    assert offsets == {"huge": 0.0}